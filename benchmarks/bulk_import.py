@@ -0,0 +1,79 @@
+"""
+Times a bulk import of generated codes into a temporary SQLite database, phase by phase.
+
+    python -m benchmarks.bulk_import --codes 100000
+"""
+import argparse
+import csv
+import io
+import os
+import tempfile
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database import bulk_import, create_database_engine, migrate
+from models.Lecture import Lecture
+from models.Module import Module
+from models.Seminar import Seminar
+
+GUILD_ID = 1
+
+
+def generate_csv(number_of_codes: int, number_of_modules: int, sessions_per_module: int) -> str:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["code", "module_code", "lecture_name", "seminar_name"])
+    for i in range(number_of_codes):
+        module = i % number_of_modules + 1
+        session = (i // number_of_modules) % sessions_per_module + 1
+        name = f"Module {module} Session {session}"
+        writer.writerow([f"{i:05X}", f"MOD{module:04d}", name if i % 2 else "", "" if i % 2 else name])
+    return output.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--codes", type=int, default=100_000, help="Codes to import")
+    parser.add_argument("--modules", type=int, default=20, help="Modules in the catalogue")
+    parser.add_argument("--sessions", type=int, default=50, help="Lectures and seminars per module, each")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per executemany batch")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_database_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        migrate(engine)
+        with engine.begin() as connection:
+            connection.execute(insert(Module), [dict(id=m, guild_id=GUILD_ID, name=f"Module {m}", module_code=f"MOD{m:04d}", description="")
+                                                for m in range(1, args.modules + 1)])
+            for model in (Lecture, Seminar):
+                connection.execute(insert(model), [
+                    dict(guild_id=GUILD_ID, name=f"Module {m} Session {s}", module_id=m)
+                    for m in range(1, args.modules + 1) for s in range(1, args.sessions + 1)
+                ])
+        data = generate_csv(args.codes, args.modules, args.sessions)
+
+        timings = {}
+        start = time.perf_counter()
+        rows, conflicts = bulk_import.parse_rows(data, "codes.csv")
+        timings["parse"] = time.perf_counter() - start
+        with Session(engine, expire_on_commit=False) as session:
+            start = time.perf_counter()
+            catalogue = bulk_import.load_catalogue(session, GUILD_ID, (row.module_code for row in rows))
+            values, invalid = bulk_import.validate_rows(rows, catalogue)
+            timings["validate"] = time.perf_counter() - start
+            start = time.perf_counter()
+            added, existing = bulk_import.import_codes(session, values, batch_size=args.batch_size)
+            timings["insert"] = time.perf_counter() - start
+        engine.dispose()
+
+    total = sum(timings.values())
+    print(f"Imported {added} of {args.codes} codes ({len(conflicts) + len(invalid) + len(existing)} conflicts) "
+          f"in {total:.2f}s, {args.codes / total:,.0f} rows/s")
+    for phase, elapsed in timings.items():
+        print(f"  {phase:>8}: {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
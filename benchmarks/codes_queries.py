@@ -0,0 +1,82 @@
+"""
+Counts the SQL statements one /codes database load issues as the number of live codes grows.
+
+Exits non-zero if the statement count is not constant, I.E. if an N+1 lookup creeps back in.
+
+    python -m benchmarks.codes_queries --sizes 1 10 40 400
+"""
+import argparse
+import datetime
+import sys
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from database import queries
+from models import Base
+from models.Code import Code
+from models.Lecture import Lecture
+from models.Module import Module
+from models.Seminar import Seminar
+from utils import pack_code
+
+GUILD_ID = 1
+
+
+def seed(engine, number_of_codes: int):
+    with Session(engine) as session:
+        module = Module(guild_id=GUILD_ID, name="Benchmark", module_code="BENCH0001", description="")
+        session.add(module)
+        session.flush()
+        for i in range(number_of_codes):
+            if i % 2:
+                seminar = Seminar(guild_id=GUILD_ID, name=f"Benchmark Seminar {i}", module_id=module.id)
+                session.add(seminar)
+                session.flush()
+                session.add(Code(guild_id=GUILD_ID, code=f"{i:05d}", code_key=pack_code(f"{i:05d}"), module_id=module.id, seminar_id=seminar.id))
+            else:
+                lecture = Lecture(guild_id=GUILD_ID, name=f"Benchmark Lecture {i}", module_id=module.id)
+                session.add(lecture)
+                session.flush()
+                session.add(Code(guild_id=GUILD_ID, code=f"{i:05d}", code_key=pack_code(f"{i:05d}"), module_id=module.id, lecture_id=lecture.id))
+        session.commit()
+
+
+def measure(number_of_codes: int):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    seed(engine, number_of_codes)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+    now = datetime.datetime.utcnow()
+    start = time.perf_counter()
+    with Session(engine) as session:
+        codes = queries.get_live_codes(session, now - datetime.timedelta(hours=2), now)
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+    assert len(codes) == number_of_codes, f"expected {number_of_codes} codes, got {len(codes)}"
+    return len(statements), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 40, 400], help="Numbers of live codes to seed")
+    args = parser.parse_args()
+
+    counts = set()
+    for size in args.sizes:
+        statements, elapsed = measure(size)
+        counts.add(statements)
+        print(f"{size:6d} codes: {statements} statement(s) in {elapsed * 1000:.2f}ms")
+
+    if len(counts) != 1:
+        print("FAIL: statement count grows with the number of codes", file=sys.stderr)
+        sys.exit(1)
+    print("OK: statement count is constant")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Seeds a SQLite database with a large codes table and reports the query plan and timing of each hot
+lookup before and after the index migrations are applied.
+
+    python -m benchmarks.indexes --codes 1000000
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert, select
+
+from database import migrate
+from models import Base
+from models.Code import Code
+from models.Lecture import Lecture
+from models.Module import Module
+from models.Seminar import Seminar
+from utils import pack_code
+
+GUILD_ID = 1
+
+
+def seed(engine, number_of_codes: int, number_of_modules: int, sessions_per_module: int, batch_size: int = 50_000):
+    now = datetime.datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(insert(Module), [
+            dict(id=m, guild_id=GUILD_ID, name=f"Module {m}", module_code=f"MOD{m:04d}", description="", created_at=now, updated_at=now)
+            for m in range(1, number_of_modules + 1)
+        ])
+        for model, kind in ((Lecture, "Lecture"), (Seminar, "Seminar")):
+            connection.execute(insert(model), [
+                dict(id=i, guild_id=GUILD_ID, name=f"{kind} {i}", module_id=(i - 1) // sessions_per_module + 1, created_at=now, updated_at=now)
+                for i in range(1, number_of_modules * sessions_per_module + 1)
+            ])
+
+    number_of_sessions = number_of_modules * sessions_per_module
+    for start in range(0, number_of_codes, batch_size):
+        rows = []
+        for i in range(start, min(start + batch_size, number_of_codes)):
+            session_id = random.randint(1, number_of_sessions)
+            created_at = now - datetime.timedelta(seconds=random.randint(0, 60 * 60 * 24 * 30))
+            row = dict(guild_id=GUILD_ID, code=f"{i:05X}", code_key=pack_code(f"{i:05X}"), module_id=(session_id - 1) // sessions_per_module + 1, lecture_id=None,
+                       seminar_id=None, status=1, created_at=created_at, updated_at=created_at)
+            row["lecture_id" if i % 2 else "seminar_id"] = session_id
+            rows.append(row)
+        with engine.begin() as connection:
+            connection.execute(insert(Code), rows)
+
+
+def hot_queries():
+    now = datetime.datetime.utcnow()
+    return {
+        "module by module_code": select(Module).where(Module.guild_id == GUILD_ID, Module.module_code == "MOD0025"),
+        "/codes window": select(Code).where(Code.created_at.between(now - datetime.timedelta(hours=2), now + datetime.timedelta(hours=1))),
+        "expiry batch": select(Code.id).where(Code.created_at < now - datetime.timedelta(days=29)).limit(1000),
+        "removecode lookup": select(Code).where(Code.guild_id == GUILD_ID, Code.module_id == 7, Code.code == "0ABCD"),
+        "codes of a lecture": select(Code).where(Code.lecture_id == 123),
+        "lectures of a module": select(Lecture).where(Lecture.guild_id == GUILD_ID, Lecture.module_id == 7).order_by(Lecture.name),
+        "seminars of a module": select(Seminar).where(Seminar.guild_id == GUILD_ID, Seminar.module_id == 7).order_by(Seminar.name),
+        "lecture by name": select(Lecture).where(Lecture.guild_id == GUILD_ID, Lecture.name == "Lecture 123"),
+    }
+
+
+def report(engine, repeat: int):
+    results = {}
+    with engine.connect() as connection:
+        for name, stmt in hot_queries().items():
+            compiled = stmt.compile(dialect=engine.dialect)
+            params = tuple(compiled.params[key] for key in compiled.positiontup)
+            plan = [row[-1] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params)]
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                connection.execute(stmt).all()
+                timings.append(time.perf_counter() - start)
+            results[name] = (plan, statistics.median(timings))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--codes", type=int, default=1_000_000, help="Codes to seed")
+    parser.add_argument("--modules", type=int, default=50, help="Modules to seed")
+    parser.add_argument("--sessions", type=int, default=40, help="Lectures and seminars to seed per module, each")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query; the median is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        # Start from the pre-migration schema: only the unique constraints, no declared indexes
+        with engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.drop(connection)
+
+        start = time.perf_counter()
+        seed(engine, args.codes, args.modules, args.sessions)
+        print(f"Seeded {args.codes} codes in {time.perf_counter() - start:.1f}s")
+
+        before = report(engine, args.repeat)
+        start = time.perf_counter()
+        migrate(engine)
+        print(f"Migrated in {time.perf_counter() - start:.1f}s")
+        after = report(engine, args.repeat)
+        engine.dispose()
+
+    for name in before:
+        (plan_before, time_before), (plan_after, time_after) = before[name], after[name]
+        print(f"\n{name}: {time_before * 1000:.2f}ms -> {time_after * 1000:.2f}ms")
+        print(f"  before: {'; '.join(plan_before)}")
+        print(f"  after:  {'; '.join(plan_after)}")
+
+
+if __name__ == "__main__":
+    main()
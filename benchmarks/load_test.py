@@ -0,0 +1,112 @@
+"""
+Load test for the database layer.
+
+Fires N concurrent simulated /codes interactions at a seeded SQLite file, once with the
+query run inline on the event loop (the old behaviour) and once through Database.run,
+and reports interaction latency percentiles alongside the worst event loop stall.
+
+    python -m benchmarks.load_test --interactions 200 --codes 40
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import tempfile
+import time
+
+from sqlalchemy.orm import Session
+
+from database import Database, create_database_engine, queries
+from models import Base
+from models.Code import Code
+from models.Lecture import Lecture
+from models.Module import Module
+from utils import pack_code
+
+GUILD_ID = 1
+
+
+def seed(engine, number_of_codes: int):
+    with Session(engine) as session:
+        module = Module(guild_id=GUILD_ID, name="Benchmark", module_code="BENCH0001", description="")
+        session.add(module)
+        session.flush()
+        for i in range(number_of_codes):
+            lecture = Lecture(guild_id=GUILD_ID, name=f"Benchmark Lecture {i}", module_id=module.id)
+            session.add(lecture)
+            session.flush()
+            session.add(Code(guild_id=GUILD_ID, code=f"{i:05d}", code_key=pack_code(f"{i:05d}"), module_id=module.id, lecture_id=lecture.id))
+        session.commit()
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def monitor_loop(stop: asyncio.Event, interval: float, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run_mode(engine, database: Database, interactions: int, use_pool: bool):
+    now = datetime.datetime.utcnow()
+    window = (now - datetime.timedelta(hours=2), now)
+    latencies, lags = [], []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_loop(stop, 0.005, lags))
+    await asyncio.sleep(0)
+
+    async def interaction():
+        start = time.perf_counter()
+        if use_pool:
+            await database.run(queries.get_live_codes, *window)
+        else:
+            with Session(engine) as session:
+                queries.get_live_codes(session, *window)
+            await asyncio.sleep(0)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(interaction() for _ in range(interactions)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+    return {
+        "mode": "thread pool" if use_pool else "inline",
+        "throughput": interactions / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max_loop_lag": max(lags) if lags else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interactions", type=int, default=200, help="Concurrent simulated interactions")
+    parser.add_argument("--codes", type=int, default=40, help="Live codes seeded into the database")
+    parser.add_argument("--workers", type=int, default=4, help="Database worker threads")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_database_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}", pool_size=args.workers)
+        Base.metadata.create_all(engine)
+        seed(engine, args.codes)
+        database = Database(engine, max_workers=args.workers)
+        try:
+            for use_pool in (False, True):
+                result = asyncio.run(run_mode(engine, database, args.interactions, use_pool))
+                print(f"{result['mode']:>12}: {result['throughput']:8.1f} interactions/s  "
+                      f"p50={result['p50'] * 1000:7.2f}ms  p95={result['p95'] * 1000:7.2f}ms  "
+                      f"p99={result['p99'] * 1000:7.2f}ms  max loop lag={result['max_loop_lag'] * 1000:7.2f}ms")
+        finally:
+            database.close()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
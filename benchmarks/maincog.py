@@ -0,0 +1,269 @@
+"""
+Drives MainCog's slash commands offline, with stub interactions and a seeded temporary SQLite file.
+
+Each scenario runs a command (or maintenance job) --iterations times, --concurrency at once, and reports
+throughput, latency percentiles and SQL statements per run. Results are written as JSON, and a previous
+results file can be passed to --compare to see what changed between commits.
+
+    python -m benchmarks.maincog --modules 50 --sessions 20 --codes 2000 --output before.json
+    python -m benchmarks.maincog --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import typing
+
+import nextcord
+from sqlalchemy import event, insert
+
+GUILD_ID = 1
+SCENARIOS = ("codes", "addcode", "stats", "modules", "seminars", "archive_codes_older_than_a_day", "clear_duplicate_codes")
+
+interaction_ids = itertools.count(1)
+
+
+class StubResponse:
+    def __init__(self, interaction: "StubInteraction"):
+        self.interaction = interaction
+        self.done = False
+
+    def is_done(self) -> bool:
+        return self.done
+
+    async def send_message(self, content=None, **kwargs):
+        self.done = True
+        self.interaction.sent.append((content, kwargs))
+
+    async def edit_message(self, content=None, **kwargs):
+        self.done = True
+        self.interaction.sent.append((content, kwargs))
+
+    async def defer(self, **kwargs):
+        self.done = True
+
+    async def send_autocomplete(self, choices):
+        self.done = True
+        self.interaction.sent.append((choices, {}))
+
+
+class StubFollowup:
+    def __init__(self, interaction: "StubInteraction"):
+        self.interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        self.interaction.sent.append((content, kwargs))
+
+
+class StubInteraction:
+    """
+    Just enough of nextcord.Interaction for MainCog's commands and AddCodeView selections
+    """
+
+    def __init__(self, command: str, guild_id: int = GUILD_ID, user_id: int = 1):
+        self.id = next(interaction_ids)
+        self.guild_id = guild_id
+        self.guild = None
+        self.user = types.SimpleNamespace(id=user_id, name="benchmark", discriminator="0001",
+                                          display_avatar=types.SimpleNamespace(url=""))
+        self.application_command = types.SimpleNamespace(name=command)
+        self.response = StubResponse(self)
+        self.followup = StubFollowup(self)
+        self.sent: typing.List[typing.Tuple[typing.Any, dict]] = []
+
+
+def percentile(samples: typing.Sequence[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed(engine, modules: int, sessions: int, codes: int, expired: int):
+    from models.Code import Code
+    from models.Lecture import Lecture
+    from models.Module import Module
+    from models.Seminar import Seminar
+    from utils import pack_code
+
+    now = datetime.datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(insert(Module), [
+            dict(id=m, guild_id=GUILD_ID, name=f"Module {m}", module_code=f"MOD{m:04d}", description="", created_at=now, updated_at=now)
+            for m in range(1, modules + 1)
+        ])
+        for model, kind in ((Lecture, "Lecture"), (Seminar, "Seminar")):
+            connection.execute(insert(model), [
+                dict(id=i, guild_id=GUILD_ID, name=f"{kind} {i}", module_id=(i - 1) // sessions + 1, created_at=now, updated_at=now)
+                for i in range(1, modules * sessions + 1)
+            ])
+        rows = []
+        for i in range(codes + expired):
+            session_id = i % (modules * sessions) + 1
+            created_at = now if i < codes else now - datetime.timedelta(days=2)
+            rows.append(dict(guild_id=GUILD_ID, code=f"{i:05X}", code_key=pack_code(f"{i:05X}"), module_id=(session_id - 1) // sessions + 1,
+                             lecture_id=session_id, status=1, created_at=created_at, updated_at=created_at))
+        if rows:
+            connection.execute(insert(Code), rows)
+
+
+async def invoke(cog, command: str, *args) -> StubInteraction:
+    interaction = StubInteraction(command)
+    await cog.cog_application_command_before_invoke(interaction)
+    try:
+        await getattr(cog, command).callback(cog, interaction, *args)
+    finally:
+        await cog.cog_application_command_after_invoke(interaction)
+    return interaction
+
+
+def scenario_runs(cog, args) -> typing.Dict[str, typing.Callable[[int], typing.Awaitable[typing.Any]]]:
+    """
+    One coroutine function per scenario, taking the iteration number
+    """
+    async def addcode(i: int):
+        # Seeded codes are hex, so a Z prefix makes every submission a real insert
+        module_number = i % args.modules + 1
+        interaction = await invoke(cog, "addcode", f"Z{i % 0x10000:04X}", f"MOD{module_number:04d}", 2)
+        dropdown = interaction.sent[0][1]["view"].children[0]
+        # Lecture n is seeded with id n
+        selected = StubInteraction("addcode")
+        selected.type = nextcord.InteractionType.component
+        selected.data = {"custom_id": dropdown.custom_id, "values": [str((module_number - 1) * args.sessions + 1 + i // args.modules % args.sessions)]}
+        await cog.on_interaction(selected)
+
+    return {
+        "codes": lambda i: invoke(cog, "codes"),
+        "addcode": addcode,
+        "stats": lambda i: invoke(cog, "stats"),
+        "modules": lambda i: invoke(cog, "modules"),
+        "seminars": lambda i: invoke(cog, "seminars", f"MOD{i % args.modules + 1:04d}"),
+        "archive_codes_older_than_a_day": lambda i: cog.archive_codes_older_than_a_day(),
+        "clear_duplicate_codes": lambda i: cog.clear_duplicate_codes(),
+    }
+
+
+async def run_scenario(run: typing.Callable[[int], typing.Awaitable[typing.Any]], iterations: int, concurrency: int,
+                       statements: typing.List[int]) -> typing.Dict[str, float]:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await run(i)
+            latencies.append(time.perf_counter() - start)
+
+    statements_before = statements[0]
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(i) for i in range(iterations)))
+    elapsed = time.perf_counter() - start
+    return {
+        "iterations": iterations,
+        "throughput": iterations / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies),
+        "statements_per_iteration": (statements[0] - statements_before) / iterations,
+    }
+
+
+async def benchmark(args, config: dict) -> typing.Dict[str, typing.Dict[str, float]]:
+    from main import create_bot
+    from cogs.maincog import MainCog
+
+    bot = create_bot(config)
+    bot.prepare_database()
+    engine = bot.engine
+    seed(engine, args.modules, args.sessions, args.codes, args.expired)
+
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+    event.listen(engine, "before_cursor_execute", count)
+
+    cog = MainCog(bot)
+    # Maintenance runs as its own scenario, not in the background of the others
+    cog.scheduler.stop()
+    await cog.load_code_cache()
+    await cog.load_name_indexes()
+    await cog.reconcile_stats()
+
+    runs = scenario_runs(cog, args)
+    results = {}
+    for name in args.scenarios:
+        results[name] = await run_scenario(runs[name], args.iterations, args.concurrency, statements)
+        print(f"{name:>30}: {results[name]['throughput']:9.1f}/s  p50={results[name]['p50'] * 1000:8.2f}ms  "
+              f"p95={results[name]['p95'] * 1000:8.2f}ms  p99={results[name]['p99'] * 1000:8.2f}ms  "
+              f"{results[name]['statements_per_iteration']:6.1f} statements")
+
+    await cog.shutdown()
+    bot.database.close()
+    engine.dispose()
+    return results
+
+
+def current_commit() -> typing.Union[str, None]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous: dict, current: dict):
+    print(f"\nCompared with {previous.get('commit') or 'previous run'}:")
+    for name, result in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        changes = []
+        for metric in ("throughput", "p50", "p95", "statements_per_iteration"):
+            if before[metric]:
+                changes.append(f"{metric} {(result[metric] - before[metric]) / before[metric] * 100:+.1f}%")
+        print(f"{name:>30}: {', '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", type=int, default=20, help="Modules to seed")
+    parser.add_argument("--sessions", type=int, default=20, help="Lectures and seminars to seed per module, each")
+    parser.add_argument("--codes", type=int, default=500, help="Live codes to seed")
+    parser.add_argument("--expired", type=int, default=500, help="Codes older than a day to seed, for the cleanup job")
+    parser.add_argument("--iterations", type=int, default=200, help="Runs per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="Runs in flight at once")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS), help="Scenarios to run, in order")
+    parser.add_argument("--output", default="maincog_benchmark.json", help="Where to write the results")
+    parser.add_argument("--compare", help="A previous results file to compare against")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        config = {"TEST_SERVER_GUILD_ID": GUILD_ID, "ENGINE_URL": f"sqlite:///{os.path.join(directory, 'bench.db')}",
+                  "METRICS_PORT": None, "MAINTENANCE_JITTER": 0}
+        scenarios = asyncio.run(benchmark(args, config))
+
+    results = {
+        "commit": current_commit(),
+        "created_at": datetime.datetime.utcnow().isoformat(),
+        "python": sys.version.split()[0],
+        "parameters": {key: getattr(args, key) for key in ("modules", "sessions", "codes", "expired", "iterations", "concurrency")},
+        "scenarios": scenarios,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
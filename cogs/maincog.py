@@ -1,96 +1,477 @@
 import asyncio
+import collections
 import datetime
+import io
+import math
+import operator
+import tempfile
+import time
 import typing
 
 import nextcord
 from nextcord.ext import commands
-from sqlalchemy import select
-from sqlalchemy.orm import Session
 
-from main import AttendanceBot
-from models.Code import Code
-from models.Lecture import Lecture
-from models.Module import Module
-from models.Seminar import Seminar
-from ui_components.AddCode import AddCodeView
+from database import queries, current_interaction, bulk_import, history, CodeWriteQueue, Change
+from ui_components.AddCode import AddCodeView, CodeSelection, MAX_SESSIONS
+from ui_components.Paginator import PaginatorView, Fetch, Render, sequence_fetch
+from utils import CodeCache, LiveCode, Scheduler, StatsCounters, CatalogueCache, ModuleRecord, LectureRecord, SeminarRecord, PrefixIndex, \
+    PageCache, Timetable, ScheduledSession, RateLimiter, normalise_code, pack_code, CODE_LENGTH
+
+# How /addlecture, /addseminar and /schedule take start times, always UTC
+START_FORMAT = "%Y-%m-%d %H:%M"
+
+
+class RateLimited(nextcord.ApplicationCheckFailure):
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"Rate limited per {scope}, retry in {retry_after:.1f}s")
+        self.scope = scope
+        self.retry_after = retry_after
+
+    def reply(self, command: str) -> str:
+        who = "You're" if self.scope == "user" else "This server is"
+        return f"{who} using /{command} too often, try again in {math.ceil(self.retry_after)}s"
+
+
+if typing.TYPE_CHECKING:
+    # Only for annotations, importing main at runtime would load it a second time next to __main__
+    from main import AttendanceBot
 
 
 class MainCog(commands.Cog):
     codes = []
 
-    def __init__(self, bot: AttendanceBot):
+    def __init__(self, bot: "AttendanceBot"):
         self.bot = bot
+        # The test server comes from the bot's config, which isn't loaded yet when the class is defined
+        self.ping.add_guild_rollout(bot.test_server)
         self.engine = bot.engine
-        self.bot.loop.create_task(self.clear_codes_older_than_a_day())
-        self.bot.loop.create_task(self.clear_duplicate_codes())
+        self.database = bot.database
+        self.timetable = Timetable()
+        self.code_cache = CodeCache(timetable=self.timetable)
+        self.stats_counters = StatsCounters()
+        self.write_queue = CodeWriteQueue(self.database, window=bot.code_queue_window, max_batch=bot.code_queue_max_batch,
+                                          max_pending=bot.code_queue_max_pending)
+        self.catalogue = CatalogueCache(max_modules=bot.catalogue_cache_size)
+        self.page_cache = PageCache(ttl=bot.page_cache_ttl)
+        self.rate_limiter = RateLimiter(bot.rate_limits, max_buckets=bot.rate_limit_max_buckets)
+        # Autocomplete indexes, one per guild
+        self.module_codes: typing.DefaultDict[int, PrefixIndex] = collections.defaultdict(PrefixIndex)
+        self.lecture_names: typing.DefaultDict[int, PrefixIndex] = collections.defaultdict(PrefixIndex)
+        self.seminar_names: typing.DefaultDict[int, PrefixIndex] = collections.defaultdict(PrefixIndex)
+        # Writes are published here rather than applied to the caches directly, so every process sharing the database
+        # applies them the same way
+        self.changes = bot.change_bus
+        self.change_handlers: typing.Dict[str, typing.Callable[..., typing.Awaitable[None]]] = {
+            "code_added": self.apply_code_added,
+            "code_removed": self.apply_code_removed,
+            "codes_archived": self.apply_codes_archived,
+            "codes_changed": self.apply_codes_changed,
+            "module_added": self.apply_module_added,
+            "module_removed": self.apply_module_removed,
+            "session_added": self.apply_session_added,
+            "session_removed": self.apply_session_removed,
+        }
+        self.changes.subscribe(self.apply_change)
+        self.bot.loop.create_task(self.load_name_indexes())
+        self.bot.loop.create_task(self.load_code_cache())
+        self.scheduler = Scheduler()
+        self.scheduler.add_job("archive_codes_older_than_a_day", self.archive_codes_older_than_a_day,
+                               interval=bot.code_expiry_interval, jitter=bot.maintenance_jitter)
+        self.scheduler.add_job("clear_duplicate_codes", self.clear_duplicate_codes,
+                               interval=bot.duplicate_sweep_interval, jitter=bot.maintenance_jitter)
+        self.scheduler.add_job("reconcile_stats", self.reconcile_stats,
+                               interval=bot.stats_reconcile_interval, jitter=bot.maintenance_jitter)
+        self.scheduler.start(self.bot.loop)
+        self.timetable.start(self.timetable_changed, self.bot.loop)
+        self._invoked_at: typing.Dict[int, float] = {}
+        self.register_metrics()
+
+    def register_metrics(self):
+        metrics = self.bot.metrics
+        self.command_latency = metrics.histogram("attendance_command_latency_seconds", "Time to handle a slash command", ("command",))
+        self.command_db_time = metrics.histogram("attendance_command_db_seconds", "Time a slash command spent in database queries", ("command",))
+        self.command_queries = metrics.histogram("attendance_command_queries", "Database queries run by a slash command", ("command",),
+                                                 buckets=(0, 1, 2, 3, 5, 10, 25, 50))
+        self.command_errors = metrics.counter("attendance_command_errors_total", "Slash commands that raised", ("command",))
+
+        caches = {"code": self.code_cache, "catalogue": self.catalogue, "page": self.page_cache}
+        metrics.counter("attendance_cache_hits_total", "Cache lookups answered from memory", ("cache",),
+                        callback=lambda: {(name,): cache.hits for name, cache in caches.items()})
+        metrics.counter("attendance_cache_misses_total", "Cache lookups that had to go to the database", ("cache",),
+                        callback=lambda: {(name,): cache.misses for name, cache in caches.items()})
+        metrics.gauge("attendance_cache_entries", "Entries held by each cache", ("cache",),
+                      callback=lambda: {(name,): len(cache) for name, cache in caches.items()})
+
+        database = self.database
+        metrics.counter("attendance_db_queries_total", "Statements executed", callback=lambda: database.metrics["queries"])
+        metrics.counter("attendance_db_query_seconds_total", "Time spent executing statements", callback=lambda: database.metrics["query_time_total"])
+        metrics.gauge("attendance_db_connections_checked_out", "Pool connections currently checked out", callback=lambda: len(database.checked_out))
+        metrics.counter("attendance_db_reads_total", "Read-only database work, by where it ran", ("engine",),
+                        callback=lambda: {("replica",): database.metrics["replica_reads"], ("primary",): database.metrics["primary_reads"]})
+        metrics.counter("attendance_db_checkout_wait_seconds_total", "Time spent waiting for a pool connection",
+                        callback=lambda: database.metrics["checkout_wait_total"])
+        metrics.counter("attendance_db_queue_wait_seconds_total", "Time database work waited for a worker thread",
+                        callback=lambda: database.metrics["queue_wait_total"])
+
+        changes = self.changes
+        metrics.counter("attendance_changes_total", "Changes published by this process and received from others", ("direction",),
+                        callback=lambda: {("published",): changes.metrics["published"], ("received",): changes.metrics["received"]})
+
+        write_queue = self.write_queue
+        metrics.gauge("attendance_write_queue_depth", "Code submissions waiting to be written", callback=lambda: write_queue.depth)
+        metrics.counter("attendance_write_queue_submitted_total", "Code submissions queued", callback=lambda: write_queue.metrics["submitted"])
+        metrics.counter("attendance_write_queue_merged_total", "Code submissions merged into an identical one", callback=lambda: write_queue.metrics["merged"])
+        metrics.counter("attendance_write_queue_flushes_total", "Transactions written by the queue", callback=lambda: write_queue.metrics["flushes"])
+
+        rate_limiter = self.rate_limiter
+        metrics.counter("attendance_rate_limited_total", "Slash commands turned away by the rate limiter", ("command", "scope"),
+                        callback=lambda: {key: count for key, count in rate_limiter.rejections.items()})
+        metrics.gauge("attendance_rate_limit_buckets", "Token buckets held by the rate limiter", callback=lambda: len(rate_limiter))
+
+        timetable = self.timetable
+        metrics.gauge("attendance_timetable_sessions", "Scheduled lectures and seminars that haven't ended, and those on now", ("state",),
+                      callback=lambda: {(state,): count for state, count in timetable.stats().items()})
+
+        jobs = self.scheduler.jobs
+        metrics.counter("attendance_job_runs_total", "Maintenance job runs", ("job",), callback=lambda: {(name,): job.runs for name, job in jobs.items()})
+        metrics.gauge("attendance_job_last_duration_seconds", "Duration of each maintenance job's last run", ("job",),
+                      callback=lambda: {(name,): job.last_run.duration for name, job in jobs.items() if job.last_run is not None})
+
+    def cog_unload(self):
+        self.changes.unsubscribe(self.apply_change)
+        self.scheduler.stop()
+        self.timetable.stop()
+        self.bot.loop.create_task(self.write_queue.close())
+
+    async def shutdown(self):
+        """
+        Called by AttendanceBot.close, so queued codes are written before the process exits
+        """
+        self.changes.unsubscribe(self.apply_change)
+        self.scheduler.stop()
+        self.timetable.stop()
+        await self.write_queue.close()
+
+    async def cog_application_command_check(self, interaction: nextcord.Interaction) -> bool:
+        # Runs before the before invoke hook, so a rejected call never reaches the database
+        rejected = self.rate_limiter.acquire(interaction.application_command.name, interaction.user.id, interaction.guild_id)
+        if rejected is not None:
+            raise RateLimited(*rejected)
+        return True
+
+    async def cog_application_command_before_invoke(self, interaction: nextcord.Interaction):
+        current_interaction.set(interaction.id)
+        self.database.track_interaction(interaction.id)
+        self._invoked_at[interaction.id] = time.perf_counter()
+
+    async def cog_application_command_after_invoke(self, interaction: nextcord.Interaction):
+        command = interaction.application_command.name
+        invoked_at = self._invoked_at.pop(interaction.id, None)
+        if invoked_at is not None:
+            self.command_latency.observe(time.perf_counter() - invoked_at, command=command)
+        queries_run, db_time = self.database.untrack_interaction(interaction.id)
+        self.command_queries.observe(queries_run, command=command)
+        self.command_db_time.observe(db_time, command=command)
+
+        if not self.database.debug:
+            return
+        leaked = self.database.checked_out_by(interaction.id)
+        if leaked:
+            print(f"/{interaction.application_command.name} finished with {len(leaked)} connection(s) still checked out: "
+                  + ", ".join(f"{connection.thread_name} for {time.perf_counter() - connection.checked_out_at:.3f}s" for connection in leaked))
+
+    @commands.Cog.listener()
+    async def on_application_command_error(self, interaction: nextcord.Interaction, error: Exception):
+        # AttendanceBot.on_application_command_error replies to rate limited calls, they aren't errors
+        if isinstance(error, RateLimited):
+            return
+        if interaction.application_command is not None:
+            self.command_errors.inc(command=interaction.application_command.name)
+
+    @commands.Cog.listener()
+    async def on_interaction(self, interaction: nextcord.Interaction):
+        if interaction.type != nextcord.InteractionType.component or interaction.data is None:
+            return
+        selection = CodeSelection.parse(interaction.data.get("custom_id", ""))
+        values = interaction.data.get("values")
+        if selection is None or not values or not values[0].isdigit():
+            return
+        await self.code_selected(interaction, selection, int(values[0]))
+
+    async def code_selected(self, interaction: nextcord.Interaction, selection: CodeSelection, session_id: int):
+        """
+        Adds the code once a lecture/seminar is picked from an AddCodeView dropdown, whenever it was sent
+        """
+        module = self.catalogue.get_module_by_id(selection.module_id)
+        if module is None or module.guild_id != interaction.guild_id:
+            module = await self.database.read(interaction.guild_id, queries.get_module_by_id, interaction.guild_id, selection.module_id)
+            if module is None:
+                await interaction.response.send_message("Module does not exist")
+                return
+            self.catalogue.put_module(module)
 
-    async def get_module(self, module_code: str, interaction: nextcord.Interaction) -> typing.Union[Module, None]:
-        stmt = select(Module).where(Module.module_code == module_code)
-        session = Session(self.engine)
-        module = session.execute(stmt).scalars().first()
+        sessions = await (self.get_lectures(module) if selection.kind == "lecture" else self.get_seminars(module))
+        session = next((session for session in sessions if session.id == session_id), None)
+        if session is None:
+            await interaction.response.send_message("Seminar or lecture does not exist. Please ask an admin to create it")
+            return
+        lecture_id, seminar_id = (session.id, None) if selection.kind == "lecture" else (None, session.id)
+        # Anything the cache holds is already stored, so no need to ask the database
+        if self.code_cache.contains(module.id, pack_code(selection.code), lecture_id, seminar_id):
+            await interaction.response.send_message("Code already exists")
+            return
+
+        try:
+            status, obj_code = await self.write_queue.submit(module.guild_id, selection.code, module.id, selection.kind, session.id)
+        except Exception as e:
+            # Only this submission failed, the queue retries the rest of its batch one by one
+            print(f"Adding code {selection.code} to module {module.id} failed: {e!r}")
+            await interaction.response.send_message("Couldn't add the code, please try again")
+            return
+        # Read your writes: the guild's next reads come from the primary, which has the code even if the replicas don't yet
+        self.database.wrote(module.guild_id)
+        if status == queries.MISSING:
+            await interaction.response.send_message("Seminar or lecture does not exist. Please ask an admin to create it")
+            return
+        if status == queries.EXISTS:
+            await interaction.response.send_message("Code already exists")
+            return
+        await self.changes.publish("code_added", module.guild_id, code=queries.live_code(obj_code, session.name, module.name).encode(),
+                                   module_code=module.module_code)
+        await interaction.response.send_message(f"Added code! {selection.code} for {module.name}")
+
+    async def apply_change(self, change: Change):
+        """
+        Brings this process's caches up to date with a write, made here or by another process sharing the database
+        """
+        if change.origin != self.changes.origin and change.guild_id is not None:
+            # The primary has the write even if this process's replicas don't yet
+            self.database.wrote(change.guild_id)
+        handler = self.change_handlers.get(change.kind)
+        # Anything else is from a newer version of the bot, running alongside this one during a deploy
+        if handler is not None:
+            await handler(change.guild_id, **change.data)
+
+    async def apply_code_added(self, guild_id: int, code: dict, module_code: str):
+        live_code = LiveCode.decode(code)
+        self.code_cache.add(live_code)
+        self.stats_counters.code_added(guild_id, module_code, live_code.created_at)
+
+    async def apply_code_removed(self, guild_id: int, code_id: int, module_code: str):
+        self.code_cache.remove(code_id)
+        self.stats_counters.code_removed(guild_id, module_code)
+
+    async def apply_codes_archived(self, guild_id: typing.Optional[int], cutoff: str):
+        # The cache would otherwise still turn them away as existing
+        self.code_cache.remove_older_than(datetime.datetime.fromisoformat(cutoff))
+        self.stats_counters.invalidate()
+
+    async def apply_codes_changed(self, guild_id: typing.Optional[int], recount: bool):
+        # Too many, or too involved, to apply one by one
+        await self.load_code_cache()
+        if recount:
+            self.stats_counters.invalidate(guild_id)
+
+    async def apply_module_added(self, guild_id: int, module_code: str):
+        self.stats_counters.add(guild_id, "modules")
+        self.module_codes[guild_id].add(module_code)
+        self.page_cache.invalidate(("modules", guild_id))
+
+    async def apply_module_removed(self, guild_id: int, module_id: int):
+        self.catalogue.invalidate_module(module_id)
+        for listing in (("modules", guild_id), ("lectures", module_id), ("seminars", module_id)):
+            self.page_cache.invalidate(listing)
+        # The module's lectures and seminars went with it
+        self.bot.loop.create_task(self.load_name_indexes())
+        self.timetable.unschedule_module(module_id)
+        self.code_cache.remove_module(module_id)
+        self.stats_counters.invalidate(guild_id)
+
+    async def apply_session_added(self, guild_id: int, kind: str, module_id: int, name: str, scheduled: typing.Optional[dict]):
+        if scheduled is not None:
+            self.timetable.schedule(ScheduledSession.decode(scheduled))
+        if kind == "lecture":
+            self.catalogue.invalidate_lectures(module_id)
+            self.lecture_names[guild_id].add(name)
+        else:
+            self.catalogue.invalidate_seminars(module_id)
+            self.seminar_names[guild_id].add(name)
+        self.page_cache.invalidate((f"{kind}s", module_id))
+        self.stats_counters.add(guild_id, f"{kind}s")
+
+    async def apply_session_removed(self, guild_id: int, kind: str, session_id: int, module_id: int, name: str):
+        if kind == "lecture":
+            self.catalogue.invalidate_lectures(module_id)
+            self.lecture_names[guild_id].remove(name)
+            self.code_cache.remove_lecture(session_id)
+        else:
+            self.catalogue.invalidate_seminars(module_id)
+            self.seminar_names[guild_id].remove(name)
+            self.code_cache.remove_seminar(session_id)
+        self.page_cache.invalidate((f"{kind}s", module_id))
+        self.timetable.unschedule((kind, session_id))
+        self.stats_counters.invalidate(guild_id)
+
+    async def get_module(self, module_code: str, interaction: nextcord.Interaction) -> typing.Union[ModuleRecord, None]:
+        module = self.catalogue.get_module(interaction.guild_id, module_code)
+        if module is None:
+            module = await self.database.read(interaction.guild_id, queries.get_module, interaction.guild_id, module_code)
+            if module is not None:
+                self.catalogue.put_module(module)
 
         if module is None:
             await interaction.response.send_message("Module does not exist")
             return
         return module
 
-    async def clear_codes_older_than_a_day(self):
-        with Session(self.engine) as session:
-            stmt = select(Code).where(Code.created_at < datetime.datetime.now() - datetime.timedelta(days=1))
-            codes = session.execute(stmt).scalars().all()
-            for code in codes:
-                session.delete(code)
-            session.commit()
-
-        await asyncio.sleep(60 * 60 * 24)
-
-    async def clear_duplicate_codes(self):
-        with Session(self.engine) as session:
-            codes = session.execute(select(Code)).scalars().all()
-            for code in codes:
-                stmt = select(Code).where(Code.code == code.code)
-                codes = session.execute(stmt).scalars().all()
-                if len(codes) > 1:
-                    for i_code in codes[1:]:
-                        session.delete(i_code)
-            session.commit()
-
-        await asyncio.sleep(60 * 60 * 24)
-
-    async def get_number_of_modules(self):
-        with Session(self.engine) as session:
-            return len(session.execute(select(Module)).all())
-
-    async def get_number_of_codes(self):
-        with Session(self.engine) as session:
-            return len(session.execute(select(Code)).all())
-
-    async def get_number_of_seminars(self):
-        with Session(self.engine) as session:
-            return len(session.execute(select(Seminar)).all())
-
-    async def get_number_of_lectures(self):
-        with Session(self.engine) as session:
-            return len(session.execute(select(Lecture)).all())
-
-    @nextcord.slash_command(name="ping", guild_ids=[AttendanceBot.test_server])
+    async def get_lectures(self, module: ModuleRecord) -> typing.Tuple[LectureRecord, ...]:
+        lectures = self.catalogue.get_lectures(module.id)
+        if lectures is None:
+            lectures = tuple(await self.database.read(module.guild_id, queries.get_lectures, module.guild_id, module.id))
+            self.catalogue.put_lectures(module.id, lectures)
+        return lectures
+
+    async def get_seminars(self, module: ModuleRecord) -> typing.Tuple[SeminarRecord, ...]:
+        seminars = self.catalogue.get_seminars(module.id)
+        if seminars is None:
+            seminars = tuple(await self.database.read(module.guild_id, queries.get_seminars, module.guild_id, module.id))
+            self.catalogue.put_seminars(module.id, seminars)
+        return seminars
+
+    async def load_name_indexes(self):
+        catalogue_names = await self.database.run(queries.get_catalogue_names)
+        for indexes, rows in zip((self.module_codes, self.lecture_names, self.seminar_names), catalogue_names):
+            names_by_guild = collections.defaultdict(list)
+            for guild_id, name in rows:
+                names_by_guild[guild_id].append(name)
+            indexes.clear()
+            for guild_id, names in names_by_guild.items():
+                indexes[guild_id].rebuild(names)
+
+    async def load_code_cache(self):
+        now = self.timetable.clock()
+        # The timetable first, the cache keeps the codes of sessions on it
+        self.timetable.rebuild(await self.database.run(queries.get_scheduled_sessions, now))
+        codes = await self.database.run(queries.get_live_codes, self.code_cache.cutoff(), now)
+        self.code_cache.rebuild(codes)
+        return codes
+
+    def timetable_changed(self, started: typing.List[ScheduledSession], ended: typing.List[ScheduledSession]):
+        for session in ended:
+            if session.kind == "lecture":
+                self.code_cache.session_ended(session.id, None)
+            else:
+                self.code_cache.session_ended(None, session.id)
+
+    async def archive_codes_older_than_a_day(self) -> int:
+        self.code_cache.evict_expired()
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+        archived = await self.database.run(queries.archive_codes_older_than, cutoff)
+        if archived > 0:
+            await self.changes.publish("codes_archived", None, cutoff=cutoff.isoformat())
+        return archived
+
+    async def clear_duplicate_codes(self) -> int:
+        removed = await self.database.run(queries.clear_duplicate_codes)
+        if removed > 0:
+            await self.changes.publish("codes_changed", None, recount=True)
+        return removed
+
+    async def reconcile_stats(self) -> int:
+        """
+        Measures the database and marks every guild's counters stale, so each is reconciled on its next /stats
+        rather than all of them at once here
+        """
+        self.stats_counters.measured(await self.database.read(None, queries.get_database_size))
+        return self.stats_counters.invalidate()
+
+    async def reconcile_guild_stats(self, guild_id: int):
+        # Anything counted while the query runs may be missing from its snapshot, so go again until nothing changed
+        for _ in range(3):
+            day = self.stats_counters.clock().date()
+            version = self.stats_counters.version(guild_id)
+            counts, codes_per_module, code_times = await self.database.read(guild_id, queries.get_stats, guild_id, day)
+            self.stats_counters.reconcile(guild_id, counts, codes_per_module, code_times, day)
+            if self.stats_counters.version(guild_id) == version:
+                break
+
+    @staticmethod
+    async def parse_schedule(interaction: nextcord.Interaction, starts_at: typing.Optional[str], minutes: int) \
+            -> typing.Union[typing.Tuple[typing.Optional[datetime.datetime], typing.Optional[datetime.datetime]], None]:
+        """
+        Turns the starts_at and minutes options into start and end times, (None, None) if no start was given,
+        or None after telling the user what's wrong with them
+        """
+        if starts_at is None:
+            return None, None
+        try:
+            start = datetime.datetime.strptime(starts_at.strip(), START_FORMAT)
+        except ValueError:
+            await interaction.response.send_message("Start time must look like 2023-01-31 14:00 (UTC)")
+            return None
+        if minutes <= 0:
+            await interaction.response.send_message("A session must last at least a minute")
+            return None
+        return start, start + datetime.timedelta(minutes=minutes)
+
+    def paginator(self, interaction: nextcord.Interaction, listing: tuple, fetch: Fetch, render: Render, cached: bool = True,
+                  key: typing.Callable = operator.attrgetter("id")) -> PaginatorView:
+        return PaginatorView(interaction.user.id, listing, fetch, render, page_cache=self.page_cache if cached else None,
+                             page_size=self.bot.page_size, key=key)
+
+    @nextcord.slash_command(name="ping")
     async def ping(self, interaction: nextcord.Interaction):
         await interaction.response.send_message("Pong!")
 
-    @nextcord.slash_command("stats")
+    @nextcord.slash_command(name="stats", dm_permission=False)
     async def stats(self, interaction: nextcord.Interaction):
         """
         Shows the stats of the bot
         """
-        number_of_modules = await self.get_number_of_modules()
-        number_of_lectures = await self.get_number_of_lectures()
-        number_of_seminars = await self.get_number_of_seminars()
-        number_of_codes = await self.get_number_of_codes()
-        embed = nextcord.Embed(title="Stats", description="Shows the stats of the bot", color=nextcord.Color.green())
-        embed.add_field(name="Number of modules", value=number_of_modules, inline=False)
-        embed.add_field(name="Number of lectures", value=number_of_lectures, inline=False)
-        embed.add_field(name="Number of seminars", value=number_of_seminars, inline=False)
-        embed.add_field(name="Number of codes", value=number_of_codes, inline=False)
+        if self.stats_counters.measured_at is None:
+            await self.reconcile_stats()
+        guild_stats = self.stats_counters.get(interaction.guild_id)
+        if guild_stats is None:
+            await self.reconcile_guild_stats(interaction.guild_id)
+            guild_stats = self.stats_counters.guilds[interaction.guild_id]
+        counts = guild_stats.counts
+        codes_per_module = self.stats_counters.guild_codes_per_module(interaction.guild_id)
+        codes_per_hour = self.stats_counters.hourly(interaction.guild_id)
+        database_size = self.stats_counters.database_size
+        code_cache = self.code_cache.stats()
+        catalogue = self.catalogue.stats()
+        pool = self.database.pool_stats()
+        # The counts are this server's. Everything marked bot-wide is shared with every other server the bot is in
+        embed = nextcord.Embed(title="Stats", description="Shows the stats of the bot for this server", color=nextcord.Color.green())
+        embed.add_field(name="Number of modules", value=counts["modules"], inline=False)
+        embed.add_field(name="Number of lectures", value=counts["lectures"], inline=False)
+        embed.add_field(name="Number of seminars", value=counts["seminars"], inline=False)
+        embed.add_field(name="Number of codes", value=counts["codes"], inline=False)
+        embed.add_field(name="Codes per module", value="\n".join(f"{module_code}: {count}" for module_code, count in codes_per_module) or "N/A", inline=False)
+        embed.add_field(name="Codes posted per hour today (UTC)", value=", ".join(f"{hour:02d}:00 {count}" for hour, count in codes_per_hour.items()) or "N/A", inline=False)
+        embed.add_field(name="Database size (bot-wide)", value="N/A" if database_size is None else f"{database_size / 1024 / 1024:.2f} MB", inline=False)
+        embed.add_field(name="Code cache (bot-wide)", value=f"{code_cache['size']} live, {code_cache['hits']} hits, {code_cache['misses']} misses", inline=False)
+        embed.add_field(name="Catalogue cache (bot-wide)", value=f"{catalogue['size']} modules, {catalogue['hits']} hits, {catalogue['misses']} misses", inline=False)
+        embed.add_field(name="Database pool (bot-wide)", value=f"{pool['checked_out']} checked out (peak {pool['peak_checked_out']}), "
+                                                    f"{pool['checkouts']} checkouts, max wait {pool['checkout_wait_max'] * 1000:.1f}ms", inline=False)
+        if pool["replica_pools"]:
+            embed.add_field(name="Read replicas (bot-wide)", value=f"{len(pool['replica_pools'])} replica(s), {pool['replica_reads']} reads on them, "
+                                                        f"{pool['primary_reads']} kept on the primary", inline=False)
+        rate_limiter = self.rate_limiter.stats()
+        embed.add_field(name="Rate limiting (bot-wide)", value=f"{rate_limiter['rejected']} rejected, {rate_limiter['allowed']} allowed, "
+                                                    f"{rate_limiter['buckets']} buckets", inline=False)
+        timetable = self.timetable.stats()
+        embed.add_field(name="Timetable (bot-wide)", value=f"{timetable['scheduled']} sessions to come or on, {timetable['active']} on now", inline=False)
+        changes = self.changes.stats()
+        embed.add_field(name="Change bus (bot-wide)", value=f"{type(self.changes).__name__}, {changes['published']} published, {changes['received']} received, "
+                                                 f"{changes['failed']} failed", inline=False)
+        write_queue = self.write_queue.stats()
+        embed.add_field(name="Code write queue (bot-wide)", value=f"{write_queue['depth']} queued, {write_queue['submitted']} submitted, {write_queue['merged']} merged, "
+                                                       f"{write_queue['flushes']} flushes (largest {write_queue['largest_flush']})", inline=False)
+        for job in self.scheduler.jobs.values():
+            last_run = "never run" if job.last_run is None else \
+                f"last run {job.last_run.rows} rows in {job.last_run.duration * 1000:.1f}ms" + (" (failed)" if job.last_run.error else "")
+            embed.add_field(name=f"Job {job.name} (bot-wide)", value=f"{job.runs} runs, {last_run}", inline=False)
         embed.set_footer(text=f"Requested by {interaction.user.name}#{interaction.user.discriminator}", icon_url=interaction.user.display_avatar.url)
         await interaction.response.send_message(embed=embed)
 
@@ -106,7 +487,7 @@ class MainCog(commands.Cog):
         """
         await interaction.response.send_message("https://github.com/Scot-Survivor/AttendanceCodeBot")
 
-    @nextcord.slash_command(name="codes")
+    @nextcord.slash_command(name="codes", dm_permission=False)
     async def codes(self, interaction: nextcord.Interaction):
         """
         Lists all attendance codes
@@ -117,23 +498,21 @@ class MainCog(commands.Cog):
             The interaction object
         :return:
         """
-        now = datetime.datetime.utcnow()
-        hour_forward = now + datetime.timedelta(hours=1)
-        hour_2_ago = now - datetime.timedelta(hours=2)
-        stmt = select(Code).filter(Code.created_at.between(hour_2_ago, hour_forward))
-        session = Session(self.engine)
-        codes = session.execute(stmt).scalars().all()
-        embed = nextcord.Embed(title="Attendance Codes", description="List of all attendance codes", color=0x00ff00)
-        for code in codes:
-            lecture_seminar = None
-            if code.lecture_id is not None:
-                lecture_seminar = session.execute(select(Lecture).where(Lecture.id == code.lecture_id)).scalars().first()
-            elif code.seminar_id is not None:
-                lecture_seminar = session.execute(select(Seminar).where(Seminar.id == code.seminar_id)).scalars().first()
-            embed.add_field(name=lecture_seminar.name, value=code.code, inline=False)
-        await interaction.response.send_message(embed=embed)
+        codes = self.code_cache.get_codes(interaction.guild_id)
+        if codes is None:
+            await self.load_code_cache()
+            codes = self.code_cache.get_codes(interaction.guild_id)
+
+        def render(page):
+            embed = nextcord.Embed(title="Attendance Codes", description="List of all attendance codes", color=0x00ff00)
+            for code in page:
+                embed.add_field(name=code.name, value=code.code, inline=False)
+            return embed
 
-    @nextcord.slash_command(name="addcode")
+        # Already in memory and changing every few seconds, so not worth a page cache
+        await self.paginator(interaction, ("codes", interaction.guild_id), sequence_fetch(codes), render, cached=False).start(interaction)
+
+    @nextcord.slash_command(name="addcode", dm_permission=False)
     async def addcode(self, interaction: nextcord.Interaction, code: str, module_code: str,
                       is_seminar_lecture: int = nextcord.SlashOption(
                           name="is_seminar_lecture",
@@ -160,35 +539,35 @@ class MainCog(commands.Cog):
             "Introduction to OOP Lecture 1"
         :return:
         """
+        normalised = normalise_code(code)
+        if normalised is None:
+            await interaction.response.send_message(f"Codes are 1 to {CODE_LENGTH} letters and digits")
+            return
+        code = normalised
 
         module = await self.get_module(module_code, interaction)
-        session = Session(self.engine)
-
-        # Send a button to get Seminar/Lecture
-        view = None
-        if is_seminar_lecture == 1:
-            # Send a button to get Seminar
-            stmt = select(Seminar).where(Seminar.module_id == module.id)
-            seminars = session.execute(stmt).scalars().all()
-            if len(seminars) == 0:
-                await interaction.response.send_message("Module has no seminars")
-                return
-            view = AddCodeView(code, engine=self.engine, seminars=seminars, module=module)
-        elif is_seminar_lecture == 2:
-            # Send a button to get Lecture
-            stmt = select(Lecture).where(Lecture.module_id == module.id)
-            lectures = session.execute(stmt).scalars().all()
-            if len(lectures) == 0:
-                await interaction.response.send_message("Module has no lectures")
-                return
-            view = AddCodeView(code, engine=self.engine, lectures=lectures, module=module)
-        else:
+        if module is None:
+            return
+
+        if is_seminar_lecture not in (1, 2):
             await interaction.response.send_message("Invalid option")
             return
+        # Send a dropdown to get Seminar/Lecture
+        kind = "seminar" if is_seminar_lecture == 1 else "lecture"
+        sessions = await (self.get_seminars(module) if kind == "seminar" else self.get_lectures(module))
+        if len(sessions) == 0:
+            await interaction.response.send_message(f"Module has no {kind}s")
+            return
+        if len(sessions) > MAX_SESSIONS:
+            await interaction.response.send_message(f"Module has {len(sessions)} {kind}s, more than the {MAX_SESSIONS} that can be listed to pick from")
+            return
+        view = AddCodeView(CodeSelection(kind, module.id, code), sessions)
 
         await interaction.response.send_message("Select a seminar/lecture", view=view)
+        # on_interaction handles the selection from the custom_id, so the view needn't be kept around
+        view.stop()
 
-    @nextcord.slash_command(name="seminars")
+    @nextcord.slash_command(name="seminars", dm_permission=False)
     async def seminars(self, interaction: nextcord.Interaction, module_code: str):
         """
         Lists all seminars for a module
@@ -202,16 +581,20 @@ class MainCog(commands.Cog):
         :return:
         """
         module = await self.get_module(module_code, interaction)
-        session = Session(self.engine)
+        if module is None:
+            return
 
-        stmt = select(Seminar).where(Seminar.module_id == module.id)
-        seminars = session.execute(stmt).scalars().all()
-        embed = nextcord.Embed(title="Seminars", description=f"List of all seminars for {module.name}", color=0x00ff00)
-        for seminar in seminars:
-            embed.add_field(name=seminar.name, value="ID: " + str(seminar.id), inline=False)
-        await interaction.response.send_message(embed=embed)
+        def render(page):
+            embed = nextcord.Embed(title="Seminars", description=f"List of all seminars for {module.name}", color=0x00ff00)
+            for seminar in page:
+                embed.add_field(name=seminar.name, value="ID: " + str(seminar.id), inline=False)
+            return embed
+
+        async def fetch(after, limit):
+            return await self.database.read(module.guild_id, queries.get_seminars_page, module.guild_id, module.id, after, limit)
+        await self.paginator(interaction, ("seminars", module.id), fetch, render).start(interaction)
 
-    @nextcord.slash_command(name="lectures")
+    @nextcord.slash_command(name="lectures", dm_permission=False)
     async def lectures(self, interaction: nextcord.Interaction, module_code: str):
         """
         Lists all lectures for a module
@@ -225,16 +608,20 @@ class MainCog(commands.Cog):
         :return:
         """
         module = await self.get_module(module_code, interaction)
-        session = Session(self.engine)
+        if module is None:
+            return
 
-        stmt = select(Lecture).where(Lecture.module_id == module.id)
-        lectures = session.execute(stmt).scalars().all()
-        embed = nextcord.Embed(title="Lectures", description=f"List of all lectures for {module.name}", color=0x00ff00)
-        for lecture in lectures:
-            embed.add_field(name=lecture.name, value="ID: " + str(lecture.id), inline=False)
-        await interaction.response.send_message(embed=embed)
+        def render(page):
+            embed = nextcord.Embed(title="Lectures", description=f"List of all lectures for {module.name}", color=0x00ff00)
+            for lecture in page:
+                embed.add_field(name=lecture.name, value="ID: " + str(lecture.id), inline=False)
+            return embed
 
-    @nextcord.slash_command(name="addmodule", default_member_permissions=nextcord.Permissions(administrator=True))
+        async def fetch(after, limit):
+            return await self.database.read(module.guild_id, queries.get_lectures_page, module.guild_id, module.id, after, limit)
+        await self.paginator(interaction, ("lectures", module.id), fetch, render).start(interaction)
+
+    @nextcord.slash_command(name="addmodule", dm_permission=False, default_member_permissions=nextcord.Permissions(administrator=True))
     async def addmodule(self, interaction: nextcord.Interaction, name: str, module_code: str, description: str = ""):
         """
         Adds a new module: Admin only
@@ -249,14 +636,14 @@ class MainCog(commands.Cog):
             The module code, I.E COMP38200
         :return:
         """
-        with Session(self.engine) as session:
-            obj_module = Module(name=name, module_code=module_code, description=description)
-            session.add(obj_module)
-            session.commit()
+        await self.database.write(interaction.guild_id, queries.add_module, interaction.guild_id, name, module_code, description)
+        await self.changes.publish("module_added", interaction.guild_id, module_code=module_code)
         await interaction.response.send_message(f"Added module! {name}")
 
-    @nextcord.slash_command(name="addseminar", default_member_permissions=nextcord.Permissions(administrator=True))
-    async def addseminar(self, interaction: nextcord.Interaction, name: str, module_code: str):
+    @nextcord.slash_command(name="addseminar", dm_permission=False, default_member_permissions=nextcord.Permissions(administrator=True))
+    async def addseminar(self, interaction: nextcord.Interaction, name: str, module_code: str,
+                         starts_at: str = nextcord.SlashOption(required=False, default=None, description="When it starts, UTC, as YYYY-MM-DD HH:MM"),
+                         minutes: int = nextcord.SlashOption(required=False, default=60, description="How long it lasts")):
         """
         Adds a new seminar: Admin only
 
@@ -268,18 +655,29 @@ class MainCog(commands.Cog):
             The name of the seminar
         module_code: str
             The module code, I.E COMP38200
+        starts_at: str
+            Optionally when the seminar starts, UTC, I.E "2023-01-31 14:00". /codes shows its codes while it's on
+        minutes: int
+            How long the seminar lasts, if it has a start time
         :return:
         """
+        schedule = await self.parse_schedule(interaction, starts_at, minutes)
+        if schedule is None:
+            return
         module = await self.get_module(module_code, interaction)
+        if module is None:
+            return
 
-        with Session(self.engine) as session:
-            obj_seminar = Seminar(name=name, module_id=module.id)
-            session.add(obj_seminar)
-            session.commit()
+        obj_seminar = await self.database.write(module.guild_id, queries.add_seminar, module.guild_id, name, module.id, *schedule)
+        scheduled = queries.scheduled_session("seminar", obj_seminar)
+        await self.changes.publish("session_added", module.guild_id, kind="seminar", module_id=module.id, name=name,
+                                   scheduled=None if scheduled is None else scheduled.encode())
         await interaction.response.send_message(f"Added seminar! {name}")
 
-    @nextcord.slash_command(name="addlecture", default_member_permissions=nextcord.Permissions(administrator=True))
-    async def addlecture(self, interaction: nextcord.Interaction, name: str, module_code: str):
+    @nextcord.slash_command(name="addlecture", dm_permission=False, default_member_permissions=nextcord.Permissions(administrator=True))
+    async def addlecture(self, interaction: nextcord.Interaction, name: str, module_code: str,
+                         starts_at: str = nextcord.SlashOption(required=False, default=None, description="When it starts, UTC, as YYYY-MM-DD HH:MM"),
+                         minutes: int = nextcord.SlashOption(required=False, default=60, description="How long it lasts")):
         """
         Adds a new lecture: Admin only
 
@@ -291,17 +689,26 @@ class MainCog(commands.Cog):
             The name of the lecture
         module_code: str
             The module code, I.E COMP38200
+        starts_at: str
+            Optionally when the lecture starts, UTC, I.E "2023-01-31 14:00". /codes shows its codes while it's on
+        minutes: int
+            How long the lecture lasts, if it has a start time
         :return:
         """
+        schedule = await self.parse_schedule(interaction, starts_at, minutes)
+        if schedule is None:
+            return
         module = await self.get_module(module_code, interaction)
+        if module is None:
+            return
 
-        with Session(self.engine) as session:
-            obj_lecture = Lecture(name=name, module_id=module.id)
-            session.add(obj_lecture)
-            session.commit()
+        obj_lecture = await self.database.write(module.guild_id, queries.add_lecture, module.guild_id, name, module.id, *schedule)
+        scheduled = queries.scheduled_session("lecture", obj_lecture)
+        await self.changes.publish("session_added", module.guild_id, kind="lecture", module_id=module.id, name=name,
+                                   scheduled=None if scheduled is None else scheduled.encode())
         await interaction.response.send_message(f"Added lecture! {name}")
 
-    @nextcord.slash_command(name="modules")
+    @nextcord.slash_command(name="modules", dm_permission=False)
     async def modules(self, interaction: nextcord.Interaction):
         """
         Lists all courses
@@ -312,15 +719,17 @@ class MainCog(commands.Cog):
             The interaction object
         :return:
         """
-        stmt = select(Module)
-        session = Session(self.engine)
-        modules = session.execute(stmt).scalars().all()
-        embed = nextcord.Embed(title="Modules", description="List of all modules", color=0x00ff00)
-        for module in modules:
-            embed.add_field(name=module.name + " : " + module.module_code, value="N/A" if module.description == "" else module.description, inline=False)
-        await interaction.response.send_message(embed=embed)
+        def render(page):
+            embed = nextcord.Embed(title="Modules", description="List of all modules", color=0x00ff00)
+            for module in page:
+                embed.add_field(name=module.name + " : " + module.module_code, value="N/A" if module.description == "" else module.description, inline=False)
+            return embed
+
+        async def fetch(after, limit):
+            return await self.database.read(interaction.guild_id, queries.get_modules_page, interaction.guild_id, after, limit)
+        await self.paginator(interaction, ("modules", interaction.guild_id), fetch, render).start(interaction)
 
-    @nextcord.slash_command(name="removemodule", default_member_permissions=nextcord.Permissions(administrator=True))
+    @nextcord.slash_command(name="removemodule", dm_permission=False, default_member_permissions=nextcord.Permissions(administrator=True))
     async def removemodule(self, interaction: nextcord.Interaction, module_code: str):
         """
         Removes a module: Admin only
@@ -333,14 +742,14 @@ class MainCog(commands.Cog):
             The module (by code) to remove
         :return:
         """
-        with Session(self.engine) as session:
-            stmt = select(Module).where(Module.module_code == module_code)
-            module = session.execute(stmt).scalars().first()
-            session.delete(module)
-            session.commit()
+        module = await self.database.write(interaction.guild_id, queries.remove_module, interaction.guild_id, module_code)
+        if module is None:
+            await interaction.response.send_message("Module does not exist")
+            return
+        await self.changes.publish("module_removed", module.guild_id, module_id=module.id)
         await interaction.response.send_message(f"Removed module! {module_code}")
 
-    @nextcord.slash_command(name="removecode", default_member_permissions=nextcord.Permissions(administrator=True))
+    @nextcord.slash_command(name="removecode", dm_permission=False, default_member_permissions=nextcord.Permissions(administrator=True))
     async def removecode(self, interaction: nextcord.Interaction, code: str, module_code: str):
         """
         Removes a code: Admin only
@@ -355,16 +764,22 @@ class MainCog(commands.Cog):
             The module the code is for
         :return:
         """
-        with Session(self.engine) as session:
-            stmt = select(Module).where(Module.module_code == module_code)
-            module = session.execute(stmt).scalars().first()
-            stmt = select(Code).where(Code.code == code)
-            code = session.execute(stmt).scalars().first()
-            session.delete(code)
-            session.commit()
+        code = normalise_code(code)
+        if code is None:
+            await interaction.response.send_message("Code does not exist")
+            return
+        module = await self.get_module(module_code, interaction)
+        if module is None:
+            return
+
+        obj_code = await self.database.write(module.guild_id, queries.remove_code, module.guild_id, code, module.id)
+        if obj_code is None:
+            await interaction.response.send_message("Code does not exist")
+            return
+        await self.changes.publish("code_removed", module.guild_id, code_id=obj_code.id, module_code=module.module_code)
         await interaction.response.send_message(f"Removed code! {code} for {module.name}")
 
-    @nextcord.slash_command(name="removelecture", default_member_permissions=nextcord.Permissions(administrator=True))
+    @nextcord.slash_command(name="removelecture", dm_permission=False, default_member_permissions=nextcord.Permissions(administrator=True))
     async def removelecture(self, interaction: nextcord.Interaction, lecture_name: str):
         """
         Removes a lecture: Admin only
@@ -377,14 +792,15 @@ class MainCog(commands.Cog):
             The name of the lecture to remove
         :return:
         """
-        with Session(self.engine) as session:
-            stmt = select(Lecture).where(Lecture.name == lecture_name)
-            lecture = session.execute(stmt).scalars().first()
-            session.delete(lecture)
-            session.commit()
+        lecture = await self.database.write(interaction.guild_id, queries.remove_lecture, interaction.guild_id, lecture_name)
+        if lecture is None:
+            await interaction.response.send_message("Lecture does not exist")
+            return
+        await self.changes.publish("session_removed", lecture.guild_id, kind="lecture", session_id=lecture.id, module_id=lecture.module_id,
+                                   name=lecture.name)
         await interaction.response.send_message(f"Removed lecture! {lecture_name}")
 
-    @nextcord.slash_command(name="removeseminar", default_member_permissions=nextcord.Permissions(administrator=True))
+    @nextcord.slash_command(name="removeseminar", dm_permission=False, default_member_permissions=nextcord.Permissions(administrator=True))
     async def removeseminar(self, interaction: nextcord.Interaction, seminar_name: str):
         """
         Removes a seminar: Admin only
@@ -397,13 +813,117 @@ class MainCog(commands.Cog):
             The name of the seminar to remove
         :return:
         """
-        with Session(self.engine) as session:
-            stmt = select(Seminar).where(Seminar.name == seminar_name)
-            seminar = session.execute(stmt).scalars().first()
-            session.delete(seminar)
-            session.commit()
+        seminar = await self.database.write(interaction.guild_id, queries.remove_seminar, interaction.guild_id, seminar_name)
+        if seminar is None:
+            await interaction.response.send_message("Seminar does not exist")
+            return
+        await self.changes.publish("session_removed", seminar.guild_id, kind="seminar", session_id=seminar.id, module_id=seminar.module_id,
+                                   name=seminar.name)
         await interaction.response.send_message(f"Removed seminar! {seminar_name}")
 
+    @nextcord.slash_command(name="schedule", dm_permission=False, default_member_permissions=nextcord.Permissions(administrator=True))
+    async def schedule(self, interaction: nextcord.Interaction, name: str,
+                       is_seminar_lecture: int = nextcord.SlashOption(
+                           name="is_seminar_lecture",
+                           description="Is it a seminar or a lecture",
+                           required=True,
+                           choices={"seminar": 1, "lecture": 2}
+                       ),
+                       starts_at: str = nextcord.SlashOption(required=False, default=None, description="When it starts, UTC, as YYYY-MM-DD HH:MM. Leave out to unschedule"),
+                       minutes: int = nextcord.SlashOption(required=False, default=60, description="How long it lasts")):
+        """
+        Sets when a lecture or seminar is on: Admin only
+
+        Parameters
+        __________
+        interaction: nextcord.Interaction
+            The interaction object
+        name: str
+            The name of the lecture or seminar
+        starts_at: str
+            When it starts, UTC, I.E "2023-01-31 14:00". Left out, the lecture or seminar is unscheduled
+        minutes: int
+            How long it lasts
+        :return:
+        """
+        schedule = await self.parse_schedule(interaction, starts_at, minutes)
+        if schedule is None:
+            return
+        kind = "seminar" if is_seminar_lecture == 1 else "lecture"
+        obj = await self.database.write(interaction.guild_id, queries.schedule_session, interaction.guild_id, kind, name, *schedule)
+        if obj is None:
+            await interaction.response.send_message(f"{kind.capitalize()} does not exist")
+            return
+
+        # Reloads the timetable too. Which of the session's codes are live has changed, and the cache may have
+        # dropped some that are live again
+        await self.changes.publish("codes_changed", interaction.guild_id, recount=False)
+        scheduled = queries.scheduled_session(kind, obj)
+        if scheduled is None:
+            await interaction.response.send_message(f"Unscheduled {name}")
+        else:
+            await interaction.response.send_message(f"Scheduled {name} from {scheduled.starts_at:{START_FORMAT}} to {scheduled.ends_at:{START_FORMAT}} UTC")
+
+    @nextcord.slash_command(name="importcodes", dm_permission=False, default_member_permissions=nextcord.Permissions(administrator=True))
+    async def importcodes(self, interaction: nextcord.Interaction, file: nextcord.Attachment):
+        """
+        Imports codes in bulk from a CSV or JSON file: Admin only
+
+        Parameters
+        __________
+        interaction: nextcord.Interaction
+            The interaction object
+        file: nextcord.Attachment
+            CSV (with a header row) or JSON list with code, module_code, lecture_name or seminar_name, and optionally created_at
+        :return:
+        """
+        if file.size > self.bot.max_import_size:
+            await interaction.response.send_message(f"{file.filename} is {file.size / 1024 / 1024:.1f} MB, the limit is "
+                                                    f"{self.bot.max_import_size / 1024 / 1024:.1f} MB. Split it into smaller files",
+                                                    ephemeral=True)
+            return
+        await interaction.response.defer()
+        # Parsing and reporting on a large file would hold up every other interaction, so neither runs on the loop
+        loop = asyncio.get_running_loop()
+        rows, conflicts = await loop.run_in_executor(None, bulk_import.parse_rows, await file.read(), file.filename)
+
+        # The catalogue is loaded in the same session as the import, just like the import_codes CLI
+        added, skipped = await self.database.write(interaction.guild_id, bulk_import.import_rows, interaction.guild_id, rows)
+        if added > 0:
+            await self.changes.publish("codes_changed", interaction.guild_id, recount=True)
+
+        report = await loop.run_in_executor(None, bulk_import.format_report, added, conflicts + skipped)
+        if len(report) <= 2000:
+            await interaction.followup.send(report)
+        else:
+            summary = report.splitlines()[0]
+            await interaction.followup.send(f"{summary}, see the attached report",
+                                            file=nextcord.File(io.BytesIO(report.encode()), filename="import_report.txt"))
+
+    @nextcord.slash_command(name="history", dm_permission=False, default_member_permissions=nextcord.Permissions(administrator=True))
+    async def history(self, interaction: nextcord.Interaction, module_code: str):
+        """
+        Sends a module's archived codes as a CSV file: Admin only
+
+        Parameters
+        __________
+        interaction: nextcord.Interaction
+            The interaction object
+        module_code: str
+            The module code, I.E COMP38200. Modules that have since been removed still have their history
+        :return:
+        """
+        await interaction.response.defer()
+        # Streamed row by row into a temporary file, so memory use doesn't grow with the length of the history
+        with tempfile.TemporaryFile() as file:
+            count = await self.database.read(interaction.guild_id, history.write_history, interaction.guild_id, module_code, file)
+            if count == 0:
+                await interaction.followup.send(f"No archived codes for {module_code}")
+                return
+            file.seek(0)
+            await interaction.followup.send(f"{count} archived code(s) for {module_code}",
+                                            file=nextcord.File(file, filename=f"{module_code}_history.csv"))
+
     @nextcord.slash_command(name="help", description="Shows this message")
     async def help(self, interaction: nextcord.Interaction):
         """
@@ -415,10 +935,34 @@ class MainCog(commands.Cog):
             The interaction object
         :return:
         """
-        embed = nextcord.Embed(title="Help", description="List of all commands", color=0x00ff00)
-        for command in self.bot.get_application_commands(rollout=False):
-            embed.add_field(name=command.name, value=command.description[:100] + "...", inline=False)
-        await interaction.response.send_message(embed=embed)
+        def render(page):
+            embed = nextcord.Embed(title="Help", description="List of all commands", color=0x00ff00)
+            for command in page:
+                embed.add_field(name=command.name, value=command.description[:100] + "...", inline=False)
+            return embed
+
+        key = operator.attrgetter("name")
+        fetch = sequence_fetch(self.bot.get_application_commands(rollout=False), key=key)
+        await self.paginator(interaction, ("help",), fetch, render, cached=False, key=key).start(interaction)
+
+    @addcode.on_autocomplete("module_code")
+    @seminars.on_autocomplete("module_code")
+    @lectures.on_autocomplete("module_code")
+    @addseminar.on_autocomplete("module_code")
+    @addlecture.on_autocomplete("module_code")
+    @removemodule.on_autocomplete("module_code")
+    @removecode.on_autocomplete("module_code")
+    @history.on_autocomplete("module_code")
+    async def autocomplete_module_code(self, interaction: nextcord.Interaction, module_code: str):
+        await interaction.response.send_autocomplete(self.module_codes[interaction.guild_id].search(module_code or ""))
+
+    @removelecture.on_autocomplete("lecture_name")
+    async def autocomplete_lecture_name(self, interaction: nextcord.Interaction, lecture_name: str):
+        await interaction.response.send_autocomplete(self.lecture_names[interaction.guild_id].search(lecture_name or ""))
+
+    @removeseminar.on_autocomplete("seminar_name")
+    async def autocomplete_seminar_name(self, interaction: nextcord.Interaction, seminar_name: str):
+        await interaction.response.send_autocomplete(self.seminar_names[interaction.guild_id].search(seminar_name or ""))
 
 
 def setup(bot):
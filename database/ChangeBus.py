@@ -0,0 +1,261 @@
+import asyncio
+import json
+import os
+import re
+import socket
+import typing
+import uuid
+
+from sqlalchemy.engine import Engine
+
+
+class Change(typing.NamedTuple):
+    # What happened, e.g. "code_added", see MainCog.change_handlers
+    kind: str
+    # The guild it happened in, None for maintenance across every guild
+    guild_id: typing.Optional[int]
+    # Keyword arguments for the kind's handler, JSON serialisable
+    data: dict
+    # The bus that published it
+    origin: str
+
+    def encode(self) -> str:
+        return json.dumps(self._asdict(), separators=(",", ":"))
+
+    @classmethod
+    def decode(cls, payload: typing.Union[str, bytes]) -> "Change":
+        return cls(**json.loads(payload))
+
+
+Subscriber = typing.Callable[[Change], typing.Awaitable[typing.Any]]
+
+
+class ChangeBus:
+    """
+    Tells every bot process about writes to the database, so each can update its in-memory state incrementally
+
+    publish awaits this process's subscribers first, so a command's caches are up to date by the time it replies,
+    then sends the change to the other processes, whose subscribers are run as tasks. Either way a subscriber that
+    raises is logged and the rest still run. Changes are published after the write commits, so no process hears of
+    one before the primary has it. Delivery to other processes is best effort: the stats are reconciled
+    periodically, but a lost change leaves the other caches stale until they reload
+
+    This one is in-process only, for running a single bot process. PostgresChangeBus and SocketChangeBus reach others
+    """
+
+    def __init__(self):
+        # Unique per process (and per bus), so a process can tell its own changes apart when they come back
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._subscribers: typing.List[Subscriber] = []
+        self._loop: typing.Union[asyncio.AbstractEventLoop, None] = None
+        self._tasks: typing.Set[asyncio.Task] = set()
+        self.metrics = {
+            "published": 0,
+            "received": 0,
+            "failed": 0,
+        }
+
+    def subscribe(self, subscriber: Subscriber):
+        self._subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber: Subscriber):
+        if subscriber in self._subscribers:
+            self._subscribers.remove(subscriber)
+
+    async def publish(self, kind: str, guild_id: typing.Optional[int], /, **data):
+        """
+        Runs this process's subscribers on the change, then sends it to the other processes
+        """
+        change = Change(kind, guild_id, data, self.origin)
+        self.metrics["published"] += 1
+        # The write has already committed, so a subscriber that fails mustn't keep the others, the other processes
+        # or the command's reply from hearing of it
+        await self._dispatch(change)
+        try:
+            await self.send(change.encode())
+        except Exception as e:
+            self.failed(f"Sending {kind} to the other processes", e)
+
+    async def send(self, payload: str):
+        """
+        Delivers an encoded change to the other processes, overridden by the cross-process buses
+        """
+
+    def received(self, payload: typing.Union[str, bytes]):
+        """
+        Dispatches a change from another process to the subscribers, called from the event loop
+        """
+        try:
+            change = Change.decode(payload)
+        except (ValueError, TypeError) as e:
+            self.failed("Decoding a change", e)
+            return
+        # Postgres notifies the listening process of its own changes too
+        if change.origin == self.origin:
+            return
+        self.metrics["received"] += 1
+        task = self._loop.create_task(self._dispatch(change))
+        # Hold a reference until the subscribers finish, the loop only keeps weak ones
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, change: Change):
+        for subscriber in list(self._subscribers):
+            try:
+                await subscriber(change)
+            except Exception as e:
+                self.failed(f"Applying {change.kind} from {change.origin}", e)
+
+    def failed(self, action: str, error: Exception):
+        """
+        Counts and logs a change that couldn't be sent, received or applied
+        """
+        self.metrics["failed"] += 1
+        print(f"{action} failed: {error!r}")
+
+    async def start(self, loop: asyncio.AbstractEventLoop = None):
+        """
+        Starts listening for changes from the other processes
+        """
+        self._loop = loop or asyncio.get_running_loop()
+
+    async def stop(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> typing.Dict[str, int]:
+        return dict(self.metrics, subscribers=len(self._subscribers))
+
+
+class PostgresChangeBus(ChangeBus):
+    """
+    Sends changes between processes sharing a Postgres primary with NOTIFY, listening on a connection of its own
+
+    Parameters
+    __________
+    engine: sqlalchemy.engine.Engine
+        The Postgres primary
+    channel: str
+        The channel to NOTIFY and LISTEN on, every process sharing caches must use the same one
+    """
+
+    def __init__(self, engine: Engine, channel: str = "attendance_changes"):
+        super().__init__()
+        if engine.dialect.name != "postgresql":
+            raise ValueError(f"PostgresChangeBus needs a Postgres database, not {engine.url!r}")
+        # LISTEN takes an identifier, which can't be a bound parameter
+        if not re.fullmatch(r"[a-z_][a-z0-9_]*", channel):
+            raise ValueError(f"Channel names are lower case letters, digits and underscores, not {channel!r}")
+        self.engine = engine
+        self.channel = channel
+        self._listener = None
+
+    def _notify(self, payload: str):
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+            cursor.close()
+            connection.commit()
+        finally:
+            connection.close()
+
+    async def send(self, payload: str):
+        await asyncio.get_running_loop().run_in_executor(None, self._notify, payload)
+
+    def _readable(self):
+        self._listener.poll()
+        while self._listener.notifies:
+            self.received(self._listener.notifies.pop(0).payload)
+
+    async def start(self, loop: asyncio.AbstractEventLoop = None):
+        await super().start(loop)
+        # Outside the pool, the connection is held for as long as the bot runs
+        dialect = self.engine.dialect
+        args, kwargs = dialect.create_connect_args(self.engine.url)
+        self._listener = await self._loop.run_in_executor(None, lambda: dialect.connect(*args, **kwargs))
+        self._listener.autocommit = True
+        cursor = self._listener.cursor()
+        cursor.execute(f"LISTEN {self.channel}")
+        cursor.close()
+        self._loop.add_reader(self._listener.fileno(), self._readable)
+
+    async def stop(self):
+        if self._listener is not None:
+            self._loop.remove_reader(self._listener.fileno())
+            self._listener.close()
+            self._listener = None
+        await super().stop()
+
+
+class SocketChangeBus(ChangeBus):
+    """
+    Stand-in for PostgresChangeBus, so several processes can share caches locally with SQLite
+
+    Every process binds a UNIX datagram socket in directory and sends each change to every other socket there.
+    Sockets left behind by processes that have gone are removed when sending to them fails
+
+    Parameters
+    __________
+    directory: str
+        Where the processes' sockets are, every process sharing caches must use the same one
+    """
+
+    MAX_PAYLOAD = 65536
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory = directory
+        self.path = os.path.join(directory, f"{self.origin}.sock")
+        self._socket: typing.Union[socket.socket, None] = None
+
+    def peers(self) -> typing.List[str]:
+        with os.scandir(self.directory) as entries:
+            return [entry.path for entry in entries if entry.name.endswith(".sock") and entry.path != self.path]
+
+    async def send(self, payload: str):
+        if self._socket is None:
+            # Not started, so there's no socket to send from and nobody knows about this process yet
+            return
+        data = payload.encode()
+        if len(data) > self.MAX_PAYLOAD:
+            raise ValueError(f"Change of {len(data)} bytes is over the {self.MAX_PAYLOAD} byte limit")
+        for peer in self.peers():
+            try:
+                self._socket.sendto(data, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Nothing bound to it any more
+                try:
+                    os.unlink(peer)
+                except FileNotFoundError:
+                    pass
+            except BlockingIOError as e:
+                # Its queue is full
+                self.failed(f"Sending a change to {peer}", e)
+
+    def _readable(self):
+        while True:
+            try:
+                payload = self._socket.recv(self.MAX_PAYLOAD)
+            except BlockingIOError:
+                return
+            self.received(payload)
+
+    async def start(self, loop: asyncio.AbstractEventLoop = None):
+        await super().start(loop)
+        os.makedirs(self.directory, exist_ok=True)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self._socket.bind(self.path)
+        self._loop.add_reader(self._socket.fileno(), self._readable)
+
+    async def stop(self):
+        if self._socket is not None:
+            self._loop.remove_reader(self._socket.fileno())
+            self._socket.close()
+            self._socket = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+        await super().stop()
@@ -0,0 +1,180 @@
+import asyncio
+import typing
+
+from models.Code import Code
+from . import queries
+from .Database import Database
+
+# (guild_id, code, module_id, kind, session_id)
+Submission = typing.Tuple[int, str, int, str, int]
+Outcome = typing.Tuple[str, typing.Union[Code, None]]
+
+# What a merged duplicate is told, given the outcome of the submission it was merged into
+MERGED_STATUS = {queries.ADDED: queries.EXISTS, queries.EXISTS: queries.EXISTS, queries.MISSING: queries.MISSING}
+
+
+class CodeWriteQueue:
+    """
+    Write-behind queue for codes submitted from the AddCodeView dropdown
+
+    Submissions arriving within window seconds of each other are written in one transaction, so a burst of
+    students posting the same code takes the database write lock once rather than once per click. Identical
+    submissions are merged in memory: the first waiter gets the real outcome, the rest are told the code exists.
+    If the batch's transaction fails, its submissions are written again one at a time, so only the waiters of a
+    submission that fails on its own see the error.
+
+    Parameters
+    __________
+    database: Database
+        Where flushes run
+    window: float
+        Seconds to wait for more submissions before flushing
+    max_batch: int
+        Flush early once this many distinct submissions are waiting
+    max_pending: int
+        Waiters allowed at once, including those being flushed; submit waits for room beyond this
+    """
+
+    def __init__(self, database: Database, window: float = 0.05, max_batch: int = 200, max_pending: int = 1000):
+        self.database = database
+        self.window = window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.closed = False
+
+        self._pending: typing.Dict[Submission, typing.List[asyncio.Future]] = {}
+        self._depth = 0
+        self._room = asyncio.Condition()
+        self._flush_lock = asyncio.Lock()
+        self._timer: typing.Union[asyncio.TimerHandle, None] = None
+        self._tasks: typing.Set[asyncio.Task] = set()
+        self.metrics = {
+            "submitted": 0,
+            "merged": 0,
+            "flushes": 0,
+            "flushed": 0,
+            "largest_flush": 0,
+            "backpressure_waits": 0,
+            "fallbacks": 0,
+            "failed": 0,
+        }
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    async def submit(self, guild_id: int, code: str, module_id: int, kind: str, session_id: int) -> Outcome:
+        """
+        Queues a code and waits for the flush that writes it
+
+        Returns the same (status, code) pair as queries.add_code
+        """
+        if self.closed:
+            raise RuntimeError("CodeWriteQueue is closed")
+        if self._depth >= self.max_pending:
+            self.metrics["backpressure_waits"] += 1
+            async with self._room:
+                await self._room.wait_for(lambda: self._depth < self.max_pending)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (guild_id, code, module_id, kind, session_id)
+        waiters = self._pending.get(key)
+        if waiters is None:
+            self._pending[key] = [future]
+        else:
+            waiters.append(future)
+            self.metrics["merged"] += 1
+        self._depth += 1
+        self.metrics["submitted"] += 1
+
+        if len(self._pending) >= self.max_batch:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._schedule_flush)
+        return await future
+
+    def _schedule_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        task = asyncio.get_running_loop().create_task(self.flush())
+        # Hold a reference until the flush finishes, the loop only keeps weak ones
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self) -> int:
+        """
+        Writes everything queued so far in one transaction, returning the number of distinct submissions written
+        """
+        # One flush at a time, so batches never contend with each other for the write lock
+        async with self._flush_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            try:
+                try:
+                    results = await self.database.run(queries.add_codes, list(batch))
+                except Exception:
+                    self.metrics["fallbacks"] += 1
+                    results = await self._write_each(batch)
+                for waiters, result in zip(batch.values(), results):
+                    self._resolve(waiters, result)
+            except BaseException as e:
+                # Cancelled part way through, nobody must be left waiting
+                for waiters in batch.values():
+                    self._resolve(waiters, e)
+                raise
+            finally:
+                self._depth -= sum(len(waiters) for waiters in batch.values())
+                self.metrics["flushes"] += 1
+                self.metrics["flushed"] += len(batch)
+                self.metrics["largest_flush"] = max(self.metrics["largest_flush"], len(batch))
+                async with self._room:
+                    self._room.notify_all()
+            return len(batch)
+
+    async def _write_each(self, batch: typing.Dict[Submission, typing.List[asyncio.Future]]) -> typing.List[typing.Union[Outcome, Exception]]:
+        """
+        Writes each submission in a transaction of its own, giving the exception in place of the outcome of any that fail
+        """
+        results = []
+        for submission in batch:
+            try:
+                results.append(await self.database.run(queries.add_code, *submission))
+            except Exception as e:
+                self.metrics["failed"] += 1
+                results.append(e)
+        return results
+
+    @staticmethod
+    def _resolve(waiters: typing.List[asyncio.Future], result: typing.Union[Outcome, BaseException]):
+        first, *merged = waiters
+        if isinstance(result, BaseException):
+            for future in waiters:
+                if not future.done():
+                    future.set_exception(result)
+            return
+        if not first.done():
+            first.set_result(result)
+        merged_outcome = (MERGED_STATUS[result[0]], None)
+        for future in merged:
+            if not future.done():
+                future.set_result(merged_outcome)
+
+    async def close(self):
+        """
+        Stops taking submissions and flushes whatever is still queued
+        """
+        self.closed = True
+        while self._pending or self._tasks:
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            await self.flush()
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        return dict(self.metrics, depth=self._depth, pending=len(self._pending))
@@ -0,0 +1,260 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import itertools
+import threading
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Delete, Insert, Update
+
+T = typing.TypeVar("T")
+
+# Set to the interaction id for the duration of each slash command, so checked out connections can be traced back to it
+current_interaction: contextvars.ContextVar[typing.Optional[int]] = contextvars.ContextVar("current_interaction", default=None)
+
+
+class CheckedOutConnection(typing.NamedTuple):
+    interaction_id: typing.Optional[int]
+    checked_out_at: float
+    thread_name: str
+
+
+class RoutingSession(Session):
+    """
+    A session that reads from a replica and writes to the primary
+
+    Statements go to the replica until the session writes anything, then everything goes to the primary, so a
+    function that reads what it just wrote sees it. Without a replica it's a plain session on the primary
+    """
+
+    def __init__(self, primary: Engine, replica: Engine = None, **kwargs):
+        super().__init__(bind=primary, **kwargs)
+        self.primary = primary
+        self.replica = replica
+        self.wrote = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.replica is None or self.wrote:
+            return self.primary
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self.wrote = True
+            return self.primary
+        return self.replica
+
+
+class Database:
+    """
+    Runs blocking SQLAlchemy work on a bounded thread pool so slash commands never block the event loop
+
+    run always uses the primary engine. read spreads read-only work over the read engines, round robin, except
+    for a guild that wrote in the last read_your_writes seconds, whose reads stay on the primary until the
+    replicas have had time to catch up. Reads for every guild at once are held back by any write
+
+    Parameters
+    __________
+    engine: sqlalchemy.engine.Engine
+        The primary engine, every write goes to it
+    max_workers: int
+        Upper bound on the number of queries running at once
+    debug: bool
+        Report connections still checked out when a slash command finishes
+    read_engines: typing.Sequence[sqlalchemy.engine.Engine]
+        Replicas of the primary. Without any, read is the same as run
+    read_your_writes: float
+        Seconds after a write that reads stay on the primary, longer than the replicas lag
+    """
+
+    def __init__(self, engine, max_workers: int = 4, debug: bool = False, read_engines: typing.Sequence[Engine] = (),
+                 read_your_writes: float = 5):
+        self.engine = engine
+        self.read_engines = list(read_engines)
+        self.read_your_writes = read_your_writes
+        self.max_workers = max_workers
+        self.debug = debug
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="database")
+        self._next_read_engine = itertools.cycle(self.read_engines)
+        # When anything was last written to the primary, and when each guild last wrote, on time.monotonic
+        self._last_write = float("-inf")
+        self._guild_writes: typing.Dict[int, float] = {}
+
+        self._lock = threading.Lock()
+        self.checked_out: typing.Dict[int, CheckedOutConnection] = {}
+        self.metrics = {
+            "sessions": 0,
+            "checkouts": 0,
+            "checkins": 0,
+            "peak_checked_out": 0,
+            "queue_wait_total": 0.0,
+            "queue_wait_max": 0.0,
+            "checkout_wait_total": 0.0,
+            "checkout_wait_max": 0.0,
+            "queries": 0,
+            "query_time_total": 0.0,
+            "replica_reads": 0,
+            "primary_reads": 0,
+        }
+        # interaction id -> [queries, seconds], for interactions being tracked
+        self.interactions: typing.Dict[int, typing.List[typing.Union[int, float]]] = {}
+        for listened in [engine, *self.read_engines]:
+            event.listen(listened, "checkout", self._on_checkout)
+            event.listen(listened, "checkin", self._on_checkin)
+            event.listen(listened, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(listened, "after_cursor_execute", self._after_cursor_execute)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checked_out[id(connection_record)] = CheckedOutConnection(
+                current_interaction.get(), time.perf_counter(), threading.current_thread().name
+            )
+            self.metrics["checkouts"] += 1
+            self.metrics["peak_checked_out"] = max(self.metrics["peak_checked_out"], len(self.checked_out))
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checked_out.pop(id(connection_record), None)
+            self.metrics["checkins"] += 1
+
+    def _before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - connection.info["query_started_at"].pop()
+        interaction_id = current_interaction.get()
+        if context is not None and (context.isinsert or context.isupdate or context.isdelete) and connection.engine is self.engine:
+            self._last_write = time.monotonic()
+        with self._lock:
+            self.metrics["queries"] += 1
+            self.metrics["query_time_total"] += elapsed
+            totals = self.interactions.get(interaction_id)
+            if totals is not None:
+                totals[0] += 1
+                totals[1] += elapsed
+
+    def track_interaction(self, interaction_id: int):
+        """
+        Starts counting the queries run on behalf of an interaction, and the time spent in them
+        """
+        with self._lock:
+            self.interactions[interaction_id] = [0, 0.0]
+
+    def untrack_interaction(self, interaction_id: int) -> typing.Tuple[int, float]:
+        """
+        Stops counting for an interaction, returning its (queries, seconds)
+
+        Queries from tasks it spawned that finish later are not counted
+        """
+        with self._lock:
+            queries, seconds = self.interactions.pop(interaction_id, (0, 0.0))
+        return queries, seconds
+
+    def _record_wait(self, name: str, wait: float):
+        with self._lock:
+            self.metrics[f"{name}_total"] += wait
+            self.metrics[f"{name}_max"] = max(self.metrics[f"{name}_max"], wait)
+
+    def wrote(self, guild_id: int):
+        """
+        Keeps a guild's reads on the primary for read_your_writes seconds, call after writing on its behalf
+        """
+        self._guild_writes[guild_id] = time.monotonic()
+
+    def read_engine(self, guild_id: typing.Optional[int]) -> typing.Union[Engine, None]:
+        """
+        The replica to read from for a guild (None for every guild), or None if it has to be the primary
+        """
+        if not self.read_engines:
+            return None
+        now = time.monotonic()
+        last_write = self._last_write if guild_id is None else self._guild_writes.get(guild_id, float("-inf"))
+        if now - last_write < self.read_your_writes:
+            return None
+        # Forget guilds whose writes have had time to reach the replicas
+        if len(self._guild_writes) > 1024:
+            self._guild_writes = {guild: at for guild, at in self._guild_writes.items() if now - at < self.read_your_writes}
+        return next(self._next_read_engine)
+
+    @contextlib.contextmanager
+    def session_scope(self, replica: Engine = None) -> typing.Iterator[Session]:
+        """
+        Opens a session, checks its connection out up front so the pool wait is measured, and always closes it
+
+        With a replica, it is read from until the session writes
+        """
+        # Objects handed back to the event loop must stay readable after the session closes
+        session = RoutingSession(self.engine, replica, expire_on_commit=False)
+        try:
+            start = time.perf_counter()
+            session.connection()
+            self._record_wait("checkout_wait", time.perf_counter() - start)
+            with self._lock:
+                self.metrics["sessions"] += 1
+            yield session
+        except BaseException:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _call(self, submitted_at: float, replica: typing.Optional[Engine], func: typing.Callable[..., T], *args, **kwargs) -> T:
+        self._record_wait("queue_wait", time.perf_counter() - submitted_at)
+        with self.session_scope(replica) as session:
+            return func(session, *args, **kwargs)
+
+    async def run(self, func: typing.Callable[..., T], *args, **kwargs) -> T:
+        """
+        Runs ``func(session, *args, **kwargs)`` on a worker thread and returns its result
+
+        Parameters
+        __________
+        func: typing.Callable
+            A synchronous function taking a Session as its first argument
+        :return:
+        """
+        return await self._submit(None, func, *args, **kwargs)
+
+    async def read(self, guild_id: typing.Optional[int], func: typing.Callable[..., T], *args, **kwargs) -> T:
+        """
+        Like run, but on a replica unless guild_id (None for reads across every guild) has written too recently
+
+        func should only read, anything it writes still goes to the primary but may not be visible to its reads
+        """
+        replica = self.read_engine(guild_id)
+        with self._lock:
+            self.metrics["primary_reads" if replica is None else "replica_reads"] += 1
+        return await self._submit(replica, func, *args, **kwargs)
+
+    async def write(self, guild_id: int, func: typing.Callable[..., T], *args, **kwargs) -> T:
+        """
+        Like run, for work that writes on behalf of a guild. The guild's reads stay on the primary for a while after
+        """
+        try:
+            return await self._submit(None, func, *args, **kwargs)
+        finally:
+            self.wrote(guild_id)
+
+    async def _submit(self, replica: typing.Optional[Engine], func: typing.Callable[..., T], *args, **kwargs) -> T:
+        loop = asyncio.get_running_loop()
+        # Copy the context so the worker thread sees current_interaction
+        context = contextvars.copy_context()
+        call = functools.partial(self._call, time.perf_counter(), replica, func, *args, **kwargs)
+        return await loop.run_in_executor(self.executor, context.run, call)
+
+    def checked_out_by(self, interaction_id: int) -> typing.List[CheckedOutConnection]:
+        with self._lock:
+            return [connection for connection in self.checked_out.values() if connection.interaction_id == interaction_id]
+
+    def pool_stats(self) -> typing.Dict[str, typing.Any]:
+        with self._lock:
+            stats = dict(self.metrics, checked_out=len(self.checked_out))
+        stats["pool"] = self.engine.pool.status()
+        stats["replica_pools"] = [read_engine.pool.status() for read_engine in self.read_engines]
+        return stats
+
+    def close(self):
+        self.executor.shutdown(wait=True)
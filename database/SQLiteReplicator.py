@@ -0,0 +1,67 @@
+import asyncio
+import typing
+
+from sqlalchemy.engine import Engine
+
+
+class SQLiteReplicator:
+    """
+    Stand-in for database replication, so read replicas can be tried out locally with SQLite files
+
+    Every interval seconds the primary file is copied over each replica with SQLite's online backup API. Readers
+    see the replica as it was at the last copy, so it lags the primary by up to interval like a real replica would
+
+    Parameters
+    __________
+    primary: sqlalchemy.engine.Engine
+        The SQLite database written to
+    replicas: typing.Sequence[sqlalchemy.engine.Engine]
+        SQLite databases kept as copies of it
+    interval: float
+        Seconds between copies
+    """
+
+    def __init__(self, primary: Engine, replicas: typing.Sequence[Engine], interval: float = 1.0):
+        for engine in (primary, *replicas):
+            if engine.dialect.name != "sqlite" or engine.url.database in (None, "", ":memory:"):
+                raise ValueError(f"SQLiteReplicator only copies SQLite files, not {engine.url!r}")
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.interval = interval
+        self.copies = 0
+        self.task: typing.Union[asyncio.Task, None] = None
+
+    def replicate(self):
+        """
+        Copies the primary over every replica. Blocking, run it on a worker thread
+        """
+        source = self.primary.raw_connection()
+        try:
+            for replica in self.replicas:
+                target = replica.raw_connection()
+                try:
+                    source.dbapi_connection.backup(target.dbapi_connection)
+                finally:
+                    target.close()
+        finally:
+            source.close()
+        self.copies += 1
+
+    async def _follow(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await loop.run_in_executor(None, self.replicate)
+            except Exception as e:
+                print(f"Copying the primary database to the replicas failed: {e!r}")
+
+    def start(self, loop: asyncio.AbstractEventLoop = None):
+        loop = loop or asyncio.get_event_loop()
+        if self.task is None or self.task.done():
+            self.task = loop.create_task(self._follow())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
@@ -0,0 +1,6 @@
+from .Database import Database, RoutingSession, current_interaction
+from .engine import create_database_engine
+from .migrations import migrate
+from .CodeWriteQueue import CodeWriteQueue
+from .SQLiteReplicator import SQLiteReplicator
+from .ChangeBus import ChangeBus, PostgresChangeBus, SocketChangeBus, Change
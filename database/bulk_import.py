@@ -0,0 +1,208 @@
+"""
+Bulk import of attendance codes from CSV or JSON.
+
+Rows have the keys ``code``, ``module_code``, exactly one of ``lecture_name``/``seminar_name``, and optionally
+``created_at`` as an ISO 8601 timestamp, UTC unless it carries an offset. Codes are stored in upper case. CSV files need a header row naming the columns. Conflicts are
+reported by line number for CSV, and by position in the list for JSON.
+
+The slash command and the CLI both import in two steps, parsing and then importing the rows in one session.
+Parsing and the report are CPU bound, so the slash command runs them in an executor too:
+
+    rows, conflicts = parse_rows(data, filename)
+    added, skipped = await database.write(guild_id, import_rows, guild_id, rows)
+    report = format_report(added, conflicts + skipped)
+"""
+import csv
+import datetime
+import io
+import json
+import typing
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models.Code import Code
+from utils import ModuleRecord, LectureRecord, SeminarRecord, normalise_code, pack_code, CODE_LENGTH
+from . import queries
+
+FIELDS = ("code", "module_code", "lecture_name", "seminar_name", "created_at")
+
+
+class ImportRow(typing.NamedTuple):
+    line: int
+    code: str
+    module_code: str
+    lecture_name: str
+    seminar_name: str
+    created_at: str
+
+
+class Conflict(typing.NamedTuple):
+    line: int
+    reason: str
+
+
+class Catalogue(typing.NamedTuple):
+    modules: typing.Dict[str, ModuleRecord]
+    lectures: typing.Dict[typing.Tuple[int, str], LectureRecord]
+    seminars: typing.Dict[typing.Tuple[int, str], SeminarRecord]
+
+
+def parse_rows(data: typing.Union[bytes, str], filename: str = "") -> typing.Tuple[typing.List[ImportRow], typing.List[Conflict]]:
+    """
+    Parses a CSV or JSON document, JSON if the filename ends in .json or the content starts with [
+    """
+    if isinstance(data, bytes):
+        try:
+            data = data.decode("utf-8-sig")
+        except UnicodeDecodeError as e:
+            return [], [Conflict(data.count(b"\n", 0, e.start) + 1, "Not UTF-8 text, save the file as UTF-8 CSV or JSON")]
+
+    if filename.lower().endswith(".json") or data.lstrip().startswith("["):
+        try:
+            records = json.loads(data)
+        except json.JSONDecodeError as e:
+            return [], [Conflict(e.lineno, f"Invalid JSON: {e.msg}")]
+        if not isinstance(records, list):
+            return [], [Conflict(1, "Expected a JSON list of objects")]
+        numbered = enumerate(records, start=1)
+    else:
+        # Line 1 is the header
+        numbered = enumerate(csv.DictReader(io.StringIO(data)), start=2)
+
+    rows, conflicts = [], []
+    for line, record in numbered:
+        if not isinstance(record, dict):
+            conflicts.append(Conflict(line, "Expected an object"))
+            continue
+        rows.append(ImportRow(line, *(str(record.get(field) or "").strip() for field in FIELDS)))
+    return rows, conflicts
+
+
+def load_catalogue(session: Session, guild_id: int, module_codes: typing.Iterable[str]) -> Catalogue:
+    """
+    Loads the guild's modules named by an import, with their lectures and seminars, straight from the database
+    """
+    catalogue = Catalogue({}, {}, {})
+    for module_code in set(module_codes):
+        module = queries.get_module(session, guild_id, module_code)
+        if module is None:
+            continue
+        catalogue.modules[module_code] = module
+        catalogue.lectures.update(((module.id, lecture.name), lecture) for lecture in queries.get_lectures(session, guild_id, module.id))
+        catalogue.seminars.update(((module.id, seminar.name), seminar) for seminar in queries.get_seminars(session, guild_id, module.id))
+    return catalogue
+
+
+def validate_rows(rows: typing.Iterable[ImportRow], catalogue: Catalogue,
+                  now: datetime.datetime = None) -> typing.Tuple[typing.List[dict], typing.List[Conflict]]:
+    """
+    Checks each row against the catalogue and turns the valid ones into codes table values
+
+    Each value dict carries the row's line number under "line", which import_codes strips before inserting
+    """
+    now = now or datetime.datetime.utcnow()
+    values, conflicts = [], []
+    seen = set()
+    for row in rows:
+        code = normalise_code(row.code or "")
+        if code is None:
+            conflicts.append(Conflict(row.line, f"Code must be 1 to {CODE_LENGTH} letters and digits"))
+            continue
+        module = catalogue.modules.get(row.module_code)
+        if module is None:
+            conflicts.append(Conflict(row.line, f"Module {row.module_code!r} does not exist"))
+            continue
+        if bool(row.lecture_name) == bool(row.seminar_name):
+            conflicts.append(Conflict(row.line, "Give exactly one of lecture_name and seminar_name"))
+            continue
+
+        lecture = seminar = None
+        if row.lecture_name:
+            lecture = catalogue.lectures.get((module.id, row.lecture_name))
+            if lecture is None:
+                conflicts.append(Conflict(row.line, f"Lecture {row.lecture_name!r} does not exist in {row.module_code}"))
+                continue
+        else:
+            seminar = catalogue.seminars.get((module.id, row.seminar_name))
+            if seminar is None:
+                conflicts.append(Conflict(row.line, f"Seminar {row.seminar_name!r} does not exist in {row.module_code}"))
+                continue
+
+        created_at = now
+        if row.created_at:
+            try:
+                created_at = datetime.datetime.fromisoformat(row.created_at)
+            except ValueError:
+                conflicts.append(Conflict(row.line, f"Invalid created_at {row.created_at!r}"))
+                continue
+            if created_at.tzinfo is not None:
+                created_at = created_at.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+        key = (pack_code(code), module.id, lecture and lecture.id, seminar and seminar.id)
+        if key in seen:
+            conflicts.append(Conflict(row.line, "Duplicate of an earlier row"))
+            continue
+        seen.add(key)
+        values.append(dict(line=row.line, guild_id=module.guild_id, code=code, code_key=key[0], module_id=module.id, lecture_id=key[2], seminar_id=key[3],
+                           status=1, created_at=created_at, updated_at=created_at))
+    return values, conflicts
+
+
+def import_codes(session: Session, values: typing.List[dict], batch_size: int = 1000) -> typing.Tuple[int, typing.List[Conflict]]:
+    """
+    Inserts validated codes with batched executemany, all in one transaction
+
+    Returns the number of codes added and a conflict for each row that already existed
+    """
+    dialect = session.get_bind().dialect.name
+    conflicts = []
+    added = 0
+    for start in range(0, len(values), batch_size):
+        batch = values[start:start + batch_size]
+        keys = {(value["code_key"], value["module_id"], value["lecture_id"], value["seminar_id"]): value for value in batch}
+        stmt = select(Code.code_key, Code.module_id, Code.lecture_id, Code.seminar_id).where(
+            Code.guild_id.in_({value["guild_id"] for value in keys.values()}),
+            Code.code_key.in_({key[0] for key in keys}), Code.module_id.in_({key[1] for key in keys})
+        )
+        for existing in session.execute(stmt):
+            value = keys.pop(tuple(existing), None)
+            if value is not None:
+                conflicts.append(Conflict(value["line"], "Code already exists"))
+
+        rows = [{column: datum for column, datum in value.items() if column != "line"} for value in keys.values()]
+        if not rows:
+            continue
+        if dialect in ("sqlite", "postgresql"):
+            dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+            # Still ignore conflicts, in case another writer got there between the check and the insert
+            result = session.execute(dialect_insert(Code).on_conflict_do_nothing(), rows)
+        else:
+            result = session.execute(Code.__table__.insert(), rows)
+        added += result.rowcount if result.rowcount >= 0 else len(rows)
+    session.commit()
+    conflicts.sort()
+    return added, conflicts
+
+
+def import_rows(session: Session, guild_id: int, rows: typing.Sequence[ImportRow],
+                batch_size: int = 1000) -> typing.Tuple[int, typing.List[Conflict]]:
+    """
+    Loads the catalogue the rows refer to, validates them and imports the valid ones
+
+    Returns the number of codes added and the conflicts of the rows skipped, sorted
+    """
+    catalogue = load_catalogue(session, guild_id, (row.module_code for row in rows))
+    values, invalid = validate_rows(rows, catalogue)
+    added, existing = import_codes(session, values, batch_size=batch_size)
+    return added, sorted(invalid + existing)
+
+
+def format_report(added: int, conflicts: typing.List[Conflict]) -> str:
+    """
+    Summarises an import, listing the conflicts in line order
+    """
+    lines = [f"Added {added} code(s), {len(conflicts)} row(s) skipped"]
+    lines.extend(f"Line {conflict.line}: {conflict.reason}" for conflict in sorted(conflicts))
+    return "\n".join(lines)
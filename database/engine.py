@@ -0,0 +1,59 @@
+import typing
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool, StaticPool
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the single writer,
+# busy_timeout waits for the write lock instead of failing with "database is locked"
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def create_database_engine(url: str, pool_size: int = 5, max_overflow: int = 10, pool_timeout: float = 30,
+                           echo: bool = False, **kwargs) -> Engine:
+    """
+    Creates an engine with an explicitly sized connection pool
+
+    Parameters
+    __________
+    url: str
+        Database URL, I.E. "sqlite:///database.db"
+    pool_size: int
+        Connections kept open in the pool
+    max_overflow: int
+        Extra connections allowed above pool_size under load
+    pool_timeout: float
+        Seconds to wait for a connection before giving up
+    echo: bool
+        Log every SQL statement, off by default
+    :return:
+    """
+    options: typing.Dict[str, typing.Any] = dict(echo=echo, **kwargs)
+    sqlite = make_url(url).get_backend_name() == "sqlite"
+    if sqlite and make_url(url).database in (None, "", ":memory:"):
+        # One shared connection, or every worker thread would get its own empty database
+        options.update(poolclass=StaticPool, connect_args={"check_same_thread": False})
+    elif sqlite:
+        # Connections are only ever used by one worker thread at a time, but not always the one that opened them
+        options.update(poolclass=QueuePool, pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout,
+                       connect_args={"check_same_thread": False})
+    else:
+        options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout, pool_pre_ping=True)
+
+    engine = create_engine(url, **options)
+    if sqlite and options["poolclass"] is QueuePool:
+        event.listen(engine, "connect", set_sqlite_pragmas)
+    return engine
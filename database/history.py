@@ -0,0 +1,64 @@
+"""
+Attendance history, read back from the archive of expired codes.
+
+Rows are streamed from the database and written out one at a time, so a module's whole history is never held in
+memory. Run on the Database worker pool like the queries, on a replica since it only reads:
+
+    count = await database.read(guild_id, history.write_history, guild_id, module_code, file)
+"""
+import csv
+import io
+import typing
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.ArchivedCode import ArchivedCode
+
+FIELDS = ("code", "module_code", "module_name", "session_kind", "session_name", "created_at", "archived_at")
+
+
+class HistoryRow(typing.NamedTuple):
+    code: str
+    module_code: str
+    module_name: str
+    session_kind: str
+    session_name: typing.Optional[str]
+    created_at: str
+    archived_at: str
+
+
+def iter_history(session: Session, guild_id: int, module_code: str, batch_size: int = 500) -> typing.Iterator[HistoryRow]:
+    """
+    Yields a module's archived codes oldest first, fetching batch_size rows at a time
+    """
+    stmt = (
+        select(ArchivedCode.code, ArchivedCode.module_code, ArchivedCode.module_name, ArchivedCode.session_kind,
+               ArchivedCode.session_name, ArchivedCode.created_at, ArchivedCode.archived_at)
+        .where(ArchivedCode.guild_id == guild_id, ArchivedCode.module_code == module_code)
+        .order_by(ArchivedCode.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for code, module, module_name, kind, name, created_at, archived_at in session.execute(stmt):
+        yield HistoryRow(code, module, module_name, kind, name, created_at.isoformat(sep=" "), archived_at.isoformat(sep=" "))
+
+
+def write_history(session: Session, guild_id: int, module_code: str, file: typing.BinaryIO) -> int:
+    """
+    Writes a module's archived codes to file as UTF-8 CSV with a header row, returning how many there were
+    """
+    line = io.StringIO()
+    writer = csv.writer(line)
+
+    def write(row: typing.Sequence):
+        writer.writerow(row)
+        file.write(line.getvalue().encode())
+        line.seek(0)
+        line.truncate()
+
+    write(FIELDS)
+    count = 0
+    for row in iter_history(session, guild_id, module_code):
+        write(row)
+        count += 1
+    return count
@@ -0,0 +1,271 @@
+"""
+Versioned schema migrations.
+
+``Base.metadata.create_all`` only creates missing tables, so indexes added to existing tables never reach
+existing database files. Each migration here brings an older database up to date and bumps the
+``schema_version`` table inside the same transaction. Migrations must be idempotent, because a fresh
+database already gets everything from create_all before they run.
+
+Indexes that a later migration replaced are skipped by create_indexes, so old databases still pass through
+every version in order.
+"""
+import datetime
+import time
+import typing
+
+from sqlalchemy import Column, Integer, MetaData, Table, select, update, insert, delete, inspect, text, bindparam, func
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateTable
+
+from models import Base
+from utils import normalise_code, pack_code
+
+metadata = MetaData()
+schema_version = Table("schema_version", metadata, Column("version", Integer, nullable=False))
+
+
+def column_names(connection: Connection, table_name: str) -> typing.Set[str]:
+    return {column["name"] for column in inspect(connection).get_columns(table_name)}
+
+
+def create_indexes(connection: Connection, table_name: str, *index_names: str, columns: typing.Set[str] = None):
+    indexes = {index.name: index for index in Base.metadata.tables[table_name].indexes}
+    columns = column_names(connection, table_name) if columns is None else columns
+    for name in index_names:
+        # Skip indexes on columns a later migration adds, it creates them itself
+        if name in indexes and all(column.name in columns for column in indexes[name].columns):
+            indexes[name].create(connection, checkfirst=True)
+
+
+def delete_duplicate_codes(connection: Connection, *group_by: str):
+    """
+    Deletes every code that has the same group_by columns as an older (lower id) one
+    """
+    table = Base.metadata.tables["codes"]
+    keep = select(func.min(table.c.id)).group_by(*(table.c[name] for name in group_by))
+    connection.execute(delete(table).where(table.c.id.not_in(keep)))
+
+
+def migration_unique_codes(connection: Connection, default_guild_id: int):
+    # The unique indexes can't be built while duplicates exist
+    delete_duplicate_codes(connection, "code", "module_id", "lecture_id", "seminar_id")
+    create_indexes(connection, "codes", "uq_codes_code_lecture", "uq_codes_code_seminar", "ix_codes_created_at")
+
+
+def migration_hot_lookup_indexes(connection: Connection, default_guild_id: int):
+    create_indexes(connection, "codes", "ix_codes_module_id_code", "ix_codes_lecture_id", "ix_codes_seminar_id")
+    create_indexes(connection, "lectures", "ix_lectures_module_id_name")
+    create_indexes(connection, "seminars", "ix_seminars_module_id_name")
+
+
+def migration_pagination_indexes(connection: Connection, default_guild_id: int):
+    create_indexes(connection, "lectures", "ix_lectures_module_id_id")
+    create_indexes(connection, "seminars", "ix_seminars_module_id_id")
+
+
+# Unique constraints and indexes replaced by guild scoped ones in migration 4
+PRE_GUILD_UNIQUE_COLUMNS = {"modules": ["module_code"], "lectures": ["name"], "seminars": ["name"]}
+PRE_GUILD_INDEXES = {
+    "lectures": ("ix_lectures_module_id_name", "ix_lectures_module_id_id"),
+    "seminars": ("ix_seminars_module_id_name", "ix_seminars_module_id_id"),
+    "codes": ("uq_codes_code_lecture", "uq_codes_code_seminar", "ix_codes_module_id_code"),
+}
+
+
+def rebuild_sqlite_table(connection: Connection, table_name: str, default_guild_id: int):
+    """
+    SQLite can't drop a column's UNIQUE constraint or make an added column NOT NULL, so copy the rows into a
+    table created from the current model instead, the old table's indexes going with it
+    """
+    table = Base.metadata.tables[table_name]
+    existing = column_names(connection, table_name)
+    ddl = str(CreateTable(table).compile(dialect=connection.dialect))
+    connection.execute(text(ddl.replace(f"CREATE TABLE {table_name} (", f"CREATE TABLE {table_name}_new (", 1)))
+    # Columns added by later migrations are left NULL, or their server default
+    columns = ", ".join(column.name for column in table.columns if column.name != "guild_id" and column.name in existing)
+    connection.execute(text(f"INSERT INTO {table_name}_new ({columns}, guild_id) SELECT {columns}, :guild_id FROM {table_name}"),
+                       {"guild_id": default_guild_id})
+    connection.execute(text(f"DROP TABLE {table_name}"))
+    connection.execute(text(f"ALTER TABLE {table_name}_new RENAME TO {table_name}"))
+
+
+def add_guild_column(connection: Connection, table_name: str, default_guild_id: int):
+    connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN guild_id BIGINT"))
+    connection.execute(text(f"UPDATE {table_name} SET guild_id = :guild_id"), {"guild_id": default_guild_id})
+    connection.execute(text(f"ALTER TABLE {table_name} ALTER COLUMN guild_id SET NOT NULL"))
+    for constraint in inspect(connection).get_unique_constraints(table_name):
+        if constraint["column_names"] == PRE_GUILD_UNIQUE_COLUMNS.get(table_name):
+            connection.execute(text(f"ALTER TABLE {table_name} DROP CONSTRAINT {constraint['name']}"))
+    for name in PRE_GUILD_INDEXES.get(table_name, ()):
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def migration_guild_scoping(connection: Connection, default_guild_id: int):
+    # Modules first, the others reference it
+    for table_name in ("modules", "lectures", "seminars", "codes"):
+        existing = column_names(connection, table_name)
+        if "guild_id" not in existing:
+            if connection.dialect.name == "sqlite":
+                rebuild_sqlite_table(connection, table_name, default_guild_id)
+            else:
+                add_guild_column(connection, table_name, default_guild_id)
+        # Not on the columns a rebuild brought in early, they're only filled in by the migration that adds them
+        create_indexes(connection, table_name, *(index.name for index in Base.metadata.tables[table_name].indexes),
+                       columns=existing | {"guild_id"})
+
+
+# Rows rewritten per statement by migrations that touch every row, so no table is ever held in memory at once
+MIGRATION_BATCH_SIZE = 1000
+
+
+def local_to_utc(value: typing.Optional[datetime.datetime]) -> typing.Optional[datetime.datetime]:
+    """
+    Converts a naive local time to naive UTC with the offset in force at that time, so rows from either side of a
+    daylight saving change both come out right. Times in the repeated hour are taken as the first of the two
+    """
+    if value is None:
+        return None
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def migration_timetable(connection: Connection, default_guild_id: int):
+    """
+    Adds the scheduled times to lectures and seminars, and moves every stored timestamp from this machine's local
+    time to UTC, which is what they are written in from now on
+    """
+    for table_name in ("lectures", "seminars"):
+        existing = column_names(connection, table_name)
+        for column in ("starts_at", "ends_at"):
+            if column not in existing:
+                column_type = Base.metadata.tables[table_name].c[column].type.compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column} {column_type}"))
+        create_indexes(connection, table_name, f"ix_{table_name}_ends_at")
+
+    # Local time is UTC all year round, nothing to convert
+    if not time.timezone and not time.daylight:
+        return
+    for table_name in ("modules", "lectures", "seminars", "codes"):
+        table = Base.metadata.tables[table_name]
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            .values(created_at=bindparam("new_created_at"), updated_at=bindparam("new_updated_at"))
+        )
+        # Paged on id, one index range per batch however far through the table it is
+        last_id = 0
+        while True:
+            rows = connection.execute(
+                select(table.c.id, table.c.created_at, table.c.updated_at)
+                .where(table.c.id > last_id).order_by(table.c.id).limit(MIGRATION_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            connection.execute(stmt, [dict(row_id=row_id, new_created_at=local_to_utc(created_at), new_updated_at=local_to_utc(updated_at))
+                                      for row_id, created_at, updated_at in rows])
+            last_id = rows[-1][0]
+            if len(rows) < MIGRATION_BATCH_SIZE:
+                break
+
+
+# Replaced by the code_key indexes in migration 6
+PRE_CODE_KEY_INDEXES = ("uq_codes_guild_id_code_lecture", "uq_codes_guild_id_code_seminar", "ix_codes_guild_id_module_id_code")
+
+
+def migration_code_keys(connection: Connection, default_guild_id: int):
+    """
+    Stores codes in upper case next to their packed keys, and moves the unique indexes onto the keys. Codes that
+    aren't 1 to 5 letters and digits can't be packed and are deleted, codes only last a day anyway
+    """
+    if "code_key" not in column_names(connection, "codes"):
+        connection.execute(text("ALTER TABLE codes ADD COLUMN code_key INTEGER NOT NULL DEFAULT 0"))
+    # Upper casing can turn two codes into one, which the old unique indexes would refuse
+    for name in PRE_CODE_KEY_INDEXES:
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+    table = Base.metadata.tables["codes"]
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"))
+        .values(code=bindparam("new_code"), code_key=bindparam("new_code_key"))
+    )
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(table.c.id, table.c.code)
+            .where(table.c.id > last_id, table.c.code_key == 0).order_by(table.c.id).limit(MIGRATION_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        values, invalid = [], []
+        for code_id, code in rows:
+            normalised = normalise_code(code)
+            if normalised is None:
+                invalid.append(code_id)
+            else:
+                values.append(dict(row_id=code_id, new_code=normalised, new_code_key=pack_code(normalised)))
+        if values:
+            connection.execute(stmt, values)
+        if invalid:
+            connection.execute(delete(table).where(table.c.id.in_(invalid)))
+        last_id = rows[-1][0]
+        if len(rows) < MIGRATION_BATCH_SIZE:
+            break
+
+    delete_duplicate_codes(connection, "guild_id", "code_key", "module_id", "lecture_id", "seminar_id")
+    create_indexes(connection, "codes", "uq_codes_guild_id_code_key_lecture", "uq_codes_guild_id_code_key_seminar",
+                   "ix_codes_guild_id_module_id_code_key")
+
+
+def migration_code_archive(connection: Connection, default_guild_id: int):
+    # create_all has made the table by now, but only runs when a migration is due, which this one is
+    Base.metadata.tables["archived_codes"].create(connection, checkfirst=True)
+
+
+# (version, description, migration), in order
+MIGRATIONS: typing.List[typing.Tuple[int, str, typing.Callable[[Connection, int], None]]] = [
+    (1, "Unique code indexes and codes.created_at index", migration_unique_codes),
+    (2, "Indexes for the hot lookup columns", migration_hot_lookup_indexes),
+    (3, "Indexes for paging lectures and seminars by id", migration_pagination_indexes),
+    (4, "Scope modules, lectures, seminars and codes to a guild", migration_guild_scoping),
+    (5, "Scheduled lecture and seminar times, and timestamps in UTC", migration_timetable),
+    (6, "Upper case codes with packed integer keys", migration_code_keys),
+    (7, "Archive of expired codes", migration_code_archive),
+]
+
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(connection: Connection) -> int:
+    version = connection.execute(select(schema_version.c.version)).scalar()
+    return 0 if version is None else version
+
+
+def migrate(engine: Engine, default_guild_id: int = 0) -> typing.List[int]:
+    """
+    Creates missing tables, then applies every migration newer than the database's schema version
+
+    Rows from before guild scoping are given default_guild_id. Returns the versions that were applied
+    """
+    # Already up to date is the usual case at startup, one query instead of create_all inspecting every table
+    with engine.connect() as connection:
+        if inspect(connection).has_table(schema_version.name) and get_version(connection) >= LATEST_VERSION:
+            return []
+
+    Base.metadata.create_all(engine)
+    metadata.create_all(engine)
+
+    applied = []
+    for version, description, migration in MIGRATIONS:
+        with engine.begin() as connection:
+            current = get_version(connection)
+            if version <= current:
+                continue
+            print(f"Applying migration {version}: {description}")
+            migration(connection, default_guild_id)
+            if connection.execute(select(schema_version.c.version)).first() is None:
+                connection.execute(insert(schema_version).values(version=version))
+            else:
+                connection.execute(update(schema_version).values(version=version))
+        applied.append(version)
+    return applied
@@ -0,0 +1,403 @@
+"""
+Synchronous query functions, each taking a Session as the first argument.
+
+These are run on the Database worker pool, never directly on the event loop. Everything is scoped to a guild,
+reads go through Database.read so they can use a replica, and writes through Database.write:
+
+    module = await database.read(guild_id, queries.get_module, guild_id, module_code)
+    await database.write(guild_id, queries.add_module, guild_id, name, module_code, description)
+"""
+import datetime
+import typing
+
+from sqlalchemy import select, delete, func, insert, text, or_, case, literal, DateTime
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.ArchivedCode import ArchivedCode
+from models.Code import Code
+from models.Lecture import Lecture
+from models.Module import Module
+from models.Seminar import Seminar
+from utils import LiveCode, ModuleRecord, LectureRecord, SeminarRecord, ScheduledSession, pack_code
+
+# add_code outcomes
+ADDED = "added"
+EXISTS = "exists"
+MISSING = "missing"
+
+
+MODULE_COLUMNS = (Module.id, Module.name, Module.module_code, Module.description, Module.guild_id)
+
+
+def get_module(session: Session, guild_id: int, module_code: str) -> typing.Union[ModuleRecord, None]:
+    stmt = select(*MODULE_COLUMNS).where(Module.guild_id == guild_id, Module.module_code == module_code)
+    row = session.execute(stmt).first()
+    return None if row is None else ModuleRecord(*row)
+
+
+def get_module_by_id(session: Session, guild_id: int, module_id: int) -> typing.Union[ModuleRecord, None]:
+    row = session.execute(select(*MODULE_COLUMNS).where(Module.guild_id == guild_id, Module.id == module_id)).first()
+    return None if row is None else ModuleRecord(*row)
+
+
+def get_modules(session: Session, guild_id: int) -> typing.List[ModuleRecord]:
+    return [ModuleRecord(*row) for row in session.execute(select(*MODULE_COLUMNS).where(Module.guild_id == guild_id))]
+
+
+def get_modules_page(session: Session, guild_id: int, after_id: typing.Optional[int], limit: int) -> typing.List[ModuleRecord]:
+    """
+    Returns up to limit of a guild's modules with an id greater than after_id (from the start when None), ordered by id
+    """
+    stmt = select(*MODULE_COLUMNS).where(Module.guild_id == guild_id).order_by(Module.id).limit(limit)
+    if after_id is not None:
+        stmt = stmt.where(Module.id > after_id)
+    return [ModuleRecord(*row) for row in session.execute(stmt)]
+
+
+def get_seminars(session: Session, guild_id: int, module_id: int) -> typing.List[SeminarRecord]:
+    stmt = (
+        select(Seminar.id, Seminar.name, Seminar.module_id)
+        .where(Seminar.guild_id == guild_id, Seminar.module_id == module_id)
+        .order_by(Seminar.name)
+    )
+    return [SeminarRecord(*row) for row in session.execute(stmt)]
+
+
+def get_lectures(session: Session, guild_id: int, module_id: int) -> typing.List[LectureRecord]:
+    stmt = (
+        select(Lecture.id, Lecture.name, Lecture.module_id)
+        .where(Lecture.guild_id == guild_id, Lecture.module_id == module_id)
+        .order_by(Lecture.name)
+    )
+    return [LectureRecord(*row) for row in session.execute(stmt)]
+
+
+def get_seminars_page(session: Session, guild_id: int, module_id: int, after_id: typing.Optional[int], limit: int) -> typing.List[SeminarRecord]:
+    stmt = (
+        select(Seminar.id, Seminar.name, Seminar.module_id)
+        .where(Seminar.guild_id == guild_id, Seminar.module_id == module_id)
+        .order_by(Seminar.id)
+        .limit(limit)
+    )
+    if after_id is not None:
+        stmt = stmt.where(Seminar.id > after_id)
+    return [SeminarRecord(*row) for row in session.execute(stmt)]
+
+
+def get_lectures_page(session: Session, guild_id: int, module_id: int, after_id: typing.Optional[int], limit: int) -> typing.List[LectureRecord]:
+    stmt = (
+        select(Lecture.id, Lecture.name, Lecture.module_id)
+        .where(Lecture.guild_id == guild_id, Lecture.module_id == module_id)
+        .order_by(Lecture.id)
+        .limit(limit)
+    )
+    if after_id is not None:
+        stmt = stmt.where(Lecture.id > after_id)
+    return [LectureRecord(*row) for row in session.execute(stmt)]
+
+
+def get_catalogue_names(session: Session) -> typing.Tuple[typing.List[typing.Tuple[int, str]], ...]:
+    """
+    Returns every (guild id, module code), (guild id, lecture name) and (guild id, seminar name), for the autocomplete indexes
+    """
+    return (
+        session.execute(select(Module.guild_id, Module.module_code)).all(),
+        session.execute(select(Lecture.guild_id, Lecture.name)).all(),
+        session.execute(select(Seminar.guild_id, Seminar.name)).all(),
+    )
+
+
+def live_code(code: Code, name: str, module_name: str) -> LiveCode:
+    return LiveCode(id=code.id, code=code.code, name=name, module_name=module_name, module_id=code.module_id,
+                    lecture_id=code.lecture_id, seminar_id=code.seminar_id, created_at=code.created_at, guild_id=code.guild_id,
+                    code_key=code.code_key)
+
+
+def get_live_codes(session: Session, since: datetime.datetime, now: datetime.datetime) -> typing.List[LiveCode]:
+    """
+    Returns every code in every guild that was posted since since, or whose lecture/seminar hasn't ended by now,
+    with its lecture/seminar and module names
+
+    The lecture, seminar and module are joined in, so this is one statement however many codes match
+    """
+    session_name = func.coalesce(Lecture.name, Seminar.name)
+    session_ends_at = func.coalesce(Lecture.ends_at, Seminar.ends_at)
+    stmt = (
+        select(Code.id, Code.code, session_name, Module.name, Code.module_id, Code.lecture_id, Code.seminar_id,
+               Code.created_at, Code.guild_id, Code.code_key)
+        .join(Module, Code.module_id == Module.id)
+        .outerjoin(Lecture, Code.lecture_id == Lecture.id)
+        .outerjoin(Seminar, Code.seminar_id == Seminar.id)
+        # Codes left behind by a lecture/seminar removed before deletes cascaded have no name
+        .where(session_name.isnot(None), or_(Code.created_at >= since, session_ends_at > now))
+        .order_by(Code.created_at, Code.id)
+    )
+    return [LiveCode(*row) for row in session.execute(stmt)]
+
+
+def get_scheduled_sessions(session: Session, now: datetime.datetime) -> typing.List[ScheduledSession]:
+    """
+    Returns every lecture and seminar in every guild that is scheduled and hasn't ended by now
+    """
+    sessions = []
+    for kind, model in (("lecture", Lecture), ("seminar", Seminar)):
+        stmt = (
+            select(model.id, model.module_id, model.guild_id, model.starts_at, model.ends_at)
+            .where(model.ends_at > now, model.starts_at.isnot(None))
+        )
+        sessions.extend(ScheduledSession(kind, *row) for row in session.execute(stmt))
+    return sessions
+
+
+def scheduled_session(kind: str, obj: typing.Union[Lecture, Seminar]) -> typing.Union[ScheduledSession, None]:
+    if obj.starts_at is None or obj.ends_at is None:
+        return None
+    return ScheduledSession(kind, obj.id, obj.module_id, obj.guild_id, obj.starts_at, obj.ends_at)
+
+
+def insert_code_or_ignore(session: Session, values: dict) -> typing.Union[int, None]:
+    """
+    Inserts a code row unless it collides with a unique index
+
+    Returns the new id, or None if an identical code already exists. Does not commit
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        result = session.execute(dialect_insert(Code).values(**values).on_conflict_do_nothing())
+        if result.rowcount == 0:
+            return None
+        return result.inserted_primary_key[0]
+
+    try:
+        with session.begin_nested():
+            result = session.execute(insert(Code).values(**values))
+    except IntegrityError:
+        return None
+    return result.inserted_primary_key[0]
+
+
+def code_values(session: Session, guild_id: int, code: str, module_id: int, kind: str, session_id: int,
+                now: datetime.datetime = None) -> typing.Union[dict, None]:
+    """
+    Builds the codes table values for the lecture or seminar (kind) picked in the dropdown, or None if the module
+    has no such lecture/seminar
+
+    code must already be normalised, see utils.normalise_code
+    """
+    model = Lecture if kind == "lecture" else Seminar
+    stmt = select(model.id).where(model.guild_id == guild_id, model.module_id == module_id, model.id == session_id)
+    if session.execute(stmt).first() is None:
+        return None
+
+    now = now or datetime.datetime.utcnow()
+    values = dict(guild_id=guild_id, code=code, code_key=pack_code(code), module_id=module_id, created_at=now, updated_at=now)
+    values["lecture_id" if kind == "lecture" else "seminar_id"] = session_id
+    return values
+
+
+def add_code(session: Session, guild_id: int, code: str, module_id: int, kind: str, session_id: int) -> typing.Tuple[str, typing.Union[Code, None]]:
+    """
+    Adds a code for the lecture or seminar picked in the dropdown
+
+    Returns (ADDED, code), (EXISTS, None) if the code is already stored for that seminar/lecture,
+    or (MISSING, None) if the module has no such lecture/seminar
+    """
+    values = code_values(session, guild_id, code, module_id, kind, session_id)
+    if values is None:
+        return MISSING, None
+
+    code_id = insert_code_or_ignore(session, values)
+    session.commit()
+    if code_id is None:
+        return EXISTS, None
+    return ADDED, Code(id=code_id, status=1, **values)
+
+
+def add_codes(session: Session, submissions: typing.Sequence[typing.Tuple[int, str, int, str, int]]) -> typing.List[typing.Tuple[str, typing.Union[Code, None]]]:
+    """
+    Adds a batch of (guild_id, code, module_id, kind, session_id) submissions in one transaction
+
+    Returns an add_code style outcome for each submission, in order
+    """
+    now = datetime.datetime.utcnow()
+    results = []
+    for guild_id, code, module_id, kind, session_id in submissions:
+        values = code_values(session, guild_id, code, module_id, kind, session_id, now)
+        if values is None:
+            results.append((MISSING, None))
+            continue
+        code_id = insert_code_or_ignore(session, values)
+        results.append((EXISTS, None) if code_id is None else (ADDED, Code(id=code_id, status=1, **values)))
+    session.commit()
+    return results
+
+
+def add_module(session: Session, guild_id: int, name: str, module_code: str, description: str) -> Module:
+    obj_module = Module(guild_id=guild_id, name=name, module_code=module_code, description=description)
+    session.add(obj_module)
+    session.commit()
+    return obj_module
+
+
+def add_seminar(session: Session, guild_id: int, name: str, module_id: int, starts_at: datetime.datetime = None,
+                ends_at: datetime.datetime = None) -> Seminar:
+    obj_seminar = Seminar(guild_id=guild_id, name=name, module_id=module_id, starts_at=starts_at, ends_at=ends_at)
+    session.add(obj_seminar)
+    session.commit()
+    return obj_seminar
+
+
+def add_lecture(session: Session, guild_id: int, name: str, module_id: int, starts_at: datetime.datetime = None,
+                ends_at: datetime.datetime = None) -> Lecture:
+    obj_lecture = Lecture(guild_id=guild_id, name=name, module_id=module_id, starts_at=starts_at, ends_at=ends_at)
+    session.add(obj_lecture)
+    session.commit()
+    return obj_lecture
+
+
+def schedule_session(session: Session, guild_id: int, kind: str, name: str, starts_at: typing.Optional[datetime.datetime],
+                     ends_at: typing.Optional[datetime.datetime]) -> typing.Union[Lecture, Seminar, None]:
+    """
+    Sets (or with None, clears) when a lecture or seminar is on, returning None if there is no such lecture/seminar
+    """
+    model = Lecture if kind == "lecture" else Seminar
+    obj = session.execute(select(model).where(model.guild_id == guild_id, model.name == name)).scalars().first()
+    if obj is not None:
+        obj.starts_at = starts_at
+        obj.ends_at = ends_at
+        obj.updated_at = datetime.datetime.utcnow()
+        session.commit()
+    return obj
+
+
+def remove_module(session: Session, guild_id: int, module_code: str) -> typing.Union[Module, None]:
+    stmt = select(Module).where(Module.guild_id == guild_id, Module.module_code == module_code)
+    module = session.execute(stmt).scalars().first()
+    if module is not None:
+        session.delete(module)
+        session.commit()
+    return module
+
+
+def remove_code(session: Session, guild_id: int, code: str, module_id: int) -> typing.Union[Code, None]:
+    stmt = select(Code).where(Code.guild_id == guild_id, Code.module_id == module_id, Code.code_key == pack_code(code))
+    obj_code = session.execute(stmt).scalars().first()
+    if obj_code is not None:
+        session.delete(obj_code)
+        session.commit()
+    return obj_code
+
+
+def remove_lecture(session: Session, guild_id: int, lecture_name: str) -> typing.Union[Lecture, None]:
+    stmt = select(Lecture).where(Lecture.guild_id == guild_id, Lecture.name == lecture_name)
+    lecture = session.execute(stmt).scalars().first()
+    if lecture is not None:
+        session.delete(lecture)
+        session.commit()
+    return lecture
+
+
+def remove_seminar(session: Session, guild_id: int, seminar_name: str) -> typing.Union[Seminar, None]:
+    stmt = select(Seminar).where(Seminar.guild_id == guild_id, Seminar.name == seminar_name)
+    seminar = session.execute(stmt).scalars().first()
+    if seminar is not None:
+        session.delete(seminar)
+        session.commit()
+    return seminar
+
+
+def archive_codes_older_than(session: Session, cutoff: datetime.datetime, batch_size: int = 1000) -> int:
+    """
+    Moves codes created before cutoff into archived_codes, batch_size rows per transaction so the write lock is never
+    held for long. Each batch is copied with one INSERT ... SELECT and deleted by id
+
+    Returns the number of codes archived
+    """
+    archived = 0
+    while True:
+        ids = session.execute(select(Code.id).where(Code.created_at < cutoff).order_by(Code.id).limit(batch_size)).scalars().all()
+        if not ids:
+            return archived
+        rows = (
+            select(Code.guild_id, Code.id, Code.code, Code.code_key, Module.module_code, Module.name,
+                   case((Code.lecture_id.isnot(None), "lecture"), else_="seminar"), func.coalesce(Lecture.name, Seminar.name),
+                   Code.created_at, literal(datetime.datetime.utcnow(), DateTime))
+            .join(Module, Code.module_id == Module.id)
+            .outerjoin(Lecture, Code.lecture_id == Lecture.id)
+            .outerjoin(Seminar, Code.seminar_id == Seminar.id)
+            .where(Code.id.in_(ids))
+            .order_by(Code.id)
+        )
+        columns = ["guild_id", "code_id", "code", "code_key", "module_code", "module_name", "session_kind", "session_name",
+                   "created_at", "archived_at"]
+        session.execute(insert(ArchivedCode).from_select(columns, rows))
+        session.execute(delete(Code).where(Code.id.in_(ids)).execution_options(synchronize_session=False))
+        session.commit()
+        archived += len(ids)
+        if len(ids) < batch_size:
+            return archived
+
+
+def clear_duplicate_codes(session: Session) -> int:
+    """
+    Deletes every duplicate (code key, module, lecture/seminar) row in one statement, keeping the oldest (lowest id)
+    """
+    keep = select(func.min(Code.id)).group_by(Code.code_key, Code.module_id, Code.lecture_id, Code.seminar_id)
+    stmt = delete(Code).where(Code.id.not_in(keep)).execution_options(synchronize_session=False)
+    removed = session.execute(stmt).rowcount
+    session.commit()
+    return removed
+
+
+def get_counts(session: Session, guild_id: int) -> typing.Dict[str, int]:
+    """
+    Counts a guild's modules, lectures, seminars and codes in a single round trip
+    """
+    stmt = select(*(
+        select(func.count()).select_from(model).where(model.guild_id == guild_id).scalar_subquery().label(label)
+        for label, model in (("modules", Module), ("lectures", Lecture), ("seminars", Seminar), ("codes", Code))
+    ))
+    return dict(session.execute(stmt).one()._mapping)
+
+
+def get_codes_per_module(session: Session, guild_id: int) -> typing.Dict[str, int]:
+    """
+    Counts a guild's codes per module code
+    """
+    stmt = (
+        select(Module.module_code, func.count(Code.id))
+        .join(Code, Code.module_id == Module.id)
+        .where(Module.guild_id == guild_id)
+        .group_by(Module.module_code)
+    )
+    return {module_code: count for module_code, count in session.execute(stmt)}
+
+
+def get_code_times_since(session: Session, guild_id: int, since: datetime.datetime) -> typing.List[datetime.datetime]:
+    stmt = select(Code.created_at).where(Code.guild_id == guild_id, Code.created_at >= since)
+    return session.execute(stmt).scalars().all()
+
+
+def get_database_size(session: Session) -> typing.Union[int, None]:
+    """
+    Returns the size of the database in bytes, or None if the dialect has no cheap way to tell
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        page_count = session.execute(text("PRAGMA page_count")).scalar()
+        page_size = session.execute(text("PRAGMA page_size")).scalar()
+        return page_count * page_size
+    if dialect == "postgresql":
+        return session.execute(text("SELECT pg_database_size(current_database())")).scalar()
+    return None
+
+
+def get_stats(session: Session, guild_id: int, day: datetime.date) -> typing.Tuple[typing.Dict[str, int], typing.Dict[str, int], typing.List[datetime.datetime]]:
+    """
+    Everything StatsCounters.reconcile needs for a guild, in one session
+    """
+    midnight = datetime.datetime.combine(day, datetime.time())
+    return get_counts(session, guild_id), get_codes_per_module(session, guild_id), get_code_times_since(session, guild_id, midnight)
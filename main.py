@@ -1,40 +1,299 @@
-import nextcord
-import os
+import time
+
+# Taken before anything heavy is imported, so the ready time covers the whole cold start
+STARTED_AT = time.perf_counter()
+
+import asyncio
+import collections
+import hashlib
 import json
+import os
+import typing
+
+import nextcord
 from nextcord.ext import commands
-from sqlalchemy import create_engine
 
-abspath = os.path.abspath(__file__)
-dname = os.path.dirname(abspath)
-os.chdir(dname)
+from utils import MetricsRegistry, MetricsServer
+
+dname = os.path.dirname(os.path.abspath(__file__))
+
+# Per command, for each user and each guild: [calls, per seconds]. "default" covers the commands not listed,
+# and null turns a scope's limit off. RATE_LIMITS in the config is merged over these, command by command
+DEFAULT_RATE_LIMITS = {
+    "default": {"user": [5, 10], "guild": [60, 10]},
+    "addcode": {"user": [5, 30]},
+    "stats": {"user": [2, 10]},
+    "importcodes": {"user": [1, 60], "guild": [2, 60]},
+    "history": {"user": [2, 60], "guild": [5, 60]},
+}
 
-config = json.loads(open("config.json", "r").read())
-TEST_SERVER = config['TEST_SERVER_GUILD_ID']
-TOKEN = config['TOKEN']
-ENGINE_URL = config['ENGINE_URL']
-del config['TOKEN']
 
+def load_config(path: str = None) -> dict:
+    """
+    Reads config.json, or the file ATTENDANCE_CONFIG points at, e.g. for the benchmarks
+    """
+    path = path or os.environ.get("ATTENDANCE_CONFIG") or os.path.join(dname, "config.json")
+    with open(path, "r") as f:
+        return json.load(f)
 
-class AttendanceBot(commands.Bot):
-    test_server = TEST_SERVER
-    engine = create_engine("sqlite:///database.db" if ENGINE_URL == "" else ENGINE_URL, echo=True)
 
-    def __init__(self, **kwargs):
+class AttendanceBot(commands.AutoShardedBot):
+    """
+    The bot, configured from a loaded config
+
+    The engine and database worker pool are only created when first used, and the schema is checked on a worker
+    thread while logging in, so nothing touches the database on import. Build one with create_bot
+    """
+
+    def __init__(self, config: dict, **kwargs):
         super().__init__(**kwargs)
+        self.test_server = config['TEST_SERVER_GUILD_ID']
+        self.engine_url = config.get('ENGINE_URL') or f"sqlite:///{os.path.join(dname, 'database.db')}"
+        # Replicas of ENGINE_URL that read-only queries are spread over, and how many seconds after a guild writes
+        # its reads stay on the primary. Keep that above the replicas' lag
+        self.read_engine_urls = config.get('READ_ENGINE_URLS', [])
+        self.read_your_writes = config.get('READ_YOUR_WRITES_SECONDS', 5)
+        # With SQLite files, copy the primary over the replicas this often, a stand-in for real replication
+        self.sqlite_replication_interval = config.get('SQLITE_REPLICATION_INTERVAL')
+        # How processes sharing the database tell each other about writes: "local" for a single process, "postgres"
+        # to NOTIFY on CHANGE_BUS_CHANNEL, or "socket" for UNIX sockets in CHANGE_BUS_DIR, e.g. with SQLite
+        self.change_bus_kind = config.get('CHANGE_BUS', 'local')
+        self.change_bus_channel = config.get('CHANGE_BUS_CHANNEL', 'attendance_changes')
+        self.change_bus_dir = config.get('CHANGE_BUS_DIR') or os.path.join(dname, "changes")
+        self.db_workers = config.get('DB_WORKERS', 4)
+        self.db_pool_size = config.get('DB_POOL_SIZE', 5)
+        self.db_max_overflow = config.get('DB_MAX_OVERFLOW', 10)
+        self.db_pool_timeout = config.get('DB_POOL_TIMEOUT', 30)
+        self.db_debug = config.get('DB_DEBUG', False)
+        # Logs every statement, only worth the cost when debugging
+        self.sql_echo = config.get('SQL_ECHO', False)
+        self.code_expiry_interval = config.get('CODE_EXPIRY_INTERVAL', 60 * 60)
+        self.duplicate_sweep_interval = config.get('DUPLICATE_SWEEP_INTERVAL', 60 * 60 * 24)
+        self.maintenance_jitter = config.get('MAINTENANCE_JITTER', 60)
+        self.stats_reconcile_interval = config.get('STATS_RECONCILE_INTERVAL', 60 * 10)
+        self.catalogue_cache_size = config.get('CATALOGUE_CACHE_SIZE', 256)
+        self.code_queue_window = config.get('CODE_QUEUE_WINDOW', 0.05)
+        self.code_queue_max_batch = config.get('CODE_QUEUE_MAX_BATCH', 200)
+        self.code_queue_max_pending = config.get('CODE_QUEUE_MAX_PENDING', 1000)
+        self.page_size = config.get('PAGE_SIZE', 10)
+        self.page_cache_ttl = config.get('PAGE_CACHE_TTL', 60)
+        self.max_import_size = config.get('MAX_IMPORT_SIZE', 8 * 1024 * 1024)
+        self.rate_limits = {**DEFAULT_RATE_LIMITS, **config.get('RATE_LIMITS', {})}
+        self.rate_limit_max_buckets = config.get('RATE_LIMIT_MAX_BUCKETS', 10_000)
+        # Hashes of the command payloads last synced with Discord, so unchanged commands aren't pushed again
+        self.command_hash_file = config.get('COMMAND_HASH_FILE') or os.path.join(dname, "command_hashes.json")
+        self._engine = None
+        self._read_engines = None
+        self._database = None
+        self._replicator = None
+        self._change_bus = None
+
+        # Seconds from STARTED_AT to each startup phase
+        self.startup_timings: typing.Dict[str, float] = {}
+        self.metrics = MetricsRegistry()
+        # /metrics is served on METRICS_HOST:METRICS_PORT, set METRICS_PORT to null to turn it off
+        self.metrics_host = config.get('METRICS_HOST', '127.0.0.1')
+        self.metrics_port = config.get('METRICS_PORT', 9108)
+        self.metrics_server = None if self.metrics_port is None else MetricsServer(self.metrics, self.metrics_host, self.metrics_port)
+        self.metrics.gauge("attendance_gateway_latency_seconds", "Heartbeat latency of each shard's gateway connection", ("shard",),
+                           callback=lambda: {(str(shard_id),): latency for shard_id, latency in self.latencies})
+        self.metrics.gauge("attendance_guilds", "Guilds the bot is in", callback=lambda: len(self.guilds))
+        self.metrics.gauge("attendance_startup_seconds", "Seconds from process start to each startup phase", ("phase",),
+                           callback=lambda: {(phase,): seconds for phase, seconds in self.startup_timings.items()})
+        self.mark_startup("configured")
+
+    def mark_startup(self, phase: str):
+        if phase not in self.startup_timings:
+            self.startup_timings[phase] = time.perf_counter() - STARTED_AT
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from database import create_database_engine
+            self._engine = create_database_engine(self.engine_url, pool_size=self.db_pool_size, max_overflow=self.db_max_overflow,
+                                                  pool_timeout=self.db_pool_timeout, echo=self.sql_echo)
+        return self._engine
+
+    @property
+    def read_engines(self):
+        if self._read_engines is None:
+            from database import create_database_engine
+            self._read_engines = [
+                create_database_engine(url, pool_size=self.db_pool_size, max_overflow=self.db_max_overflow,
+                                       pool_timeout=self.db_pool_timeout, echo=self.sql_echo)
+                for url in self.read_engine_urls
+            ]
+        return self._read_engines
+
+    @property
+    def database(self):
+        if self._database is None:
+            from database import Database
+            self._database = Database(self.engine, max_workers=self.db_workers, debug=self.db_debug, read_engines=self.read_engines,
+                                      read_your_writes=self.read_your_writes)
+        return self._database
+
+    @property
+    def replicator(self):
+        if self._replicator is None and self.sqlite_replication_interval is not None and self.read_engine_urls:
+            from database import SQLiteReplicator
+            self._replicator = SQLiteReplicator(self.engine, self.read_engines, interval=self.sqlite_replication_interval)
+        return self._replicator
+
+    @property
+    def change_bus(self):
+        if self._change_bus is None:
+            from database import ChangeBus, PostgresChangeBus, SocketChangeBus
+            if self.change_bus_kind == "postgres":
+                self._change_bus = PostgresChangeBus(self.engine, channel=self.change_bus_channel)
+            elif self.change_bus_kind == "socket":
+                self._change_bus = SocketChangeBus(self.change_bus_dir)
+            elif self.change_bus_kind == "local":
+                self._change_bus = ChangeBus()
+            else:
+                raise ValueError(f"CHANGE_BUS is local, postgres or socket, not {self.change_bus_kind!r}")
+        return self._change_bus
+
+    def prepare_database(self) -> typing.List[int]:
+        """
+        Creates the engine and brings the schema up to date. Blocking, run on a worker thread by start
+        """
+        from database import migrate
+        # Everything stored before guild scoping belonged to the one server the bot ran in
+        applied = migrate(self.engine, default_guild_id=self.test_server)
+        # Replicas start out with the migrated schema, rather than after the first interval
+        if self.replicator is not None:
+            self.replicator.replicate()
+        return applied
+
+    async def start(self, token: str, *, reconnect: bool = True):
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
+            print(f"Serving metrics on http://{self.metrics_host}:{self.metrics_port}/metrics")
+        # The schema check doesn't need Discord and logging in doesn't need the database, so do both at once
+        await asyncio.gather(self.login(token), self.loop.run_in_executor(None, self.prepare_database))
+        self.mark_startup("database")
+        if self.replicator is not None:
+            self.replicator.start(self.loop)
+        # Listening before the cogs load their caches, so no change made meanwhile is missed
+        await self.change_bus.start(self.loop)
+        # Cogs load their caches as soon as they're added, so only once the schema is up to date
+        self.load_extension('cogs.maincog')
+        self.mark_startup("extensions")
+        await self.connect(reconnect=reconnect)
+
+    async def on_application_command_error(self, interaction: nextcord.Interaction, exception: nextcord.ApplicationError):
+        # Imported when needed like the database modules, nothing from the cog is loaded with this module
+        from cogs.maincog import RateLimited
+        if isinstance(exception, RateLimited):
+            # Expected whenever someone spams a command, so answered without the default handler's traceback
+            await interaction.response.send_message(exception.reply(interaction.application_command.name), ephemeral=True)
+            return
+        await super().on_application_command_error(interaction, exception)
 
     @classmethod
     def prefixes(cls, client: None, message):
         return "!"
 
+    async def close(self):
+        for cog in list(self.cogs.values()):
+            shutdown = getattr(cog, "shutdown", None)
+            if shutdown is not None:
+                await shutdown()
+        if self.replicator is not None:
+            self.replicator.stop()
+        if self._change_bus is not None:
+            await self._change_bus.stop()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        await super().close()
+
+    def command_hashes(self) -> typing.Dict[str, str]:
+        """
+        A hash of the command payloads per scope, "global" or a guild id
+        """
+        payloads = collections.defaultdict(list)
+        for command in self.get_all_application_commands():
+            if command.is_global:
+                payloads["global"].append(command.get_payload(None))
+            for guild_id in command.guild_ids_to_rollout:
+                payloads[str(guild_id)].append(command.get_payload(guild_id))
+        return {
+            scope: hashlib.sha256(json.dumps(sorted(scope_payloads, key=lambda payload: payload["name"]),
+                                             sort_keys=True, default=str).encode()).hexdigest()
+            for scope, scope_payloads in payloads.items()
+        }
+
+    def load_synced_hashes(self) -> typing.Dict[str, str]:
+        try:
+            with open(self.command_hash_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    async def sync_commands(self, guild_id: typing.Optional[int] = None):
+        """
+        Syncs the global or one guild's commands, only registering, updating and deleting them on Discord when their
+        payloads have changed since the last sync. Either way they are fetched and associated with their ids, which
+        autocomplete looks them up by
+        """
+        scope = "global" if guild_id is None else str(guild_id)
+        local = self.command_hashes().get(scope)
+        synced = self.load_synced_hashes()
+        changed = local != synced.get(scope)
+        await self.sync_application_commands(
+            guild_id=guild_id,
+            associate_known=True,
+            delete_unknown=changed,
+            update_known=changed,
+            register_new=changed,
+        )
+        if changed:
+            print(f"Synced {scope} commands with Discord")
+            synced[scope] = local
+            with open(self.command_hash_file, "w") as f:
+                json.dump(synced, f, indent=2)
+
+    async def on_connect(self):
+        self.add_all_application_commands()
+        await self.sync_commands()
+
+    async def on_guild_available(self, guild: nextcord.Guild):
+        if not self._connection.get_guild_application_commands(guild.id, rollout=True):
+            return
+        try:
+            await self.sync_commands(guild.id)
+        except nextcord.Forbidden as e:
+            print(f"Can't sync commands with {guild.name} ({guild.id}), is the applications.commands scope enabled? {e}")
+
     async def on_ready(self):
         print(f'{self.user} has connected to discord!')
+        if "ready" not in self.startup_timings:
+            self.mark_startup("ready")
+            print("Ready in {:.2f}s ({})".format(self.startup_timings["ready"], ", ".join(
+                f"{phase} {seconds:.2f}s" for phase, seconds in self.startup_timings.items() if phase != "ready")))
 
+    async def on_shard_ready(self, shard_id: int):
+        print(f'Shard {shard_id} is ready')
 
-if __name__ == "__main__":
-    bot = AttendanceBot(command_prefix=AttendanceBot.prefixes, max_messages=20_000)
-    from models import Module, Code, Lecture, Seminar, Base
-    Base.metadata.create_all(AttendanceBot.engine)
-    bot.load_extension('cogs.maincog')
+
+def create_bot(config: dict) -> AttendanceBot:
+    """
+    Builds the bot from a loaded config. Nothing connects to the database or Discord until it is started
+    """
+    # None lets Discord pick the number of shards
+    return AttendanceBot(config, command_prefix=AttendanceBot.prefixes, max_messages=20_000, shard_count=config.get('SHARD_COUNT'))
+
+
+def main():
+    config = load_config()
+    token = config.pop('TOKEN')
+    # Relative SQLite paths in ENGINE_URL are relative to the bot
+    os.chdir(dname)
+    bot = create_bot(config)
     print("Trying to login...")
-    bot.run(TOKEN)
-    bot.sync_all_application_commands()
+    bot.run(token)
+
+
+if __name__ == "__main__":
+    main()
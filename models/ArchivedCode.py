@@ -0,0 +1,32 @@
+import datetime
+
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Index
+from . import Base
+
+
+class ArchivedCode(Base):
+    # Expired codes, moved out of codes so that table only holds what's current. Rows are only ever appended.
+    # The module and lecture/seminar are copied in by name rather than referenced, so history outlives them
+    __tablename__ = 'archived_codes'
+    id = Column(Integer, primary_key=True)
+    guild_id = Column(BigInteger, nullable=False)
+    # The id the code had in codes. Not unique, SQLite hands out the ids of deleted rows again
+    code_id = Column(Integer, nullable=False)
+    code = Column(String(5), nullable=False)
+    code_key = Column(Integer, nullable=False)
+    module_code = Column(String(20), nullable=False)
+    module_name = Column(String(50), nullable=False)
+    # "lecture" or "seminar"
+    session_kind = Column(String(7), nullable=False)
+    session_name = Column(String(50), nullable=True)
+
+    created_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    # /history streams a module's codes in id order
+    __table_args__ = (
+        Index("ix_archived_codes_guild_id_module_code_id", guild_id, module_code, id),
+    )
+
+    def __repr__(self):
+        return f"ArchivedCode(code='{self.code}', module_code='{self.module_code}', session_name='{self.session_name}', created_at='{self.created_at}')"
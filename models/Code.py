@@ -1,6 +1,6 @@
 import datetime
 
-from sqlalchemy import Column, String, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, String, Integer, BigInteger, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from . import Base
 
@@ -8,15 +8,38 @@ from . import Base
 class Code(Base):
     __tablename__ = 'codes'
     id = Column(Integer, primary_key=True)
+    guild_id = Column(BigInteger, nullable=False)
+    # As shown, upper case. code_key is the same code packed into an integer by utils.pack_code, which the indexes
+    # and lookups use. The server default only covers rows copied in by the migrations before it's filled in
     code = Column(String(5), nullable=False)
+    code_key = Column(Integer, nullable=False, server_default="0")
 
     status = Column(Integer, nullable=False, default=1)
-    created_at = Column(DateTime, nullable=False, default=datetime.datetime.now)
-    updated_at = Column(DateTime, nullable=False, default=datetime.datetime.now)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow, index=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
 
     module_id = Column(Integer, ForeignKey('modules.id'), nullable=False)
     lecture_id = Column(Integer, ForeignKey('lectures.id'), nullable=True)
     seminar_id = Column(Integer, ForeignKey('seminars.id'), nullable=True)
 
+    # A code belongs to either a lecture or a seminar, and NULLs never collide in a unique index,
+    # so uniqueness per (code key, module, lecture/seminar) needs one partial index for each.
+    # guild_id leads every composite index, so lookups never scan other guilds
+    __table_args__ = (
+        Index("uq_codes_guild_id_code_key_lecture", guild_id, code_key, module_id, lecture_id, unique=True,
+              sqlite_where=lecture_id.isnot(None), postgresql_where=lecture_id.isnot(None)),
+        Index("uq_codes_guild_id_code_key_seminar", guild_id, code_key, module_id, seminar_id, unique=True,
+              sqlite_where=seminar_id.isnot(None), postgresql_where=seminar_id.isnot(None)),
+        # removecode looks codes up by module and code key
+        Index("ix_codes_guild_id_module_id_code_key", guild_id, module_id, code_key),
+        # Deleting a lecture/seminar loads its codes
+        Index("ix_codes_lecture_id", lecture_id),
+        Index("ix_codes_seminar_id", seminar_id),
+    )
+
+    module = relationship("Module", back_populates="codes")
+    lecture = relationship("Lecture", back_populates="codes")
+    seminar = relationship("Seminar", back_populates="codes")
+
     def __repr__(self):
         return f"Module(name='{self.name}', description='{self.description}', status={self.status}, created_at='{self.created_at}', updated_at='{self.updated_at}')"
@@ -1,18 +1,36 @@
 import datetime
 
-from sqlalchemy import Column, String, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, String, Integer, BigInteger, ForeignKey, DateTime, Index
+from sqlalchemy.orm import relationship
 from . import Base
 
 
 class Lecture(Base):
     __tablename__ = 'lectures'
     id = Column(Integer, primary_key=True)
-    name = Column(String(50), nullable=False, unique=True)
+    guild_id = Column(BigInteger, nullable=False)
+    name = Column(String(50), nullable=False)
 
     status = Column(Integer, nullable=False, default=1)
-    created_at = Column(DateTime, nullable=False, default=datetime.datetime.now)
-    updated_at = Column(DateTime, nullable=False, default=datetime.datetime.now)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
     module_id = Column(Integer, ForeignKey('modules.id'))
+    # When it's on, UTC. Both are set or neither, /codes shows a scheduled session's codes for as long as it runs
+    starts_at = Column(DateTime, nullable=True)
+    ends_at = Column(DateTime, nullable=True)
+
+    # Names are unique within a guild. Lectures are listed per module, by name for the dropdown
+    # and keyset paginated by id for /lectures. guild_id leads every index, so lookups never scan other guilds
+    __table_args__ = (
+        Index("uq_lectures_guild_id_name", guild_id, name, unique=True),
+        Index("ix_lectures_guild_id_module_id_name", guild_id, module_id, name),
+        Index("ix_lectures_guild_id_module_id_id", guild_id, module_id, id),
+        # The timetable is loaded from the sessions that haven't ended
+        Index("ix_lectures_ends_at", ends_at),
+    )
+
+    module = relationship("Module", back_populates="lectures")
+    codes = relationship("Code", back_populates="lecture", cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"Lecture(name='{self.name}', description='{self.description}', status={self.status}, created_at='{self.created_at}', updated_at='{self.updated_at}')"
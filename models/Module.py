@@ -1,18 +1,29 @@
 import datetime
 
-from sqlalchemy import Column, String, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, String, Integer, BigInteger, ForeignKey, DateTime, Index
+from sqlalchemy.orm import relationship
 from . import Base
 
 
 class Module(Base):
     __tablename__ = 'modules'
     id = Column(Integer, primary_key=True)
+    # The Discord guild the module belongs to, every guild has its own catalogue
+    guild_id = Column(BigInteger, nullable=False)
     name = Column(String(50), nullable=False)
-    module_code = Column(String(20), nullable=False, unique=True)
+    module_code = Column(String(20), nullable=False)
     description = Column(String(255), nullable=True)
     status = Column(Integer, nullable=False, default=1)
-    created_at = Column(DateTime, nullable=False, default=datetime.datetime.now)
-    updated_at = Column(DateTime, nullable=False, default=datetime.datetime.now)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("uq_modules_guild_id_module_code", guild_id, module_code, unique=True),
+    )
+
+    lectures = relationship("Lecture", back_populates="module", cascade="all, delete-orphan")
+    seminars = relationship("Seminar", back_populates="module", cascade="all, delete-orphan")
+    codes = relationship("Code", back_populates="module", cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"Module(name='{self.name}', description='{self.description}', status={self.status}, created_at='{self.created_at}', updated_at='{self.updated_at}')"
@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy.orm import Session
+
+# The bot runs from the repository root, so its packages import from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database, create_database_engine  # noqa: E402
+from models import Base  # noqa: E402
+from models import ArchivedCode, Code, Lecture, Module, Seminar  # noqa: E402,F401  registers the tables
+
+
+try:
+    import nextcord.ext.commands  # noqa: F401
+    NEXTCORD_ERROR = None
+except Exception as e:
+    # nextcord 2.2.0 raises ValueError rather than ImportError on Python 3.11 and later
+    NEXTCORD_ERROR = e
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "nextcord: needs nextcord, which only imports on Python 3.10 and earlier")
+
+
+def pytest_runtest_setup(item):
+    if NEXTCORD_ERROR is not None and item.get_closest_marker("nextcord") is not None:
+        pytest.skip(f"nextcord can't be imported: {NEXTCORD_ERROR!r}")
+
+
+@pytest.fixture
+def engine():
+    # In memory, on one connection shared by every worker thread
+    engine = create_database_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
+
+
+@pytest.fixture
+def database(engine):
+    database = Database(engine, max_workers=2)
+    yield database
+    database.close()
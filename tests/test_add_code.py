@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from sqlalchemy.orm import Session
+
+from database import queries
+
+
+@pytest.fixture
+def sessions(session):
+    module = queries.add_module(session, 1, "Programming", "COMP1", "")
+    other = queries.add_module(session, 1, "Maths", "MATH1", "")
+    # Ids start at 1 in every table, so the lecture is given one no seminar has
+    queries.add_lecture(session, 1, "Lecture 1", module.id)
+    return (queries.add_lecture(session, 1, "Lecture 2", module.id), queries.add_seminar(session, 1, "Seminar 1", module.id),
+            queries.add_lecture(session, 1, "Lecture 3", other.id))
+
+
+def test_picked_session_must_be_of_the_kind_and_module_asked_for(session, sessions):
+    lecture, seminar, other_lecture = sessions
+    # A lecture id passed off as a seminar's, once added codes to whichever seminar had that id
+    assert queries.add_code(session, 1, "AB12C", lecture.module_id, "seminar", lecture.id) == (queries.MISSING, None)
+    assert queries.add_code(session, 1, "AB12C", lecture.module_id, "lecture", other_lecture.id) == (queries.MISSING, None)
+    assert queries.add_code(session, 2, "AB12C", lecture.module_id, "lecture", lecture.id) == (queries.MISSING, None)
+    assert queries.add_code(session, 1, "AB12C", seminar.module_id, "seminar", seminar.id)[0] == queries.ADDED
+
+
+@pytest.mark.nextcord
+def test_selection_round_trips_through_its_custom_id():
+    from ui_components.AddCode import CodeSelection
+
+    selection = CodeSelection("seminar", 12, "AB12C", 3)
+    assert CodeSelection.parse(selection.custom_id) == selection
+    # Sent before dropdowns had pages
+    assert CodeSelection.parse("addcode:lecture:12:AB12C") == CodeSelection("lecture", 12, "AB12C", 0)
+    for custom_id in ("", "paginator:next", "addcode:talk:12:AB12C", "addcode:lecture:x:AB12C", "addcode:lecture:12:AB12C:x"):
+        assert CodeSelection.parse(custom_id) is None
+
+
+@pytest.mark.nextcord
+def test_sessions_are_split_over_dropdowns_of_at_most_25():
+    from ui_components.AddCode import AddCodeView, CodeSelection, MAX_OPTIONS, MAX_SESSIONS
+    from utils import SeminarRecord
+
+    async def build(count):
+        return AddCodeView(CodeSelection("seminar", 1, "AB12C"), [SeminarRecord(i, f"Group {i}", 1) for i in range(count)])
+
+    view = asyncio.run(build(60))
+    assert [len(select.options) for select in view.children] == [MAX_OPTIONS, MAX_OPTIONS, 10]
+    assert len({select.custom_id for select in view.children}) == 3
+    assert [CodeSelection.parse(select.custom_id).page for select in view.children] == [0, 1, 2]
+    with pytest.raises(ValueError):
+        asyncio.run(build(MAX_SESSIONS + 1))
+
+
+@pytest.mark.nextcord
+def test_dropdown_selections_add_codes_only_in_their_own_guild(tmp_path):
+    import nextcord
+
+    from benchmarks.maincog import StubInteraction
+    from cogs.maincog import MainCog
+    from main import create_bot
+    from ui_components.AddCode import CodeSelection
+
+    def selected(selection, session_id, guild_id=1):
+        interaction = StubInteraction("addcode", guild_id=guild_id)
+        interaction.type = nextcord.InteractionType.component
+        interaction.data = {"custom_id": selection.custom_id, "values": [str(session_id)]}
+        return interaction
+
+    async def run():
+        bot = create_bot({"TEST_SERVER_GUILD_ID": 1, "ENGINE_URL": f"sqlite:///{tmp_path / 'bot.db'}", "METRICS_PORT": None})
+        bot.prepare_database()
+        with Session(bot.engine, expire_on_commit=False) as session:
+            module = queries.add_module(session, 1, "Programming", "COMP1", "")
+            queries.add_lecture(session, 1, "Lecture 1", module.id)
+            # Its id is one no seminar has
+            lecture = queries.add_lecture(session, 1, "Lecture 2", module.id)
+            queries.add_seminar(session, 1, "Seminar 1", module.id)
+        cog = MainCog(bot)
+        cog.scheduler.stop()
+        replies = []
+        try:
+            for interaction in (selected(CodeSelection("lecture", module.id, "AB12C"), lecture.id, guild_id=2),
+                                selected(CodeSelection("seminar", module.id, "AB12C"), lecture.id),
+                                selected(CodeSelection("lecture", module.id, "AB12C"), lecture.id),
+                                selected(CodeSelection("lecture", module.id, "AB12C"), lecture.id)):
+                await cog.on_interaction(interaction)
+                replies.append(interaction.sent[0][0])
+            with Session(bot.engine) as session:
+                counts = queries.get_counts(session, 1)
+        finally:
+            await cog.shutdown()
+            bot.database.close()
+            bot.engine.dispose()
+        return replies, counts
+
+    replies, counts = asyncio.run(run())
+    assert replies == ["Module does not exist",
+                       "Seminar or lecture does not exist. Please ask an admin to create it",
+                       "Added code! AB12C for Programming",
+                       "Code already exists"]
+    assert counts["codes"] == 1
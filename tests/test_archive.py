@@ -0,0 +1,26 @@
+import datetime
+
+from sqlalchemy import func, select, update
+
+from database import queries
+from models.ArchivedCode import ArchivedCode
+from models.Code import Code
+
+NOW = datetime.datetime(2024, 1, 31, 12, 0)
+
+
+def test_old_codes_are_moved_to_the_archive_in_batches(session):
+    module = queries.add_module(session, 1, "Programming", "COMP1", "")
+    lecture = queries.add_lecture(session, 1, "Lecture 1", module.id)
+    for days, code in enumerate(["A", "B", "C", "D"]):
+        _, added = queries.add_code(session, 1, code, module.id, "lecture", lecture.id)
+        session.execute(update(Code).where(Code.id == added.id).values(created_at=NOW - datetime.timedelta(days=days)))
+    session.commit()
+
+    assert queries.archive_codes_older_than(session, NOW - datetime.timedelta(hours=12), batch_size=2) == 3
+    assert session.execute(select(Code.code)).scalars().all() == ["A"]
+    archived = session.execute(select(ArchivedCode.code, ArchivedCode.module_code, ArchivedCode.session_kind,
+                                      ArchivedCode.session_name).order_by(ArchivedCode.code_id)).all()
+    assert archived == [(code, "COMP1", "lecture", "Lecture 1") for code in "BCD"]
+    assert queries.archive_codes_older_than(session, NOW - datetime.timedelta(hours=12)) == 0
+    assert session.execute(select(func.count(ArchivedCode.id))).scalar() == 3
@@ -0,0 +1,41 @@
+from sqlalchemy import select
+
+from database import bulk_import, queries
+from models.Code import Code
+
+
+def test_non_utf8_upload_is_a_conflict():
+    rows, conflicts = bulk_import.parse_rows(b"code,module_code,lecture_name\nAB12C,COMP1,Caf\xe9\n", "codes.csv")
+    assert rows == []
+    assert [conflict.line for conflict in conflicts] == [2]
+
+
+def test_invalid_json_is_a_conflict():
+    rows, conflicts = bulk_import.parse_rows(b"[{", "codes.json")
+    assert rows == [] and len(conflicts) == 1
+
+
+def test_rows_are_imported_against_the_guilds_catalogue(session):
+    module = queries.add_module(session, 1, "Programming", "COMP1", "")
+    queries.add_lecture(session, 1, "Lecture 1", module.id)
+    # Another guild's module, which the import mustn't see
+    queries.add_module(session, 2, "Programming", "COMP2", "")
+
+    rows, conflicts = bulk_import.parse_rows(
+        "code,module_code,lecture_name,seminar_name\n"
+        "ab12c,COMP1,Lecture 1,\n"
+        "AB12C,COMP1,Lecture 1,\n"
+        "XY34Z,COMP2,Lecture 1,\n"
+        "XY34Z,COMP1,Lecture 2,\n",
+        "codes.csv")
+    assert conflicts == []
+
+    added, skipped = bulk_import.import_rows(session, 1, rows)
+    assert added == 1
+    assert [conflict.line for conflict in skipped] == [3, 4, 5]
+    assert session.execute(select(Code.guild_id, Code.module_id)).all() == [(1, module.id)]
+
+
+def test_report_lists_conflicts_in_line_order():
+    report = bulk_import.format_report(1, [bulk_import.Conflict(5, "b"), bulk_import.Conflict(2, "a")])
+    assert report.splitlines() == ["Added 1 code(s), 2 row(s) skipped", "Line 2: a", "Line 5: b"]
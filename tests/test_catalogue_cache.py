@@ -0,0 +1,44 @@
+from utils import CatalogueCache, LectureRecord, ModuleRecord
+
+
+def module(id, module_code="COMP1", guild_id=1) -> ModuleRecord:
+    return ModuleRecord(id, "Programming", module_code, "", guild_id)
+
+
+def test_modules_are_looked_up_per_guild():
+    catalogue = CatalogueCache()
+    catalogue.put_module(module(1))
+    assert catalogue.get_module(1, "COMP1") == module(1)
+    assert catalogue.get_module(2, "COMP1") is None
+    assert catalogue.get_module_by_id(1) == module(1)
+    assert catalogue.stats() == {"size": 1, "hits": 2, "misses": 1}
+
+
+def test_lectures_are_cached_until_invalidated():
+    catalogue = CatalogueCache()
+    catalogue.put_module(module(1))
+    assert catalogue.get_lectures(1) is None
+    catalogue.put_lectures(1, [LectureRecord(1, "Lecture 1", 1)])
+    assert catalogue.get_lectures(1) == (LectureRecord(1, "Lecture 1", 1),)
+    catalogue.invalidate_lectures(1)
+    assert catalogue.get_lectures(1) is None
+    assert catalogue.get_module_by_id(1) == module(1)
+
+
+def test_least_recently_used_module_is_evicted():
+    catalogue = CatalogueCache(max_modules=2)
+    catalogue.put_module(module(1, "COMP1"))
+    catalogue.put_module(module(2, "COMP2"))
+    catalogue.get_module(1, "COMP1")
+    catalogue.put_module(module(3, "COMP3"))
+    assert len(catalogue) == 2
+    assert catalogue.get_module_by_id(2) is None
+    assert catalogue.get_module_by_id(1) == module(1, "COMP1")
+
+
+def test_invalidated_module_takes_its_sessions_with_it():
+    catalogue = CatalogueCache()
+    catalogue.put_module(module(1))
+    catalogue.put_lectures(1, [])
+    catalogue.invalidate_module(1)
+    assert catalogue.get_module(1, "COMP1") is None and catalogue.get_lectures(1) is None
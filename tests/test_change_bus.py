@@ -0,0 +1,71 @@
+import asyncio
+
+from database import ChangeBus, SocketChangeBus
+
+
+def test_failing_subscriber_is_logged_and_the_rest_still_run(capsys):
+    bus = ChangeBus()
+    applied = []
+
+    async def broken(change):
+        raise KeyError("missing")
+
+    async def working(change):
+        applied.append((change.kind, change.guild_id, change.data))
+
+    bus.subscribe(broken)
+    bus.subscribe(working)
+    asyncio.run(bus.publish("module_added", 1, module_code="A1"))
+    assert applied == [("module_added", 1, {"module_code": "A1"})]
+    assert bus.metrics == {"published": 1, "received": 0, "failed": 1}
+    assert "Applying module_added" in capsys.readouterr().out
+
+
+def test_kind_can_be_passed_as_data():
+    bus = ChangeBus()
+    applied = []
+
+    async def subscriber(change):
+        applied.append(change.data)
+
+    bus.subscribe(subscriber)
+    asyncio.run(bus.publish("session_added", 1, kind="lecture"))
+    assert applied == [{"kind": "lecture"}]
+
+
+def test_socket_bus_reaches_other_processes_only(tmp_path):
+    async def exchange():
+        buses = [SocketChangeBus(str(tmp_path)) for _ in range(2)]
+        received = [[], []]
+        for bus, changes in zip(buses, received):
+            async def subscriber(change, changes=changes):
+                changes.append((change.kind, change.data))
+            bus.subscribe(subscriber)
+            await bus.start()
+        await buses[0].publish("code_removed", 1, code_id=5, module_code="A1")
+        buses[1].received(b"not json")
+        await asyncio.sleep(0.05)
+        for bus in buses:
+            await bus.stop()
+        return buses, received
+
+    buses, received = asyncio.run(exchange())
+    assert received[0] == received[1] == [("code_removed", {"code_id": 5, "module_code": "A1"})]
+    assert buses[1].metrics == {"published": 0, "received": 1, "failed": 1}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_socket_bus_removes_sockets_left_behind(tmp_path):
+    async def publish():
+        bus = SocketChangeBus(str(tmp_path))
+        gone = SocketChangeBus(str(tmp_path))
+        await gone.start()
+        # As if the process had died without unlinking its socket
+        gone._loop.remove_reader(gone._socket.fileno())
+        gone._socket.close()
+        await bus.start()
+        await bus.publish("module_added", 1, module_code="A1")
+        assert bus.peers() == []
+        await bus.stop()
+
+    asyncio.run(publish())
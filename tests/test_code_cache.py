@@ -0,0 +1,78 @@
+import datetime
+
+from utils import CodeCache, LiveCode, ScheduledSession, Timetable, pack_code
+
+NOON = datetime.datetime(2024, 1, 31, 12, 0)
+TTL = datetime.timedelta(hours=2)
+
+
+class Clock:
+    def __init__(self, now: datetime.datetime):
+        self.now = now
+
+    def __call__(self) -> datetime.datetime:
+        return self.now
+
+
+def live_code(id, created_at=NOON, guild_id=1, module_id=1, lecture_id=1, code="AB12C") -> LiveCode:
+    return LiveCode(id, code, "Lecture 1", "Programming", module_id, lecture_id, None, created_at, guild_id, pack_code(code))
+
+
+def cache(clock: Clock) -> CodeCache:
+    return CodeCache(ttl=TTL, timetable=Timetable(clock), clock=clock)
+
+
+def test_misses_until_loaded():
+    codes = cache(Clock(NOON))
+    assert codes.get_codes(1) is None
+    codes.rebuild([])
+    assert codes.get_codes(1) == []
+    assert codes.stats() == {"size": 0, "hits": 1, "misses": 1}
+
+
+def test_codes_expire_ttl_after_they_are_posted():
+    clock = Clock(NOON)
+    codes = cache(clock)
+    codes.rebuild([live_code(1), live_code(2, NOON + TTL / 2, code="XY34Z")])
+    assert [code.id for code in codes.get_codes(1)] == [1, 2]
+
+    clock.now = NOON + TTL + datetime.timedelta(seconds=1)
+    assert [code.id for code in codes.get_codes(1)] == [2]
+    assert len(codes) == 1
+    assert not codes.contains(1, pack_code("AB12C"), 1, None)
+
+
+def test_codes_outlive_ttl_while_their_lecture_is_on():
+    clock = Clock(NOON)
+    codes = cache(clock)
+    codes.timetable.schedule(ScheduledSession("lecture", 1, 1, 1, NOON, NOON + 3 * TTL))
+    codes.timetable.advance()
+    codes.rebuild([live_code(1)])
+
+    clock.now = NOON + 2 * TTL
+    codes.timetable.advance()
+    assert [code.id for code in codes.get_codes(1)] == [1]
+
+    clock.now = NOON + 3 * TTL
+    codes.timetable.advance()
+    codes.session_ended(1, None)
+    assert codes.get_codes(1) == []
+
+
+def test_codes_already_expired_are_not_cached():
+    codes = cache(Clock(NOON + 2 * TTL))
+    codes.rebuild([live_code(1)])
+    assert len(codes) == 0
+
+
+def test_guilds_and_modules_are_kept_apart():
+    codes = cache(Clock(NOON))
+    codes.rebuild([live_code(1), live_code(2, guild_id=2, module_id=2, lecture_id=2)])
+    assert [code.id for code in codes.get_codes(2)] == [2]
+    assert codes.contains(2, pack_code("AB12C"), 2, None)
+    codes.remove_module(1)
+    assert codes.get_codes(1) == [] and [code.id for code in codes.get_module_codes(2)] == [2]
+
+
+def test_live_codes_round_trip_through_the_change_bus_encoding():
+    assert LiveCode.decode(live_code(1).encode()) == live_code(1)
@@ -0,0 +1,29 @@
+import pytest
+
+from utils import CODE_ALPHABET, normalise_code, pack_code, unpack_code
+
+
+def test_codes_are_normalised_to_upper_case():
+    assert normalise_code(" ab12c ") == "AB12C"
+    assert normalise_code("a") == "A"
+
+
+@pytest.mark.parametrize("code", ["", "ABCDEF", "AB 1", "AB-1", "ÄB"])
+def test_invalid_codes_are_refused(code):
+    assert normalise_code(code) is None
+
+
+def test_keys_round_trip_and_are_distinct_across_lengths():
+    codes = ["0", "00", "000", "A", "AB12C", "ZZZZZ", "00000"]
+    keys = [pack_code(code) for code in codes]
+    assert len(set(keys)) == len(codes)
+    assert [unpack_code(key) for key in keys] == codes
+
+
+def test_keys_fit_in_27_bits():
+    assert pack_code(CODE_ALPHABET[-1] * 5) < 2 ** 27
+
+
+def test_unnormalised_codes_cannot_be_packed():
+    with pytest.raises(ValueError):
+        pack_code("ab12c")
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from database import CodeWriteQueue, queries
+
+
+@pytest.fixture
+def lecture(session):
+    module = queries.add_module(session, 1, "Programming", "COMP1", "")
+    return queries.add_lecture(session, 1, "Lecture 1", module.id)
+
+
+def submission(lecture, code="AB12C"):
+    return 1, code, lecture.module_id, "lecture", lecture.id
+
+
+def test_identical_submissions_are_merged_into_one_write(database, lecture):
+    async def burst():
+        queue = CodeWriteQueue(database, window=0.01)
+        outcomes = await asyncio.gather(*(queue.submit(*submission(lecture)) for _ in range(5)),
+                                        queue.submit(*submission(lecture, "OTHER")))
+        await queue.close()
+        return queue, outcomes
+
+    queue, outcomes = asyncio.run(burst())
+    statuses = [status for status, _ in outcomes]
+    assert statuses.count(queries.ADDED) == 2 and statuses.count(queries.EXISTS) == 4
+    assert queue.metrics["flushes"] == 1 and queue.metrics["merged"] == 4
+    assert queue.depth == 0
+
+
+def test_missing_session_is_reported(database, lecture):
+    async def submit():
+        queue = CodeWriteQueue(database, window=0)
+        outcome = await queue.submit(1, "AB12C", lecture.module_id, "seminar", lecture.id)
+        await queue.close()
+        return outcome
+
+    assert asyncio.run(submit()) == (queries.MISSING, None)
+
+
+class FlakyDatabase:
+    """
+    Fails every batch, and any single write of a code in bad
+    """
+
+    def __init__(self, database, bad):
+        self.database = database
+        self.bad = bad
+
+    async def run(self, func, *args):
+        if func is queries.add_codes or args[1] in self.bad:
+            raise RuntimeError("write failed")
+        return await self.database.run(func, *args)
+
+
+def test_failed_batch_falls_back_to_writing_each(database, lecture):
+    async def burst():
+        queue = CodeWriteQueue(FlakyDatabase(database, {"BAD"}), window=0.01)
+        outcomes = await asyncio.gather(queue.submit(*submission(lecture, "GOOD")), queue.submit(*submission(lecture, "BAD")),
+                                        queue.submit(*submission(lecture, "BAD")), return_exceptions=True)
+        await queue.close()
+        return queue, outcomes
+
+    queue, (good, bad, merged_bad) = asyncio.run(burst())
+    assert good[0] == queries.ADDED
+    assert isinstance(bad, RuntimeError) and isinstance(merged_bad, RuntimeError)
+    assert queue.metrics["fallbacks"] == 1 and queue.metrics["failed"] == 1
+    assert queue.depth == 0
+
+
+def test_submit_waits_for_room_beyond_max_pending(database, lecture):
+    async def overflow():
+        queue = CodeWriteQueue(database, window=0.01, max_pending=2)
+        outcomes = await asyncio.gather(*(queue.submit(*submission(lecture, f"C{n}")) for n in range(5)))
+        await queue.close()
+        return queue, outcomes
+
+    queue, outcomes = asyncio.run(overflow())
+    assert [status for status, _ in outcomes] == [queries.ADDED] * 5
+    assert queue.metrics["backpressure_waits"] == 3
+    assert queue.metrics["largest_flush"] <= 2
+
+
+def test_closed_queue_refuses_submissions(database, lecture):
+    async def submit():
+        queue = CodeWriteQueue(database)
+        await queue.close()
+        await queue.submit(*submission(lecture))
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(submit())
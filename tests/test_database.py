@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import func, select
+
+from database import Database, create_database_engine, queries
+from models import Base
+from models.Module import Module
+
+
+def module_count(session) -> int:
+    return session.execute(select(func.count(Module.id))).scalar()
+
+
+@pytest.fixture
+def replicated(tmp_path):
+    # Two separate files, so which one a query went to shows in what it finds
+    primary = create_database_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_database_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for engine in (primary, replica):
+        Base.metadata.create_all(engine)
+    database = Database(primary, max_workers=2, read_engines=[replica], read_your_writes=60)
+    yield database
+    database.close()
+    primary.dispose()
+    replica.dispose()
+
+
+def test_run_works_off_the_event_loop_thread(database):
+    async def run():
+        return await database.run(lambda session: threading.current_thread().name)
+
+    assert asyncio.run(run()).startswith("database")
+
+
+def test_failed_work_is_rolled_back_and_raised(database):
+    def fail(session):
+        queries.add_module(session, 1, "Programming", "COMP1", "")
+        session.add(Module(guild_id=1, name="Programming", module_code="COMP1", description=""))
+        session.flush()
+
+    async def run():
+        with pytest.raises(Exception):
+            await database.run(fail)
+        return await database.run(module_count)
+
+    assert asyncio.run(run()) == 1
+    assert database.pool_stats()["checked_out"] == 0
+
+
+def test_session_reads_from_the_replica_until_it_writes(replicated):
+    with replicated.session_scope(replicated.read_engines[0]) as session:
+        assert session.get_bind() is replicated.read_engines[0]
+        queries.add_module(session, 1, "Programming", "COMP1", "")
+        assert session.wrote and session.get_bind() is replicated.engine
+        assert module_count(session) == 1
+
+
+def test_guild_reads_its_own_writes(replicated):
+    async def run():
+        await replicated.write(1, queries.add_module, 1, "Programming", "COMP1", "")
+        return (await replicated.read(1, module_count), await replicated.read(2, module_count),
+                await replicated.read(None, module_count))
+
+    # The replica file never hears of the write, so only the primary can see it
+    assert asyncio.run(run()) == (1, 0, 1)
+    assert replicated.metrics["replica_reads"] == 1 and replicated.metrics["primary_reads"] == 2
+
+
+def test_without_replicas_reads_go_to_the_primary(database):
+    assert database.read_engine(1) is None and database.read_engine(None) is None
@@ -0,0 +1,36 @@
+from sqlalchemy import insert, select, text
+
+from database import queries
+from models.Code import Code
+from utils import pack_code
+
+
+def test_adding_the_same_code_twice_reports_it_exists(session):
+    module = queries.add_module(session, 1, "Programming", "COMP1", "")
+    lecture = queries.add_lecture(session, 1, "Lecture 1", module.id)
+    seminar = queries.add_seminar(session, 1, "Seminar 1", module.id)
+    status, code = queries.add_code(session, 1, "AB12C", module.id, "lecture", lecture.id)
+    assert status == queries.ADDED and code.id is not None
+    assert queries.add_code(session, 1, "AB12C", module.id, "lecture", lecture.id) == (queries.EXISTS, None)
+    # The same code for another session is a different code
+    assert queries.add_code(session, 1, "AB12C", module.id, "seminar", seminar.id)[0] == queries.ADDED
+    assert len(session.execute(select(Code.id)).all()) == 2
+
+
+def test_sweep_keeps_the_oldest_of_each_code(session):
+    module = queries.add_module(session, 1, "Programming", "COMP1", "")
+    first = queries.add_lecture(session, 1, "Lecture 1", module.id)
+    second = queries.add_lecture(session, 1, "Lecture 2", module.id)
+    # Duplicates from before the unique indexes, which have to go for them to be inserted
+    for name in ("uq_codes_guild_id_code_key_lecture", "uq_codes_guild_id_code_key_seminar"):
+        session.execute(text(f"DROP INDEX {name}"))
+    rows = [("AB12C", first.id), ("AB12C", first.id), ("XY34Z", first.id), ("AB12C", second.id), ("XY34Z", first.id)]
+    session.execute(insert(Code), [dict(guild_id=1, code=code, code_key=pack_code(code), module_id=module.id, lecture_id=lecture_id)
+                                   for code, lecture_id in rows])
+    session.commit()
+
+    assert queries.clear_duplicate_codes(session) == 2
+    assert session.execute(select(Code.id, Code.code, Code.lecture_id).order_by(Code.id)).all() == [
+        (1, "AB12C", first.id), (3, "XY34Z", first.id), (4, "AB12C", second.id),
+    ]
+    assert queries.clear_duplicate_codes(session) == 0
@@ -0,0 +1,46 @@
+import csv
+import datetime
+import io
+
+from sqlalchemy import insert
+
+from database import history
+from models.ArchivedCode import ArchivedCode
+
+MIDNIGHT = datetime.datetime(2024, 1, 31)
+
+
+def archive(session, guild_id, module_code, code, hour):
+    session.execute(insert(ArchivedCode).values(
+        guild_id=guild_id, code_id=hour, code=code, code_key=0, module_code=module_code, module_name="Programming",
+        session_kind="lecture", session_name="Lecture 1", created_at=MIDNIGHT + datetime.timedelta(hours=hour),
+        archived_at=MIDNIGHT + datetime.timedelta(days=1)))
+
+
+def test_history_is_written_as_csv_oldest_first(session):
+    for code, hour in (("AAAAA", 1), ("BBBBB", 2), ("CCCCC", 3)):
+        archive(session, 1, "COMP1", code, hour)
+    # Another module, and the same module code in another guild, neither of which belongs in it
+    archive(session, 1, "MATH1", "DDDDD", 4)
+    archive(session, 2, "COMP1", "EEEEE", 5)
+    session.commit()
+
+    file = io.BytesIO()
+    assert history.write_history(session, 1, "COMP1", file) == 3
+    rows = list(csv.reader(io.StringIO(file.getvalue().decode())))
+    assert rows[0] == list(history.FIELDS)
+    assert [row[0] for row in rows[1:]] == ["AAAAA", "BBBBB", "CCCCC"]
+    assert rows[1] == ["AAAAA", "COMP1", "Programming", "lecture", "Lecture 1", "2024-01-31 01:00:00", "2024-02-01 00:00:00"]
+
+
+def test_empty_history_is_just_the_header(session):
+    file = io.BytesIO()
+    assert history.write_history(session, 1, "COMP1", file) == 0
+    assert file.getvalue().decode().splitlines() == [",".join(history.FIELDS)]
+
+
+def test_history_is_read_in_batches(session):
+    for hour in range(5):
+        archive(session, 1, "COMP1", f"A{hour}", hour)
+    session.commit()
+    assert [row.code for row in history.iter_history(session, 1, "COMP1", batch_size=2)] == [f"A{hour}" for hour in range(5)]
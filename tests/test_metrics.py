@@ -0,0 +1,52 @@
+import pytest
+
+from utils import MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative_up_to_inf():
+    registry = MetricsRegistry()
+    latency = registry.histogram("command_seconds", "Command latency", ["command"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, command="codes")
+    assert registry.render().splitlines() == [
+        "# HELP command_seconds Command latency",
+        "# TYPE command_seconds histogram",
+        'command_seconds_bucket{command="codes",le="0.1"} 2',
+        'command_seconds_bucket{command="codes",le="1.0"} 3',
+        'command_seconds_bucket{command="codes",le="+Inf"} 4',
+        'command_seconds_sum{command="codes"} 3.65',
+        'command_seconds_count{command="codes"} 4',
+    ]
+
+
+def test_labelled_callback_samples_are_escaped_and_sorted():
+    registry = MetricsRegistry()
+    registry.counter("jobs_total", "Job runs", ["job"], callback=lambda: {("sweep",): 2, ('say "hi"\\\n',): 1})
+    registry.gauge("cache_size", "Cached codes", callback=lambda: 7)
+    assert registry.render().splitlines() == [
+        "# HELP jobs_total Job runs",
+        "# TYPE jobs_total counter",
+        'jobs_total{job="say \\"hi\\"\\\\\\n"} 1.0',
+        'jobs_total{job="sweep"} 2.0',
+        "# HELP cache_size Cached codes",
+        "# TYPE cache_size gauge",
+        "cache_size 7.0",
+    ]
+
+
+def test_a_failing_callback_does_not_break_the_scrape():
+    registry = MetricsRegistry()
+    registry.gauge("broken", "Raises", callback=lambda: 1 / 0)
+    registry.counter("requests_total", "Requests").inc()
+    assert registry.render().splitlines() == [
+        "# broken failed to collect: ZeroDivisionError",
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        "requests_total 1.0",
+    ]
+
+
+def test_labels_must_match_the_label_names():
+    registry = MetricsRegistry()
+    with pytest.raises(ValueError):
+        registry.counter("requests_total", "Requests", ["command"]).inc(guild=1)
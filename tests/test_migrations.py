@@ -0,0 +1,110 @@
+import datetime
+import time
+
+import pytest
+from sqlalchemy import inspect, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import create_database_engine, migrate, migrations, queries
+from models import Base
+from utils import pack_code
+
+# The tables as the first release of the bot created them
+BASELINE_SCHEMA = (
+    """CREATE TABLE modules (
+        id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL, module_code VARCHAR(20) NOT NULL UNIQUE,
+        description VARCHAR(255), status INTEGER NOT NULL, created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL)""",
+    """CREATE TABLE lectures (
+        id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL UNIQUE, status INTEGER NOT NULL,
+        created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL, module_id INTEGER REFERENCES modules (id))""",
+    """CREATE TABLE seminars (
+        id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL UNIQUE, status INTEGER NOT NULL,
+        created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL, module_id INTEGER REFERENCES modules (id))""",
+    """CREATE TABLE codes (
+        id INTEGER PRIMARY KEY, code VARCHAR(5) NOT NULL, status INTEGER NOT NULL,
+        created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL,
+        module_id INTEGER NOT NULL REFERENCES modules (id), lecture_id INTEGER REFERENCES lectures (id),
+        seminar_id INTEGER REFERENCES seminars (id))""",
+)
+
+WINTER = datetime.datetime(2022, 1, 10, 12, 0)
+SUMMER = datetime.datetime(2022, 7, 10, 12, 0)
+
+
+@pytest.fixture
+def london(monkeypatch):
+    # GMT in winter, BST (UTC+1) in summer, without needing the tz database
+    monkeypatch.setenv("TZ", "GMT0BST,M3.5.0/1,M10.5.0")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as connection:
+        for ddl in BASELINE_SCHEMA:
+            connection.execute(text(ddl))
+        connection.execute(text("INSERT INTO modules VALUES (1, 'Programming', 'COMP1', '', 1, :at, :at)"), {"at": WINTER})
+        connection.execute(text("INSERT INTO lectures VALUES (1, 'Lecture 1', 1, :at, :at, 1)"), {"at": SUMMER})
+        connection.execute(text("INSERT INTO seminars VALUES (1, 'Seminar 1', 1, :at, :at, 1)"), {"at": SUMMER})
+        connection.execute(text("INSERT INTO codes VALUES (1, 'ab12c', 1, :winter, :winter, 1, 1, NULL), (2, 'XY34Z', 1, :summer, :summer, 1, NULL, 1)"),
+                           {"winter": WINTER, "summer": SUMMER})
+    yield engine
+    engine.dispose()
+
+
+def test_local_to_utc_uses_each_times_own_offset(london):
+    assert migrations.local_to_utc(WINTER) == WINTER
+    assert migrations.local_to_utc(SUMMER) == SUMMER - datetime.timedelta(hours=1)
+    assert migrations.local_to_utc(None) is None
+
+
+def test_timestamps_are_moved_to_utc_in_batches(london, baseline, monkeypatch):
+    monkeypatch.setattr(migrations, "MIGRATION_BATCH_SIZE", 1)
+    migrate(baseline, default_guild_id=1)
+    codes, lectures = Base.metadata.tables["codes"], Base.metadata.tables["lectures"]
+    with baseline.connect() as connection:
+        times = connection.execute(select(codes.c.created_at, codes.c.updated_at).order_by(codes.c.id)).all()
+        lecture_created_at = connection.execute(select(lectures.c.created_at)).scalar()
+    utc_summer = SUMMER - datetime.timedelta(hours=1)
+    assert times == [(WINTER, WINTER), (utc_summer, utc_summer)]
+    assert lecture_created_at == utc_summer
+
+
+def test_baseline_database_is_migrated_through_every_version(baseline):
+    assert migrate(baseline, default_guild_id=1) == [version for version, _, _ in migrations.MIGRATIONS]
+    assert migrate(baseline, default_guild_id=1) == []
+
+    with baseline.connect() as connection:
+        assert migrations.get_version(connection) == migrations.LATEST_VERSION
+        inspector = inspect(connection)
+        for table in Base.metadata.sorted_tables:
+            assert {column["name"] for column in inspector.get_columns(table.name)} == set(table.columns.keys())
+            assert {index["name"] for index in inspector.get_indexes(table.name)} >= {index.name for index in table.indexes}
+        codes = connection.execute(text("SELECT guild_id, code, code_key FROM codes ORDER BY id")).all()
+        modules = connection.execute(text("SELECT guild_id, module_code FROM modules")).all()
+    assert codes == [(1, "AB12C", pack_code("AB12C")), (1, "XY34Z", pack_code("XY34Z"))]
+    assert modules == [(1, "COMP1")]
+
+
+def test_modules_are_unique_per_guild_after_migrating(baseline):
+    migrate(baseline, default_guild_id=1)
+    with Session(baseline) as session:
+        queries.add_module(session, 2, "Programming", "COMP1", "")
+        with pytest.raises(IntegrityError):
+            queries.add_module(session, 1, "Programming", "COMP1", "")
+
+
+def test_codes_are_packed_in_batches_and_unpackable_ones_deleted(baseline, monkeypatch):
+    with baseline.begin() as connection:
+        connection.execute(text("INSERT INTO codes VALUES (3, 'a-1', 1, :at, :at, 1, 1, NULL), (4, 'cd3', 1, :at, :at, 1, 1, NULL), "
+                                "(5, '', 1, :at, :at, 1, 1, NULL)"), {"at": WINTER})
+    monkeypatch.setattr(migrations, "MIGRATION_BATCH_SIZE", 2)
+    migrate(baseline, default_guild_id=1)
+    with baseline.connect() as connection:
+        codes = connection.execute(text("SELECT id, code, code_key FROM codes ORDER BY id")).all()
+    assert codes == [(1, "AB12C", pack_code("AB12C")), (2, "XY34Z", pack_code("XY34Z")), (4, "CD3", pack_code("CD3"))]
@@ -0,0 +1,42 @@
+from utils import Page, PageCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_pages_expire_after_ttl():
+    clock = Clock()
+    pages = PageCache(ttl=60, clock=clock)
+    page = Page((1, 2), 2)
+    pages.put(1, ("modules",), None, page)
+    assert pages.get(1, ("modules",), None) is page
+    assert pages.get(2, ("modules",), None) is None
+
+    clock.now = 61
+    assert pages.get(1, ("modules",), None) is None
+    assert len(pages) == 0
+    assert pages.stats() == {"size": 0, "hits": 1, "misses": 2}
+
+
+def test_least_recently_used_page_is_evicted():
+    pages = PageCache(max_entries=2, clock=Clock())
+    for cursor in (None, 10):
+        pages.put(1, ("modules",), cursor, Page((), cursor))
+    pages.get(1, ("modules",), None)
+    pages.put(1, ("modules",), 20, Page((), None))
+    assert pages.get(1, ("modules",), 10) is None
+    assert pages.get(1, ("modules",), None) is not None
+
+
+def test_invalidate_drops_every_users_pages_of_a_listing():
+    pages = PageCache(clock=Clock())
+    pages.put(1, ("seminars", 1), None, Page((), None))
+    pages.put(2, ("seminars", 1), None, Page((), None))
+    pages.put(1, ("seminars", 2), None, Page((), None))
+    pages.invalidate(("seminars", 1))
+    assert len(pages) == 1 and pages.get(1, ("seminars", 2), None) is not None
@@ -0,0 +1,32 @@
+from utils import PrefixIndex
+
+
+def test_search_ignores_case_and_keeps_sorted_order():
+    index = PrefixIndex(["COMP2", "comp1", "MATH1", "Comp10"])
+    assert index.search("comp") == ["comp1", "Comp10", "COMP2"]
+    assert index.search("MA") == ["MATH1"]
+    assert index.search("x") == []
+
+
+def test_search_stops_at_limit():
+    index = PrefixIndex(f"COMP{i}" for i in range(100))
+    assert len(index.search("", limit=25)) == 25
+    assert index.search("COMP9", limit=2) == ["COMP9", "COMP90"]
+
+
+def test_add_and_remove_keep_the_index_sorted_without_duplicates():
+    index = PrefixIndex(["B"])
+    index.add("A")
+    index.add("C")
+    index.add("A")
+    assert len(index) == 3 and index.search("") == ["A", "B", "C"]
+    index.remove("B")
+    index.remove("missing")
+    assert "B" not in index and "A" in index
+    assert index.search("") == ["A", "C"]
+
+
+def test_rebuild_replaces_every_name():
+    index = PrefixIndex(["A"])
+    index.rebuild(["B", "b"])
+    assert index.search("") == ["B", "b"]
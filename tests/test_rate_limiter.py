@@ -0,0 +1,83 @@
+import asyncio
+import types
+
+import pytest
+
+from utils import RateLimiter
+
+LIMITS = {"default": {"user": [2, 10], "guild": [3, 10]}, "ping": {"guild": None}}
+
+
+def limiter(now):
+    return RateLimiter(LIMITS, clock=lambda: now[0])
+
+
+def test_rejects_once_a_bucket_is_empty():
+    now = [0.0]
+    rate_limiter = limiter(now)
+    assert rate_limiter.acquire("stats", 1, 9) is None
+    assert rate_limiter.acquire("stats", 1, 9) is None
+    assert rate_limiter.acquire("stats", 1, 9) == ("user", 5.0)
+    assert rate_limiter.stats() == {"buckets": 2, "allowed": 2, "rejected": 1}
+
+
+def test_refills_at_the_limits_rate():
+    now = [0.0]
+    rate_limiter = limiter(now)
+    for _ in range(2):
+        rate_limiter.acquire("stats", 1, 9)
+    now[0] = 4.9
+    assert rate_limiter.acquire("stats", 1, 9)[0] == "user"
+    now[0] = 5.0
+    assert rate_limiter.acquire("stats", 1, 9) is None
+
+
+def test_guild_bucket_is_shared_by_its_users():
+    now = [0.0]
+    rate_limiter = limiter(now)
+    for user_id in (1, 2, 3):
+        assert rate_limiter.acquire("stats", user_id, 9) is None
+    assert rate_limiter.acquire("stats", 4, 9)[0] == "guild"
+    # A rejected call takes no tokens, so the user's own bucket is untouched
+    assert rate_limiter.acquire("stats", 4, 10) is None
+
+
+def test_none_turns_a_scope_off():
+    rate_limiter = limiter([0.0])
+    assert all(rate_limiter.acquire("ping", 1, 9) is None for _ in range(2))
+    assert rate_limiter.acquire("ping", 1, 9)[0] == "user"
+
+
+def test_idle_buckets_are_dropped_and_capped():
+    now = [0.0]
+    rate_limiter = RateLimiter(LIMITS, max_buckets=3, clock=lambda: now[0])
+    for user_id in range(5):
+        rate_limiter.acquire("stats", user_id, None)
+    assert len(rate_limiter) == 3
+    now[0] = 100
+    rate_limiter.acquire("stats", 99, None)
+    assert len(rate_limiter) == 1
+
+
+@pytest.mark.nextcord
+def test_rejected_call_is_answered_without_logging(capsys):
+    from cogs.maincog import RateLimited
+    from main import create_bot
+
+    sent = []
+
+    async def send_message(content=None, **kwargs):
+        sent.append((content, kwargs))
+
+    async def reject():
+        bot = create_bot({"TEST_SERVER_GUILD_ID": 1, "METRICS_PORT": None})
+        interaction = types.SimpleNamespace(application_command=types.SimpleNamespace(name="stats"),
+                                            response=types.SimpleNamespace(send_message=send_message))
+        bot.dispatch("application_command_error", interaction, RateLimited("user", 4.2))
+        await asyncio.sleep(0.01)
+        await bot.close()
+
+    asyncio.run(reject())
+    assert sent == [("You're using /stats too often, try again in 5s", {"ephemeral": True})]
+    captured = capsys.readouterr()
+    assert captured.err == "" and captured.out == ""
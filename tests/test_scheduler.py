@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from utils import Scheduler
+
+
+def test_runs_are_recorded():
+    async def cleanup():
+        return 3
+
+    scheduler = Scheduler()
+    job = scheduler.add_job("cleanup", cleanup, interval=60)
+    run = asyncio.run(scheduler.run_job("cleanup"))
+    assert run.rows == 3 and run.error is None
+    assert job.last_run is run and job.runs == 1 and job.total_rows == 3
+
+
+def test_a_job_never_overlaps_itself():
+    async def overlap():
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return 1
+
+        scheduler = Scheduler()
+        job = scheduler.add_job("slow", slow, interval=60)
+        first = asyncio.ensure_future(scheduler.run_job("slow"))
+        await asyncio.sleep(0)
+        second = await scheduler.run_job("slow")
+        release.set()
+        return job, await first, second
+
+    job, first, second = asyncio.run(overlap())
+    assert first.rows == 1 and second is None
+    assert job.runs == 1 and job.skipped == 1
+
+
+def test_failures_are_recorded_and_do_not_raise(capsys):
+    async def broken():
+        raise RuntimeError("boom")
+
+    scheduler = Scheduler()
+    scheduler.add_job("broken", broken, interval=60)
+    run = asyncio.run(scheduler.run_job("broken"))
+    assert run.error == "RuntimeError: boom" and run.rows == 0
+    assert "Job broken failed" in capsys.readouterr().out
+
+
+def test_names_are_unique():
+    async def job():
+        return 0
+
+    scheduler = Scheduler()
+    scheduler.add_job("job", job, interval=60)
+    with pytest.raises(ValueError):
+        scheduler.add_job("job", job, interval=60)
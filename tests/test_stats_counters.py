@@ -0,0 +1,76 @@
+import datetime
+
+from database import queries
+from utils import StatsCounters
+
+NOW = datetime.datetime(2024, 1, 31, 14, 30)
+COUNTS = {"modules": 2, "lectures": 1, "seminars": 0, "codes": 1}
+
+
+def counters() -> StatsCounters:
+    return StatsCounters(clock=lambda: NOW)
+
+
+def test_guild_is_not_shown_until_reconciled():
+    stats = counters()
+    stats.add(1, "modules")
+    assert stats.get(1) is None
+    stats.reconcile(1, COUNTS, {"A1": 1}, [NOW], NOW.date())
+    assert stats.get(1).counts == COUNTS
+
+
+def test_updates_only_touch_their_own_guild():
+    stats = counters()
+    stats.reconcile(1, COUNTS, {"A1": 1}, [NOW], NOW.date())
+    stats.reconcile(2, dict.fromkeys(COUNTS, 0), {}, [], NOW.date())
+    stats.code_added(1, "A1", NOW)
+    stats.add(1, "modules")
+    assert stats.get(1).counts == {"modules": 3, "lectures": 1, "seminars": 0, "codes": 2}
+    assert stats.get(2).counts == dict.fromkeys(COUNTS, 0)
+    assert stats.guild_codes_per_module(1) == [("A1", 2)]
+    assert stats.guild_codes_per_module(2) == []
+    assert stats.hourly(1) == {14: 2}
+    assert stats.hourly(2) == {}
+
+
+def test_code_removed_drops_empty_modules():
+    stats = counters()
+    stats.reconcile(1, COUNTS, {"A1": 1}, [], NOW.date())
+    stats.code_removed(1, "A1")
+    assert stats.get(1).counts["codes"] == 0
+    assert stats.guild_codes_per_module(1) == []
+
+
+def test_invalidate_one_or_every_guild():
+    stats = counters()
+    for guild_id in (1, 2):
+        stats.reconcile(guild_id, COUNTS, {}, [], NOW.date())
+    stats.invalidate(1)
+    assert stats.get(1) is None and stats.get(2) is not None
+    assert stats.invalidate() == 2
+    assert stats.get(2) is None
+
+
+def test_version_tracks_racing_updates():
+    stats = counters()
+    version = stats.version(1)
+    stats.add(1, "lectures")
+    assert stats.version(1) != version
+
+
+def test_stats_queries_are_scoped_to_a_guild(session):
+    for guild_id, module_codes in ((1, ("A1", "B1")), (2, ("A1",))):
+        for module_code in module_codes:
+            queries.add_module(session, guild_id, module_code, module_code, "")
+    module = queries.get_module(session, 1, "A1")
+    lecture = queries.add_lecture(session, 1, "Lecture", module.id)
+    assert queries.add_code(session, 1, "X1", module.id, "lecture", lecture.id)[0] == queries.ADDED
+
+    counts, codes_per_module, code_times = queries.get_stats(session, 1, datetime.date.today())
+    assert counts == {"modules": 2, "lectures": 1, "seminars": 0, "codes": 1}
+    assert codes_per_module == {"A1": 1}
+    assert len(code_times) == 1
+
+    counts, codes_per_module, code_times = queries.get_stats(session, 2, datetime.date.today())
+    assert counts == {"modules": 1, "lectures": 0, "seminars": 0, "codes": 0}
+    assert codes_per_module == {} and code_times == []
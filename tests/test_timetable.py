@@ -0,0 +1,64 @@
+import datetime
+
+from utils import ScheduledSession, Timetable
+
+NINE = datetime.datetime(2024, 1, 31, 9, 0)
+HOUR = datetime.timedelta(hours=1)
+
+
+class Clock:
+    def __init__(self, now: datetime.datetime):
+        self.now = now
+
+    def __call__(self) -> datetime.datetime:
+        return self.now
+
+
+def lecture(id, starts_at, guild_id=1, module_id=1) -> ScheduledSession:
+    return ScheduledSession("lecture", id, module_id, guild_id, starts_at, starts_at + HOUR)
+
+
+def test_sessions_start_and_end_as_the_clock_passes_them():
+    clock = Clock(NINE)
+    timetable = Timetable(clock)
+    first, second = lecture(1, NINE), lecture(2, NINE + HOUR)
+    timetable.rebuild([first, second])
+    assert list(timetable.active(1)) == [first]
+    assert timetable.next_boundary() == NINE + HOUR
+
+    clock.now = NINE + HOUR
+    assert timetable.advance() == ([second], [first])
+    assert list(timetable.active(1)) == [second]
+    assert not timetable.is_scheduled(first.key)
+
+
+def test_rescheduled_sessions_ignore_their_old_boundaries():
+    clock = Clock(NINE)
+    timetable = Timetable(clock)
+    timetable.schedule(lecture(1, NINE + HOUR))
+    moved = lecture(1, NINE + 3 * HOUR)
+    timetable.schedule(moved)
+    clock.now = NINE + 2 * HOUR
+    assert timetable.advance() == ([], [])
+    assert timetable.next_boundary() == moved.starts_at
+    assert len(timetable) == 1
+
+
+def test_ended_sessions_are_never_scheduled():
+    timetable = Timetable(Clock(NINE))
+    timetable.schedule(lecture(1, NINE - 2 * HOUR))
+    assert len(timetable) == 0 and timetable.next_boundary() is None
+
+
+def test_active_is_per_guild_and_modules_can_be_unscheduled():
+    timetable = Timetable(Clock(NINE))
+    ours, theirs = lecture(1, NINE, guild_id=1, module_id=1), lecture(2, NINE, guild_id=2, module_id=2)
+    timetable.rebuild([ours, theirs])
+    assert list(timetable.active(2)) == [theirs]
+    timetable.unschedule_module(1)
+    assert list(timetable.active(1)) == [] and timetable.stats() == {"scheduled": 1, "active": 1}
+
+
+def test_sessions_round_trip_through_the_change_bus_encoding():
+    session = lecture(1, NINE)
+    assert ScheduledSession.decode(session.encode()) == session
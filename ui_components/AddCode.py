@@ -1,63 +1,62 @@
 import typing
 import nextcord
-from models.Seminar import Seminar
-from models.Lecture import Lecture
-from models.Module import Module
-from models.Code import Code
-from sqlalchemy import select
-from sqlalchemy.orm import Session
-
-
-class CodeDropdown(nextcord.ui.Select):
-    def __init__(self, code: str, engine, module: Module, seminars: typing.List[Seminar] = None, lectures: typing.List[Lecture] = None):
-        if seminars is None and lectures is None:
-            raise ValueError("You must pass either seminars or lectures")
-        self.seminars = seminars
-        self.lectures = lectures
-        self.module = module
-        self.engine = engine
-        self.code = code
-
-        options = []
-        if seminars is not None:
-            for seminar in seminars:
-                options.append(nextcord.SelectOption(label=seminar.name, value=seminar.name))
-        if lectures is not None:
-            for lecture in lectures:
-                options.append(nextcord.SelectOption(label=lecture.name, value=lecture.name))
-
-        super(CodeDropdown, self).__init__(placeholder="Select a seminar/lecture", min_values=1, max_values=1, options=options)
-
-    def check_if_code_exists(self, session: Session):
-        stmt = select(Code).where(Code.code == self.code)
-        return session.execute(stmt).scalars().first() is not None
-
-    async def callback(self, interaction: nextcord.Interaction):
-        with Session(self.engine) as session:
-            if not self.check_if_code_exists(session):
-                stmt = select(Seminar).where(Seminar.id == self.values[0])
-                obj_seminar = session.execute(stmt).scalars().first()
-                stmt = select(Lecture).where(Lecture.name == self.values[0])
-                obj_lecture = session.execute(stmt).scalars().first()
-                if obj_seminar is None and obj_lecture is None:
-                    await interaction.response.send_message("Seminar or lecture does not exist. Please ask an admin to create it")
-                    return
-
-                if obj_seminar is not None:
-                    obj_code = Code(code=self.code, module_id=self.module.id, seminar_id=obj_seminar.id)
-                elif obj_lecture is not None:
-                    obj_code = Code(code=self.code, module_id=self.module.id, lecture_id=obj_lecture.id)
-
-                session.add(obj_code)
-                session.commit()
-            else:
-                await interaction.response.send_message("Code already exists")
-                return
-
-        await interaction.response.send_message(f"Added code! {self.code} for {self.module.name}")
+from utils import LectureRecord, SeminarRecord
+
+CUSTOM_ID_PREFIX = "addcode"
+# Discord allows 25 options per dropdown and 5 rows of components per message
+MAX_OPTIONS = 25
+MAX_SELECTS = 5
+MAX_SESSIONS = MAX_OPTIONS * MAX_SELECTS
+
+
+class CodeSelection(typing.NamedTuple):
+    """
+    Everything the AddCodeView dropdown needs to know, carried in its custom_id so nothing is kept per message
+    """
+    # "lecture" or "seminar"
+    kind: str
+    module_id: int
+    code: str
+    # Which of the view's dropdowns, custom_ids must be unique within a message
+    page: int = 0
+
+    @property
+    def custom_id(self) -> str:
+        return f"{CUSTOM_ID_PREFIX}:{self.kind}:{self.module_id}:{self.code}:{self.page}"
+
+    @classmethod
+    def parse(cls, custom_id: str) -> typing.Union["CodeSelection", None]:
+        """
+        The selection a custom_id encodes, or None if it isn't an AddCodeView dropdown's. Dropdowns sent before
+        there were pages have no page
+        """
+        parts = custom_id.split(":")
+        if len(parts) == 4:
+            parts.append("0")
+        if len(parts) != 5 or parts[0] != CUSTOM_ID_PREFIX or parts[1] not in ("lecture", "seminar") or not parts[2].isdigit() \
+                or not parts[4].isdigit():
+            return None
+        return cls(parts[1], int(parts[2]), parts[3], int(parts[4]))
 
 
 class AddCodeView(nextcord.ui.View):
-    def __init__(self, code: str, engine, module: Module, seminars: typing.List[Seminar] = None, lectures: typing.List[Lecture] = None):
-        super().__init__()
-        self.add_item(CodeDropdown(code, engine, module, seminars, lectures))
+    """
+    Dropdowns of a module's lectures or seminars, the options' values being their ids. Up to MAX_SESSIONS sessions
+    are split over MAX_OPTIONS per dropdown, the caller has to turn away modules with more
+
+    It never times out and holds no callbacks. MainCog.on_interaction handles a selection from the custom_id alone,
+    so the view can be stopped as soon as it's sent and still works after a restart
+    """
+
+    def __init__(self, selection: CodeSelection, sessions: typing.Sequence[typing.Union[LectureRecord, SeminarRecord]]):
+        super().__init__(timeout=None)
+        if len(sessions) > MAX_SESSIONS:
+            raise ValueError(f"{len(sessions)} sessions don't fit in {MAX_SELECTS} dropdowns of {MAX_OPTIONS}")
+        for page, start in enumerate(range(0, len(sessions), MAX_OPTIONS)):
+            chunk = sessions[start:start + MAX_OPTIONS]
+            placeholder = "Select a seminar/lecture"
+            if len(sessions) > MAX_OPTIONS:
+                placeholder += f" ({start + 1}-{start + len(chunk)} of {len(sessions)})"
+            options = [nextcord.SelectOption(label=session.name, value=str(session.id)) for session in chunk]
+            self.add_item(nextcord.ui.Select(placeholder=placeholder, min_values=1, max_values=1, options=options,
+                                             custom_id=selection._replace(page=page).custom_id))
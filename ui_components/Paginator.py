@@ -0,0 +1,118 @@
+import bisect
+import operator
+import typing
+
+import nextcord
+from utils import PageCache, Page
+
+# fetch(after, limit) returns up to limit items whose key is greater than after (None for the first page), in key order
+Fetch = typing.Callable[[typing.Any, int], typing.Awaitable[typing.Sequence]]
+Render = typing.Callable[[typing.Sequence], nextcord.Embed]
+
+
+def sequence_fetch(records: typing.Iterable, key: typing.Callable = operator.attrgetter("id")) -> Fetch:
+    """
+    Pages through records already in memory the same way the keyset queries page through a table
+    """
+    records = sorted(records, key=key)
+    keys = [key(record) for record in records]
+
+    async def fetch(after, limit: int) -> typing.Sequence:
+        start = 0 if after is None else bisect.bisect_right(keys, after)
+        return records[start:start + limit]
+    return fetch
+
+
+class PaginatorView(nextcord.ui.View):
+    """
+    Shows a listing one embed page at a time, with previous/next buttons
+
+    Only the current page is held. Pages are fetched when first shown, page_size + 1 items at a time so the
+    extra item says whether there is a next page, and each page remembers the key it starts after so previous
+    re-fetches by key rather than by offset. With a page_cache, pages are shared with the same user's other
+    views of the listing until they expire.
+
+    Parameters
+    __________
+    user_id: int
+        The user who ran the command, the only one who can turn the pages
+    listing: tuple
+        Names what is being paged through, for the page cache
+    fetch: Fetch
+        Fetches the items after a key
+    render: Render
+        Builds the embed for a page of items
+    page_cache: PageCache
+        Optional cache of recently shown pages
+    page_size: int
+        Items per page, at most 25 as that is all an embed holds
+    key: typing.Callable
+        The key items are ordered and paged by
+    """
+
+    def __init__(self, user_id: int, listing: tuple, fetch: Fetch, render: Render, page_cache: PageCache = None,
+                 page_size: int = 10, key: typing.Callable = operator.attrgetter("id"), timeout: float = 180):
+        super().__init__(timeout=timeout)
+        if not 0 < page_size <= 25:
+            raise ValueError("page_size must be between 1 and 25")
+        self.user_id = user_id
+        self.listing = listing
+        self.fetch = fetch
+        self.render = render
+        self.page_cache = page_cache
+        self.page_size = page_size
+        self.key = key
+        # The key each page visited so far starts after
+        self.cursors = [None]
+        self.index = 0
+        self.page: typing.Union[Page, None] = None
+
+    async def load(self) -> Page:
+        cursor = self.cursors[self.index]
+        page = None if self.page_cache is None else self.page_cache.get(self.user_id, self.listing, cursor)
+        if page is None:
+            items = await self.fetch(cursor, self.page_size + 1)
+            next_cursor = self.key(items[self.page_size - 1]) if len(items) > self.page_size else None
+            page = Page(tuple(items[:self.page_size]), next_cursor)
+            if self.page_cache is not None:
+                self.page_cache.put(self.user_id, self.listing, cursor, page)
+        self.page = page
+        self.previous_page.disabled = self.index == 0
+        self.next_page.disabled = page.next_cursor is None
+        return page
+
+    def embed(self) -> nextcord.Embed:
+        embed = self.render(self.page.items)
+        embed.set_footer(text=f"Page {self.index + 1}")
+        return embed
+
+    async def start(self, interaction: nextcord.Interaction):
+        await self.load()
+        if self.page.next_cursor is None:
+            # Everything fits on one page, no buttons needed
+            self.stop()
+            await interaction.response.send_message(embed=self.render(self.page.items))
+            return
+        await interaction.response.send_message(embed=self.embed(), view=self)
+
+    async def interaction_check(self, interaction: nextcord.Interaction) -> bool:
+        if interaction.user.id != self.user_id:
+            await interaction.response.send_message("Run the command yourself to page through it", ephemeral=True)
+            return False
+        return True
+
+    @nextcord.ui.button(label="Previous", style=nextcord.ButtonStyle.grey)
+    async def previous_page(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
+        if self.index > 0:
+            self.index -= 1
+        await self.load()
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    @nextcord.ui.button(label="Next", style=nextcord.ButtonStyle.grey)
+    async def next_page(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
+        if self.page.next_cursor is not None:
+            del self.cursors[self.index + 1:]
+            self.cursors.append(self.page.next_cursor)
+            self.index += 1
+        await self.load()
+        await interaction.response.edit_message(embed=self.embed(), view=self)
@@ -0,0 +1,128 @@
+import collections
+import typing
+
+
+class ModuleRecord(typing.NamedTuple):
+    id: int
+    name: str
+    module_code: str
+    description: typing.Optional[str]
+    guild_id: int
+
+
+class LectureRecord(typing.NamedTuple):
+    id: int
+    name: str
+    module_id: int
+
+
+class SeminarRecord(typing.NamedTuple):
+    id: int
+    name: str
+    module_id: int
+
+
+class CatalogueEntry:
+    __slots__ = ("module", "lectures", "seminars")
+
+    def __init__(self, module: ModuleRecord):
+        self.module = module
+        self.lectures: typing.Union[typing.Tuple[LectureRecord, ...], None] = None
+        self.seminars: typing.Union[typing.Tuple[SeminarRecord, ...], None] = None
+
+
+class CatalogueCache:
+    """
+    Read-through cache of the module catalogue: modules by guild and code, and each module's lectures and seminars
+
+    Holds immutable records rather than ORM instances, and at most max_modules modules, evicting the least recently used
+
+    Parameters
+    __________
+    max_modules: int
+        Number of modules (with their lectures and seminars) kept in memory
+    """
+
+    def __init__(self, max_modules: int = 256):
+        self.max_modules = max_modules
+        self.hits = 0
+        self.misses = 0
+        self._entries: typing.OrderedDict[typing.Tuple[int, str], CatalogueEntry] = collections.OrderedDict()
+        self._keys_by_id: typing.Dict[int, typing.Tuple[int, str]] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _entry(self, key: typing.Tuple[int, str]) -> typing.Union[CatalogueEntry, None]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _entry_by_id(self, module_id: int) -> typing.Union[CatalogueEntry, None]:
+        key = self._keys_by_id.get(module_id)
+        return None if key is None else self._entry(key)
+
+    def _count(self, value):
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def get_module(self, guild_id: int, module_code: str) -> typing.Union[ModuleRecord, None]:
+        entry = self._entry((guild_id, module_code))
+        return self._count(None if entry is None else entry.module)
+
+    def get_module_by_id(self, module_id: int) -> typing.Union[ModuleRecord, None]:
+        entry = self._entry_by_id(module_id)
+        return self._count(None if entry is None else entry.module)
+
+    def put_module(self, module: ModuleRecord):
+        key = (module.guild_id, module.module_code)
+        self._entries[key] = CatalogueEntry(module)
+        self._entries.move_to_end(key)
+        self._keys_by_id[module.id] = key
+        while len(self._entries) > self.max_modules:
+            _, evicted = self._entries.popitem(last=False)
+            self._keys_by_id.pop(evicted.module.id, None)
+
+    def get_lectures(self, module_id: int) -> typing.Union[typing.Tuple[LectureRecord, ...], None]:
+        entry = self._entry_by_id(module_id)
+        return self._count(None if entry is None else entry.lectures)
+
+    def put_lectures(self, module_id: int, lectures: typing.Iterable[LectureRecord]):
+        entry = self._entry_by_id(module_id)
+        if entry is not None:
+            entry.lectures = tuple(lectures)
+
+    def get_seminars(self, module_id: int) -> typing.Union[typing.Tuple[SeminarRecord, ...], None]:
+        entry = self._entry_by_id(module_id)
+        return self._count(None if entry is None else entry.seminars)
+
+    def put_seminars(self, module_id: int, seminars: typing.Iterable[SeminarRecord]):
+        entry = self._entry_by_id(module_id)
+        if entry is not None:
+            entry.seminars = tuple(seminars)
+
+    def invalidate_module(self, module_id: int):
+        key = self._keys_by_id.pop(module_id, None)
+        if key is not None:
+            self._entries.pop(key, None)
+
+    def invalidate_lectures(self, module_id: int):
+        entry = self._entry_by_id(module_id)
+        if entry is not None:
+            entry.lectures = None
+
+    def invalidate_seminars(self, module_id: int):
+        entry = self._entry_by_id(module_id)
+        if entry is not None:
+            entry.seminars = None
+
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_id.clear()
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,233 @@
+import datetime
+import heapq
+import typing
+
+from .Timetable import Timetable, session_key
+
+
+class LiveCode(typing.NamedTuple):
+    id: int
+    code: str
+    name: str
+    module_name: str
+    module_id: int
+    lecture_id: typing.Optional[int]
+    seminar_id: typing.Optional[int]
+    created_at: datetime.datetime
+    guild_id: int
+    code_key: int
+
+    def encode(self) -> dict:
+        """
+        As JSON serialisable values, for the change bus
+        """
+        return dict(self._asdict(), created_at=self.created_at.isoformat())
+
+    @classmethod
+    def decode(cls, data: dict) -> "LiveCode":
+        return cls(**dict(data, created_at=datetime.datetime.fromisoformat(data["created_at"])))
+
+
+# (module_id, code_key, lecture_id, seminar_id), what the unique code indexes cover. module_id implies the guild
+CodeIdentity = typing.Tuple[int, int, typing.Optional[int], typing.Optional[int]]
+
+
+def code_identity(live_code: LiveCode) -> CodeIdentity:
+    return live_code.module_id, live_code.code_key, live_code.lecture_id, live_code.seminar_id
+
+
+class CodeCache:
+    """
+    In-process cache of the codes /codes can currently show, partitioned by guild and indexed by module and by lecture/seminar
+
+    A code is shown for ttl after it is posted, and for the whole of its lecture/seminar when that is on the timetable.
+    Recently posted codes are kept per guild with their expiry times on a heap, and codes of scheduled sessions are
+    found through the timetable's active sessions, so listing a guild's codes only touches the codes being shown.
+    The packed keys of the cached codes are kept in a set too, so a code that is already stored can be turned away
+    without asking the database
+
+    Parameters
+    __________
+    ttl: datetime.timedelta
+        How long after Code.created_at a code stays live
+    timetable: Timetable
+        The scheduled sessions, whose codes stay live while they're on
+    clock: typing.Callable[[], datetime.datetime]
+        Returns the current time, on the same clock as Code.created_at (UTC)
+    """
+
+    def __init__(self, ttl: datetime.timedelta = datetime.timedelta(hours=2), timetable: Timetable = None,
+                 clock: typing.Callable[[], datetime.datetime] = datetime.datetime.utcnow):
+        self.ttl = ttl
+        self.timetable = Timetable(clock) if timetable is None else timetable
+        self.clock = clock
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+        self._codes: typing.Dict[int, LiveCode] = {}
+        self._by_guild: typing.Dict[int, typing.Set[int]] = {}
+        self._by_module: typing.Dict[int, typing.Set[int]] = {}
+        self._by_lecture: typing.Dict[int, typing.Set[int]] = {}
+        self._by_seminar: typing.Dict[int, typing.Set[int]] = {}
+        self._identities: typing.Dict[CodeIdentity, int] = {}
+        # Codes posted within ttl, per guild, and when each stops counting as recent
+        self._recent: typing.Dict[int, typing.Set[int]] = {}
+        self._expiry: typing.List[typing.Tuple[datetime.datetime, int]] = []
+
+    def __len__(self):
+        return len(self._codes)
+
+    def cutoff(self) -> datetime.datetime:
+        """
+        Codes posted before this are only live while their session is on
+        """
+        return self.clock() - self.ttl
+
+    def _index(self, live_code: LiveCode):
+        self._identities[code_identity(live_code)] = live_code.id
+        self._by_guild.setdefault(live_code.guild_id, set()).add(live_code.id)
+        self._by_module.setdefault(live_code.module_id, set()).add(live_code.id)
+        if live_code.lecture_id is not None:
+            self._by_lecture.setdefault(live_code.lecture_id, set()).add(live_code.id)
+        if live_code.seminar_id is not None:
+            self._by_seminar.setdefault(live_code.seminar_id, set()).add(live_code.id)
+
+    @staticmethod
+    def _unindex(index: typing.Dict[int, typing.Set[int]], key: typing.Optional[int], code_id: int):
+        ids = index.get(key)
+        if ids is None:
+            return
+        ids.discard(code_id)
+        if not ids:
+            del index[key]
+
+    def rebuild(self, live_codes: typing.Iterable[LiveCode]):
+        """
+        Replaces the cache contents with live_codes, I.E. everything the database reports as live
+        """
+        self._codes.clear()
+        self._by_guild.clear()
+        self._by_module.clear()
+        self._by_lecture.clear()
+        self._by_seminar.clear()
+        self._identities.clear()
+        self._recent.clear()
+        self._expiry.clear()
+        for live_code in live_codes:
+            self.add(live_code)
+        self.loaded = True
+
+    def add(self, live_code: LiveCode):
+        if live_code.id in self._codes:
+            self.remove(live_code.id)
+        recent = live_code.created_at >= self.cutoff()
+        if not recent and not self.timetable.is_scheduled(session_key(live_code.lecture_id, live_code.seminar_id)):
+            return
+        self._codes[live_code.id] = live_code
+        self._index(live_code)
+        if recent:
+            self._recent.setdefault(live_code.guild_id, set()).add(live_code.id)
+            heapq.heappush(self._expiry, (live_code.created_at + self.ttl, live_code.id))
+
+    def remove(self, code_id: int) -> typing.Union[LiveCode, None]:
+        live_code = self._codes.pop(code_id, None)
+        if live_code is not None:
+            if self._identities.get(code_identity(live_code)) == code_id:
+                del self._identities[code_identity(live_code)]
+            self._unindex(self._by_guild, live_code.guild_id, code_id)
+            self._unindex(self._recent, live_code.guild_id, code_id)
+            self._unindex(self._by_module, live_code.module_id, code_id)
+            self._unindex(self._by_lecture, live_code.lecture_id, code_id)
+            self._unindex(self._by_seminar, live_code.seminar_id, code_id)
+        return live_code
+
+    def _remove_all(self, ids: typing.Iterable[int]):
+        for code_id in list(ids):
+            self.remove(code_id)
+
+    def remove_module(self, module_id: int):
+        self._remove_all(self._by_module.get(module_id, ()))
+
+    def remove_lecture(self, lecture_id: int):
+        self._remove_all(self._by_lecture.get(lecture_id, ()))
+
+    def remove_seminar(self, seminar_id: int):
+        self._remove_all(self._by_seminar.get(seminar_id, ()))
+
+    def remove_older_than(self, cutoff: datetime.datetime):
+        """
+        Drops codes posted before cutoff, after they're deleted from the database
+        """
+        self._remove_all([code_id for code_id, live_code in self._codes.items() if live_code.created_at < cutoff])
+
+    def contains(self, module_id: int, code_key: int, lecture_id: typing.Optional[int], seminar_id: typing.Optional[int]) -> bool:
+        """
+        True if the code is cached, so already stored for that lecture/seminar. False only means it isn't cached,
+        codes that are no longer live can still be in the database
+        """
+        return (module_id, code_key, lecture_id, seminar_id) in self._identities
+
+    def session_ended(self, lecture_id: typing.Optional[int], seminar_id: typing.Optional[int]):
+        """
+        Drops a finished session's codes, apart from any still within ttl of being posted
+        """
+        ids = self._by_lecture.get(lecture_id, ()) if lecture_id is not None else self._by_seminar.get(seminar_id, ())
+        self._remove_all([code_id for code_id in ids if code_id not in self._recent.get(self._codes[code_id].guild_id, ())])
+
+    def evict_expired(self) -> int:
+        """
+        Stops counting codes posted more than ttl ago as recent, and drops them unless their session is still to come or on
+        """
+        now = self.clock()
+        evicted = 0
+        while self._expiry and self._expiry[0][0] < now:
+            _, code_id = heapq.heappop(self._expiry)
+            live_code = self._codes.get(code_id)
+            if live_code is None:
+                continue
+            self._unindex(self._recent, live_code.guild_id, code_id)
+            if not self.timetable.is_scheduled(session_key(live_code.lecture_id, live_code.seminar_id)):
+                self.remove(code_id)
+                evicted += 1
+        return evicted
+
+    def _is_live(self, live_code: LiveCode) -> bool:
+        if live_code.id in self._recent.get(live_code.guild_id, ()):
+            return True
+        return any(session.key == session_key(live_code.lecture_id, live_code.seminar_id)
+                   for session in self.timetable.active(live_code.guild_id))
+
+    def _live(self, ids: typing.Iterable[int]) -> typing.Union[typing.List[LiveCode], None]:
+        if not self.loaded:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.evict_expired()
+        live_codes = [self._codes[code_id] for code_id in ids if code_id in self._codes and self._is_live(self._codes[code_id])]
+        return sorted(live_codes, key=lambda live_code: (live_code.created_at, live_code.id))
+
+    def get_codes(self, guild_id: int) -> typing.Union[typing.List[LiveCode], None]:
+        """
+        Returns every live code in a guild, oldest first, or None (a miss) if the cache has not been loaded yet
+        """
+        if not self.loaded:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.evict_expired()
+        ids = set(self._recent.get(guild_id, ()))
+        for session in self.timetable.active(guild_id):
+            ids.update((self._by_lecture if session.kind == "lecture" else self._by_seminar).get(session.id, ()))
+        return sorted((self._codes[code_id] for code_id in ids), key=lambda live_code: (live_code.created_at, live_code.id))
+
+    def get_module_codes(self, module_id: int) -> typing.Union[typing.List[LiveCode], None]:
+        return self._live(list(self._by_module.get(module_id, ())))
+
+    def get_lecture_codes(self, lecture_id: int) -> typing.Union[typing.List[LiveCode], None]:
+        return self._live(list(self._by_lecture.get(lecture_id, ())))
+
+    def get_seminar_codes(self, seminar_id: int) -> typing.Union[typing.List[LiveCode], None]:
+        return self._live(list(self._by_seminar.get(seminar_id, ())))
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {"size": len(self._codes), "hits": self.hits, "misses": self.misses}
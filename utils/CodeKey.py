@@ -0,0 +1,40 @@
+import string
+import typing
+
+# Codes are up to CODE_LENGTH letters and digits, stored in upper case
+CODE_ALPHABET = string.digits + string.ascii_uppercase
+CODE_LENGTH = 5
+_DIGITS = {char: digit for digit, char in enumerate(CODE_ALPHABET, start=1)}
+# Base len(CODE_ALPHABET) + 1, digit 0 is never used so codes of different lengths never share a key
+_BASE = len(CODE_ALPHABET) + 1
+
+
+def normalise_code(code: str) -> typing.Union[str, None]:
+    """
+    The code as it is stored, upper case without surrounding whitespace, or None if it isn't a valid code
+    """
+    code = code.strip().upper()
+    if not 0 < len(code) <= CODE_LENGTH or any(char not in _DIGITS for char in code):
+        return None
+    return code
+
+
+def pack_code(code: str) -> int:
+    """
+    Packs a normalised code into an integer, one base 37 digit per character. Five characters fit in 27 bits
+    """
+    key = 0
+    for char in code:
+        try:
+            key = key * _BASE + _DIGITS[char]
+        except KeyError:
+            raise ValueError(f"{code!r} is not a normalised code") from None
+    return key
+
+
+def unpack_code(key: int) -> str:
+    chars = []
+    while key:
+        key, digit = divmod(key, _BASE)
+        chars.append(CODE_ALPHABET[digit - 1])
+    return "".join(reversed(chars))
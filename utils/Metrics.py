@@ -0,0 +1,151 @@
+import bisect
+import math
+import threading
+import typing
+
+Labels = typing.Tuple[str, ...]
+Collect = typing.Callable[[], typing.Union[float, typing.Dict[Labels, float]]]
+
+# Seconds, from a cached lookup up to a slow query under lock contention
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def format_labels(names: typing.Sequence[str], values: typing.Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class Metric:
+    """
+    A named family of samples, one per combination of label values
+
+    Either updated directly, or read from callback at scrape time for numbers something else already keeps
+    """
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: typing.Sequence[str] = (), callback: Collect = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._values: typing.Dict[Labels, float] = {}
+
+    def _key(self, labels: typing.Dict[str, typing.Any]) -> Labels:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def collect(self) -> typing.Dict[Labels, float]:
+        if self.callback is not None:
+            values = self.callback()
+            return values if isinstance(values, dict) else {(): values}
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> typing.List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for labels, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """
+    Counts observations into cumulative buckets, plus their sum and count, per combination of label values
+    """
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: typing.Sequence[str] = (),
+                 buckets: typing.Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: a count per bucket (the last one +Inf), then the sum
+        self._observations: typing.Dict[Labels, typing.Tuple[typing.List[int], typing.List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._observations.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def render(self) -> typing.List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            observations = {key: (list(counts), total[0]) for key, (counts, total) in self._observations.items()}
+        for labels, (counts, total) in sorted(observations.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                bucket_labels = format_labels(self.labelnames + ("le",), labels + (format_value(bound),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds every metric and renders them in the Prometheus text exposition format
+
+    Registering a name again replaces the old metric, so a reloaded cog can register its metrics afresh
+    """
+
+    def __init__(self):
+        self._metrics: typing.Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: typing.Sequence[str] = (), callback: Collect = None) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, callback))
+
+    def gauge(self, name: str, documentation: str, labelnames: typing.Sequence[str] = (), callback: Collect = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: typing.Sequence[str] = (),
+                  buckets: typing.Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> typing.Union[Metric, None]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # One broken callback shouldn't take the whole scrape down
+                lines.append(f"# {metric.name} failed to collect: {type(e).__name__}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,43 @@
+import typing
+
+from aiohttp import web
+
+from .Metrics import MetricsRegistry
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsServer:
+    """
+    Serves a MetricsRegistry at /metrics for Prometheus to scrape, on the bot's own event loop
+
+    Parameters
+    __________
+    registry: MetricsRegistry
+        What to serve
+    host: str
+        Interface to listen on, loopback by default so metrics are not exposed beyond the machine
+    port: int
+        Port to listen on
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: typing.Union[web.AppRunner, None] = None
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.registry.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self.metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
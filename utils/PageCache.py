@@ -0,0 +1,69 @@
+import collections
+import time
+import typing
+
+
+class Page(typing.NamedTuple):
+    items: tuple
+    # Key to fetch the following page after, None on the last page
+    next_cursor: typing.Any
+
+
+class PageCache:
+    """
+    Short lived cache of listing pages, per user, so paging back and forth does not query again
+
+    Pages are keyed on (user id, listing, cursor), where listing names what is being paged through, e.g.
+    ("seminars", module_id), and cursor is the key the page starts after. At most max_entries pages are kept,
+    evicting the least recently used, and none for longer than ttl seconds
+
+    Parameters
+    __________
+    ttl: float
+        Seconds a page stays valid
+    max_entries: int
+        Number of pages kept in memory across all users
+    """
+
+    def __init__(self, ttl: float = 60, max_entries: int = 1024, clock: typing.Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._pages: typing.OrderedDict[tuple, typing.Tuple[float, Page]] = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._pages)
+
+    def get(self, user_id: int, listing: tuple, cursor) -> typing.Union[Page, None]:
+        key = (user_id, listing, cursor)
+        entry = self._pages.get(key)
+        if entry is None or entry[0] < self.clock():
+            if entry is not None:
+                del self._pages[key]
+            self.misses += 1
+            return None
+        self._pages.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, user_id: int, listing: tuple, cursor, page: Page):
+        key = (user_id, listing, cursor)
+        self._pages[key] = (self.clock() + self.ttl, page)
+        self._pages.move_to_end(key)
+        while len(self._pages) > self.max_entries:
+            self._pages.popitem(last=False)
+
+    def invalidate(self, listing: tuple):
+        """
+        Drops every user's pages of a listing, after it changes
+        """
+        for key in [key for key in self._pages if key[1] == listing]:
+            del self._pages[key]
+
+    def clear(self):
+        self._pages.clear()
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {"size": len(self._pages), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,49 @@
+import bisect
+import typing
+
+
+class PrefixIndex:
+    """
+    Sorted, case-insensitive index of names answering prefix searches with a binary search
+
+    Each search is O(log n + limit), with no database involved, so it can serve autocomplete on every keystroke
+    """
+
+    def __init__(self, names: typing.Iterable[str] = ()):
+        self._keys: typing.List[typing.Tuple[str, str]] = sorted({(name.casefold(), name) for name in names})
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, name: str):
+        key = (name.casefold(), name)
+        i = bisect.bisect_left(self._keys, key)
+        return i < len(self._keys) and self._keys[i] == key
+
+    def rebuild(self, names: typing.Iterable[str]):
+        self._keys = sorted({(name.casefold(), name) for name in names})
+
+    def add(self, name: str):
+        key = (name.casefold(), name)
+        i = bisect.bisect_left(self._keys, key)
+        if i == len(self._keys) or self._keys[i] != key:
+            self._keys.insert(i, key)
+
+    def remove(self, name: str):
+        key = (name.casefold(), name)
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def search(self, prefix: str, limit: int = 25) -> typing.List[str]:
+        """
+        Returns up to limit names starting with prefix, ignoring case, in sorted order
+        """
+        prefix = prefix.casefold()
+        results = []
+        for i in range(bisect.bisect_left(self._keys, (prefix, "")), len(self._keys)):
+            folded, name = self._keys[i]
+            if not folded.startswith(prefix) or len(results) >= limit:
+                break
+            results.append(name)
+        return results
@@ -0,0 +1,114 @@
+import collections
+import time
+import typing
+
+
+class RateLimit(typing.NamedTuple):
+    calls: int
+    # Seconds the bucket takes to refill from empty
+    per: float
+
+    @property
+    def rate(self) -> float:
+        return self.calls / self.per
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated_at", "full_at")
+
+    def __init__(self, limit: RateLimit, now: float):
+        self.tokens = float(limit.calls)
+        self.updated_at = now
+        self.full_at = now
+
+    def refill(self, limit: RateLimit, now: float):
+        self.tokens = min(float(limit.calls), self.tokens + (now - self.updated_at) * limit.rate)
+        self.updated_at = now
+
+    def take(self, limit: RateLimit, now: float):
+        self.tokens -= 1
+        self.full_at = now + (limit.calls - self.tokens) / limit.rate
+
+
+class RateLimiter:
+    """
+    Token buckets per command, for each user and each guild, checked before a command does any work
+
+    limits maps a command name to a limit per scope, "user" and/or "guild", as (calls, per seconds). Commands
+    not listed use "default", and a scope given as None is not limited. A call goes ahead only if every bucket it
+    falls in has a token left, and then takes one from each.
+
+    Buckets are kept least recently used first. One that has refilled completely is the same as no bucket, so
+    idle buckets are dropped from the front as calls come in, and never more than max_buckets are kept
+
+    Parameters
+    __________
+    limits: dict
+        {command: {scope: (calls, per)}}, with a "default" entry for everything else
+    max_buckets: int
+        Upper bound on the number of buckets in memory
+    """
+
+    def __init__(self, limits: typing.Dict[str, typing.Dict[str, typing.Optional[typing.Sequence[float]]]], max_buckets: int = 10_000,
+                 clock: typing.Callable[[], float] = time.monotonic):
+        self.limits = {
+            command: {scope: None if limit is None else RateLimit(*limit) for scope, limit in scopes.items()}
+            for command, scopes in limits.items()
+        }
+        self.max_buckets = max_buckets
+        self.clock = clock
+        self.allowed = 0
+        # (command, scope) -> calls turned away
+        self.rejections: typing.Counter[typing.Tuple[str, str]] = collections.Counter()
+        self._buckets: typing.OrderedDict[typing.Tuple[str, str, int], TokenBucket] = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def limits_for(self, command: str) -> typing.Dict[str, RateLimit]:
+        limits = dict(self.limits.get("default", {}))
+        limits.update(self.limits.get(command, {}))
+        return {scope: limit for scope, limit in limits.items() if limit is not None}
+
+    def evict_idle(self, now: float):
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if bucket.full_at > now and len(self._buckets) <= self.max_buckets:
+                return
+            del self._buckets[key]
+
+    def acquire(self, command: str, user_id: int, guild_id: typing.Optional[int]) -> typing.Union[typing.Tuple[str, float], None]:
+        """
+        Takes a token for a call, or returns the scope that is out of tokens and the seconds until it has one again
+        """
+        now = self.clock()
+        try:
+            return self._acquire(command, user_id, guild_id, now)
+        finally:
+            self.evict_idle(now)
+
+    def _acquire(self, command: str, user_id: int, guild_id: typing.Optional[int], now: float) -> typing.Union[typing.Tuple[str, float], None]:
+        ids = {"user": user_id, "guild": guild_id}
+        buckets = []
+        for scope, limit in self.limits_for(command).items():
+            if ids.get(scope) is None:
+                continue
+            key = (command, scope, ids[scope])
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(limit, now)
+            else:
+                self._buckets.move_to_end(key)
+                bucket.refill(limit, now)
+            if bucket.tokens < 1:
+                self.rejections[(command, scope)] += 1
+                return scope, (1 - bucket.tokens) / limit.rate
+            buckets.append((bucket, limit))
+
+        for bucket, limit in buckets:
+            bucket.take(limit, now)
+        self.allowed += 1
+        return None
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {"buckets": len(self._buckets), "allowed": self.allowed, "rejected": sum(self.rejections.values())}
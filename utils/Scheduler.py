@@ -0,0 +1,112 @@
+import asyncio
+import datetime
+import random
+import time
+import traceback
+import typing
+
+
+class JobRun(typing.NamedTuple):
+    started_at: datetime.datetime
+    duration: float
+    rows: int
+    error: typing.Optional[str] = None
+
+
+class Job:
+    """
+    A coroutine function run every interval seconds, plus up to jitter seconds of random delay
+
+    The function returns the number of rows it touched, which is recorded with each run
+    """
+
+    def __init__(self, name: str, func: typing.Callable[[], typing.Awaitable[int]], interval: float, jitter: float = 0.0):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.lock = asyncio.Lock()
+        self.last_run: typing.Union[JobRun, None] = None
+        self.runs = 0
+        self.skipped = 0
+        self.total_rows = 0
+        self.task: typing.Union[asyncio.Task, None] = None
+
+    def next_delay(self) -> float:
+        return self.interval + random.uniform(0, self.jitter)
+
+
+class Scheduler:
+    """
+    Runs periodic maintenance jobs on the event loop
+
+    A job never overlaps itself: a run that comes due while the previous one is still going is skipped
+    """
+
+    def __init__(self):
+        self.jobs: typing.Dict[str, Job] = {}
+
+    def add_job(self, name: str, func: typing.Callable[[], typing.Awaitable[int]], interval: float, jitter: float = 0.0) -> Job:
+        """
+        Registers a job
+
+        Parameters
+        __________
+        name: str
+            Unique name of the job
+        func: typing.Callable
+            Coroutine function returning the number of rows it touched
+        interval: float
+            Seconds between runs
+        jitter: float
+            Up to this many extra seconds are added to each wait, so processes sharing a database spread out
+        :return:
+        """
+        if name in self.jobs:
+            raise ValueError(f"Job {name} already exists")
+        job = Job(name, func, interval, jitter)
+        self.jobs[name] = job
+        return job
+
+    async def run_job(self, name: str) -> typing.Union[JobRun, None]:
+        """
+        Runs a job now, returning None if it is already running
+        """
+        job = self.jobs[name]
+        if job.lock.locked():
+            job.skipped += 1
+            return None
+
+        async with job.lock:
+            started_at = datetime.datetime.utcnow()
+            start = time.perf_counter()
+            rows, error = 0, None
+            try:
+                rows = await job.func() or 0
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                print(f"Job {name} failed")
+                traceback.print_exc()
+            job.last_run = JobRun(started_at, time.perf_counter() - start, rows, error)
+            job.runs += 1
+            job.total_rows += rows
+            return job.last_run
+
+    async def _loop(self, job: Job, run_immediately: bool):
+        if not run_immediately:
+            await asyncio.sleep(job.next_delay())
+        while True:
+            await self.run_job(job.name)
+            await asyncio.sleep(job.next_delay())
+
+    def start(self, loop: asyncio.AbstractEventLoop = None, run_immediately: bool = True):
+        loop = loop or asyncio.get_event_loop()
+        for job in self.jobs.values():
+            if job.task is None or job.task.done():
+                job.task = loop.create_task(self._loop(job, run_immediately))
+
+    def stop(self):
+        for job in self.jobs.values():
+            if job.task is not None:
+                job.task.cancel()
+                job.task = None
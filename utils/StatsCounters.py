@@ -0,0 +1,136 @@
+import collections
+import datetime
+import typing
+
+
+class GuildStats:
+    """
+    One guild's running totals
+    """
+    __slots__ = ("counts", "codes_per_module", "codes_per_hour", "day", "loaded", "stale", "version", "reconciled_at")
+
+    def __init__(self, kinds: typing.Iterable[str]):
+        self.counts: typing.Dict[str, int] = dict.fromkeys(kinds, 0)
+        self.codes_per_module: typing.Counter[str] = collections.Counter()
+        self.codes_per_hour: typing.Counter[int] = collections.Counter()
+        self.day: typing.Union[datetime.date, None] = None
+        self.loaded = False
+        self.stale = False
+        # Bumped by every incremental update, so a reconcile can tell if it raced with one
+        self.version = 0
+        self.reconciled_at: typing.Union[datetime.datetime, None] = None
+
+
+class StatsCounters:
+    """
+    Running totals behind /stats, per guild
+
+    Updated incrementally as rows are added and removed. A guild's totals are reconciled against the database the
+    first time its /stats is asked for and whenever they have been marked stale since, so anything missed (cascading
+    deletes, other processes) cannot drift for long. Updates to a guild that hasn't been reconciled yet are counted
+    anyway but never shown, the reconcile replaces them
+
+    The database size covers every guild, so it is kept apart from them
+
+    Parameters
+    __________
+    clock: typing.Callable[[], datetime.datetime]
+        Returns the current time, on the same clock as Code.created_at (UTC), so the hours are UTC hours
+    """
+
+    KINDS = ("modules", "lectures", "seminars", "codes")
+
+    def __init__(self, clock: typing.Callable[[], datetime.datetime] = datetime.datetime.utcnow):
+        self.clock = clock
+        self.guilds: typing.Dict[int, GuildStats] = {}
+        self.database_size: typing.Union[int, None] = None
+        self.measured_at: typing.Union[datetime.datetime, None] = None
+
+    def _guild(self, guild_id: int) -> GuildStats:
+        stats = self.guilds.get(guild_id)
+        if stats is None:
+            stats = self.guilds[guild_id] = GuildStats(self.KINDS)
+        return stats
+
+    def get(self, guild_id: int) -> typing.Union[GuildStats, None]:
+        """
+        A guild's totals, or None if they have to be reconciled first
+        """
+        stats = self.guilds.get(guild_id)
+        if stats is None or not stats.loaded or stats.stale:
+            return None
+        return stats
+
+    def version(self, guild_id: int) -> int:
+        return self._guild(guild_id).version
+
+    def reconcile(self, guild_id: int, counts: typing.Dict[str, int], codes_per_module: typing.Dict[str, int],
+                  code_times: typing.Iterable[datetime.datetime], day: datetime.date):
+        """
+        Replaces a guild's counters with freshly queried values
+
+        code_times are the created_at of every code posted in the guild on day
+        """
+        stats = self._guild(guild_id)
+        stats.counts = {kind: counts[kind] for kind in self.KINDS}
+        stats.codes_per_module = collections.Counter({module_code: count for module_code, count in codes_per_module.items() if count})
+        stats.codes_per_hour = collections.Counter(created_at.hour for created_at in code_times)
+        stats.day = day
+        stats.reconciled_at = self.clock()
+        stats.loaded = True
+        stats.stale = False
+
+    def measured(self, database_size: typing.Union[int, None]):
+        self.database_size = database_size
+        self.measured_at = self.clock()
+
+    def invalidate(self, guild_id: typing.Optional[int] = None) -> int:
+        """
+        Marks a guild's counters (None for every guild's) as out of date after a change that can't be counted
+        incrementally, returning how many guilds were marked
+        """
+        guilds = self.guilds.values() if guild_id is None else [self._guild(guild_id)]
+        for stats in guilds:
+            stats.version += 1
+            stats.stale = True
+        return len(guilds)
+
+    def add(self, guild_id: int, kind: str, amount: int = 1):
+        stats = self._guild(guild_id)
+        stats.counts[kind] += amount
+        stats.version += 1
+
+    def remove(self, guild_id: int, kind: str, amount: int = 1):
+        stats = self._guild(guild_id)
+        stats.counts[kind] = max(0, stats.counts[kind] - amount)
+        stats.version += 1
+
+    def code_added(self, guild_id: int, module_code: str, created_at: datetime.datetime):
+        self.add(guild_id, "codes")
+        stats = self.guilds[guild_id]
+        stats.codes_per_module[module_code] += 1
+        if created_at.date() == stats.day:
+            stats.codes_per_hour[created_at.hour] += 1
+
+    def code_removed(self, guild_id: int, module_code: str):
+        self.remove(guild_id, "codes")
+        stats = self.guilds[guild_id]
+        stats.codes_per_module[module_code] -= 1
+        if stats.codes_per_module[module_code] <= 0:
+            del stats.codes_per_module[module_code]
+
+    def guild_codes_per_module(self, guild_id: int, limit: int = 10) -> typing.List[typing.Tuple[str, int]]:
+        """
+        The modules with the most codes in a guild, as (module code, count)
+        """
+        stats = self.guilds.get(guild_id)
+        return [] if stats is None else stats.codes_per_module.most_common(limit)
+
+    def hourly(self, guild_id: int) -> typing.Dict[int, int]:
+        """
+        Codes posted in a guild per hour today, empty once the day has rolled over until the next reconcile
+        """
+        stats = self.guilds.get(guild_id)
+        if stats is None or stats.day != self.clock().date():
+            return {}
+        return dict(sorted(stats.codes_per_hour.items()))
@@ -0,0 +1,175 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+import typing
+
+# ("lecture", id) or ("seminar", id)
+SessionKey = typing.Tuple[str, int]
+
+
+class ScheduledSession(typing.NamedTuple):
+    kind: str
+    id: int
+    module_id: int
+    guild_id: int
+    starts_at: datetime.datetime
+    ends_at: datetime.datetime
+
+    @property
+    def key(self) -> SessionKey:
+        return self.kind, self.id
+
+    def encode(self) -> dict:
+        """
+        As JSON serialisable values, for the change bus
+        """
+        return dict(self._asdict(), starts_at=self.starts_at.isoformat(), ends_at=self.ends_at.isoformat())
+
+    @classmethod
+    def decode(cls, data: dict) -> "ScheduledSession":
+        return cls(**dict(data, starts_at=datetime.datetime.fromisoformat(data["starts_at"]),
+                          ends_at=datetime.datetime.fromisoformat(data["ends_at"])))
+
+
+def session_key(lecture_id: typing.Optional[int], seminar_id: typing.Optional[int]) -> SessionKey:
+    return ("lecture", lecture_id) if lecture_id is not None else ("seminar", seminar_id)
+
+
+class Timetable:
+    """
+    The scheduled lectures and seminars that haven't finished yet, and which of them are on right now, per guild
+
+    Every start and end time goes on a heap. advance pops the boundaries that have passed, so keeping up with the
+    timetable costs O(log n) per boundary, and what's on in a guild is a dict lookup. Sessions are forgotten once
+    they end. start runs a task that sleeps until the next boundary and advances, calling on_change with the
+    sessions that started and ended. All times are UTC
+
+    Parameters
+    __________
+    clock: typing.Callable[[], datetime.datetime]
+        Returns the current time, on the same clock as the scheduled times
+    """
+
+    def __init__(self, clock: typing.Callable[[], datetime.datetime] = datetime.datetime.utcnow):
+        self.clock = clock
+        self.loaded = False
+        self._sessions: typing.Dict[SessionKey, ScheduledSession] = {}
+        self._active: typing.Dict[int, typing.Dict[SessionKey, ScheduledSession]] = {}
+        # (when, tiebreak, starting, session). Entries for a session that was since rescheduled or removed are
+        # skipped when they come up
+        self._boundaries: typing.List[typing.Tuple[datetime.datetime, int, bool, ScheduledSession]] = []
+        self._counter = itertools.count()
+        self._wakeup: typing.Union[asyncio.Event, None] = None
+        self.task: typing.Union[asyncio.Task, None] = None
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def is_scheduled(self, key: SessionKey) -> bool:
+        """
+        True for a session that is on now or still to come
+        """
+        return key in self._sessions
+
+    def _deactivate(self, session: ScheduledSession):
+        active = self._active.get(session.guild_id)
+        if active is not None and active.pop(session.key, None) is not None and not active:
+            del self._active[session.guild_id]
+
+    def schedule(self, session: ScheduledSession):
+        """
+        Adds a session, or moves one already on the timetable. Sessions that have already ended are ignored
+        """
+        self.unschedule(session.key)
+        now = self.clock()
+        if session.ends_at <= now:
+            return
+        self._sessions[session.key] = session
+        if session.starts_at <= now:
+            self._active.setdefault(session.guild_id, {})[session.key] = session
+        else:
+            heapq.heappush(self._boundaries, (session.starts_at, next(self._counter), True, session))
+        heapq.heappush(self._boundaries, (session.ends_at, next(self._counter), False, session))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def unschedule(self, key: SessionKey) -> typing.Union[ScheduledSession, None]:
+        session = self._sessions.pop(key, None)
+        if session is not None:
+            self._deactivate(session)
+        return session
+
+    def unschedule_module(self, module_id: int):
+        for session in [session for session in self._sessions.values() if session.module_id == module_id]:
+            self.unschedule(session.key)
+
+    def rebuild(self, sessions: typing.Iterable[ScheduledSession]):
+        """
+        Replaces the timetable with sessions, I.E. every scheduled session the database has that hasn't ended
+        """
+        self._sessions.clear()
+        self._active.clear()
+        self._boundaries.clear()
+        for session in sessions:
+            self.schedule(session)
+        self.loaded = True
+
+    def advance(self) -> typing.Tuple[typing.List[ScheduledSession], typing.List[ScheduledSession]]:
+        """
+        Applies every boundary that has passed, returning the sessions that started and the ones that ended
+        """
+        now = self.clock()
+        started, ended = [], []
+        while self._boundaries and self._boundaries[0][0] <= now:
+            _, _, starting, session = heapq.heappop(self._boundaries)
+            if self._sessions.get(session.key) is not session:
+                continue
+            if not starting:
+                self.unschedule(session.key)
+                ended.append(session)
+            elif session.ends_at > now:
+                self._active.setdefault(session.guild_id, {})[session.key] = session
+                started.append(session)
+        return started, ended
+
+    def next_boundary(self) -> typing.Union[datetime.datetime, None]:
+        while self._boundaries and self._sessions.get(self._boundaries[0][3].key) is not self._boundaries[0][3]:
+            heapq.heappop(self._boundaries)
+        return self._boundaries[0][0] if self._boundaries else None
+
+    def active(self, guild_id: int) -> typing.Collection[ScheduledSession]:
+        """
+        The sessions on right now in a guild, as of the last advance
+        """
+        return self._active.get(guild_id, {}).values()
+
+    async def _follow(self, on_change: typing.Callable[[typing.List[ScheduledSession], typing.List[ScheduledSession]], None]):
+        while True:
+            started, ended = self.advance()
+            if started or ended:
+                on_change(started, ended)
+            self._wakeup.clear()
+            next_boundary = self.next_boundary()
+            timeout = None if next_boundary is None else max((next_boundary - self.clock()).total_seconds(), 0)
+            try:
+                # Woken early when a session is scheduled, it may come before the boundary being waited for
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, on_change: typing.Callable[[typing.List[ScheduledSession], typing.List[ScheduledSession]], None],
+              loop: asyncio.AbstractEventLoop = None):
+        loop = loop or asyncio.get_event_loop()
+        if self.task is None or self.task.done():
+            self._wakeup = asyncio.Event()
+            self.task = loop.create_task(self._follow(on_change))
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        self._wakeup = None
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {"scheduled": len(self._sessions), "active": sum(len(active) for active in self._active.values())}
@@ -0,0 +1,11 @@
+from .Timetable import Timetable, ScheduledSession, session_key
+from .CodeKey import normalise_code, pack_code, unpack_code, CODE_ALPHABET, CODE_LENGTH
+from .CodeCache import CodeCache, LiveCode
+from .Scheduler import Scheduler, Job, JobRun
+from .StatsCounters import StatsCounters
+from .CatalogueCache import CatalogueCache, ModuleRecord, LectureRecord, SeminarRecord
+from .PrefixIndex import PrefixIndex
+from .PageCache import PageCache, Page
+from .Metrics import MetricsRegistry, Counter, Gauge, Histogram
+from .MetricsServer import MetricsServer
+from .RateLimiter import RateLimiter, RateLimit